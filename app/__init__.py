@@ -1,4 +1,5 @@
 import os
+import re
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
@@ -12,9 +13,29 @@ login_manager = LoginManager()
 login_manager.login_view = "auth.login"
 
 
-def create_app():
+def _drop_not_null(table, column):
+    """Make ``table.column`` nullable. SQLite has no ALTER COLUMN, so the table
+    is rebuilt from its own DDL with the NOT NULL removed."""
+    if db.engine.dialect.name != "sqlite":
+        db.session.execute(text(f'ALTER TABLE "{table}" ALTER COLUMN {column} DROP NOT NULL'))
+        db.session.commit()
+        return
+    ddl = db.session.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+    ).scalar()
+    ddl = re.sub(rf"\b{column}(\s+\w+)\s+NOT NULL", rf"{column}\1", ddl, count=1)
+    ddl = re.sub(rf'^CREATE TABLE\s+"?{table}"?', f'CREATE TABLE "{table}__rebuild"', ddl, count=1)
+    db.session.commit()
+    with db.engine.begin() as conn:
+        conn.execute(text(ddl))
+        conn.execute(text(f'INSERT INTO "{table}__rebuild" SELECT * FROM "{table}"'))
+        conn.execute(text(f'DROP TABLE "{table}"'))
+        conn.execute(text(f'ALTER TABLE "{table}__rebuild" RENAME TO "{table}"'))
+
+
+def create_app(config_object="config.Config"):
     app = Flask(__name__, static_folder="static", template_folder="templates")
-    app.config.from_object("config.Config")
+    app.config.from_object(config_object)
 
     db.init_app(app)
     login_manager.init_app(app)
@@ -35,11 +56,23 @@ def create_app():
     app.register_blueprint(report_bp, url_prefix="/report")
     app.register_blueprint(api_bp, url_prefix="/api")
 
+    from .class_reports import report_cards_cli
+    from .grading import scores_cli
+    from .question_bank import questions_cli
+    from .submissions import submissions_cli
+
+    app.cli.add_command(questions_cli)
+    app.cli.add_command(scores_cli)
+    app.cli.add_command(report_cards_cli)
+    app.cli.add_command(submissions_cli)
+
     with app.app_context():
         # Wrap DB creation and migration attempts in a broad exception handler so
         # that startup doesn't fail in environments where the filesystem is
         # read-only (serverless) or the DB backend is not available.
         try:
+            # Tables that create_all() is about to add may need filling from existing rows
+            had_answered_question = inspect(db.engine).has_table("answered_question")
             db.create_all()
             inspector = inspect(db.engine)
             # question.time_limit_seconds
@@ -47,6 +80,30 @@ def create_app():
             if "time_limit_seconds" not in q_cols:
                 db.session.execute(text("ALTER TABLE question ADD COLUMN time_limit_seconds INTEGER"))
                 db.session.commit()
+            # question.correct_option_id, backfilled from Option.is_correct (lowest id wins
+            # where several options were flagged) and made the only correct flag
+            if "correct_option_id" not in q_cols:
+                db.session.execute(text("ALTER TABLE question ADD COLUMN correct_option_id INTEGER"))
+                db.session.execute(text(
+                    "UPDATE question SET correct_option_id = "
+                    "(SELECT MIN(option.id) FROM option WHERE option.question_id = question.id AND option.is_correct)"
+                ))
+                db.session.execute(text(
+                    "UPDATE option SET is_correct = :not_correct WHERE is_correct AND id NOT IN "
+                    "(SELECT correct_option_id FROM question WHERE correct_option_id IS NOT NULL)"
+                ), {"not_correct": False})
+                db.session.commit()
+            # question provenance for harvested API questions
+            for name, ddl in (
+                ("source", "VARCHAR(32)"),
+                ("upstream_id", "INTEGER"),
+                ("year", "VARCHAR(16)"),
+                ("examtype", "VARCHAR(32)"),
+                ("content_hash", "VARCHAR(64)"),
+            ):
+                if name not in q_cols:
+                    db.session.execute(text(f"ALTER TABLE question ADD COLUMN {name} {ddl}"))
+                    db.session.commit()
             # user.class_name
             u_cols = [c["name"] for c in inspector.get_columns("user")]
             if "class_name" not in u_cols:
@@ -57,6 +114,52 @@ def create_app():
             if "class_name" not in s_cols:
                 db.session.execute(text("ALTER TABLE subject ADD COLUMN class_name VARCHAR(64)"))
                 db.session.commit()
+            # subject.bank_key; question-bank subjects have no owning teacher
+            if "bank_key" not in s_cols:
+                db.session.execute(text("ALTER TABLE subject ADD COLUMN bank_key VARCHAR(64)"))
+                db.session.commit()
+            teacher_col = next(c for c in inspect(db.engine).get_columns("subject") if c["name"] == "teacher_id")
+            if not teacher_col["nullable"]:
+                _drop_not_null("subject", "teacher_id")
+            # subject.key_version for the shared answer-key cache
+            if "key_version" not in s_cols:
+                db.session.execute(text("ALTER TABLE subject ADD COLUMN key_version INTEGER NOT NULL DEFAULT 0"))
+                db.session.commit()
+            db.session.execute(text("CREATE UNIQUE INDEX IF NOT EXISTS ux_subject_bank_key ON subject (bank_key)"))
+            db.session.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_question_subject_upstream ON question (subject_id, upstream_id)"
+            ))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_question_subject_content_hash ON question (subject_id, content_hash)"
+            ))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_question_subject_year ON question (subject_id, year)"
+            ))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_exam_paper_student_subject ON exam_paper (student_id, subject_key)"
+            ))
+            # One response per session/question, so grading can upsert in one statement;
+            # older databases may hold repeats, keep the latest of each before indexing
+            if "ux_response_session_question" not in {i["name"] for i in inspector.get_indexes("response")}:
+                db.session.execute(text(
+                    "DELETE FROM response WHERE id NOT IN "
+                    "(SELECT MAX(id) FROM response GROUP BY session_id, question_id)"
+                ))
+                db.session.execute(text(
+                    "CREATE UNIQUE INDEX ux_response_session_question ON response (session_id, question_id)"
+                ))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_exam_session_student_subject_completed "
+                "ON exam_session (student_id, subject_id, completed_at)"
+            ))
+            db.session.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_response_question_option ON response (question_id, selected_option_id)"
+            ))
+            db.session.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_submission_active ON submission (session_id) "
+                "WHERE status IN ('pending', 'processing')"
+            ))
+            db.session.commit()
             # exam_session score fields
             es_cols = [c["name"] for c in inspector.get_columns("exam_session")]
             if "total_questions" not in es_cols:
@@ -68,6 +171,15 @@ def create_app():
             if "score_percentage" not in es_cols:
                 db.session.execute(text("ALTER TABLE exam_session ADD COLUMN score_percentage FLOAT"))
                 db.session.commit()
+            # Summary rows for sessions completed before student_subject_result existed
+            from .results import populate_results
+
+            populate_results()
+            # Bank questions on API papers submitted before answered_question existed
+            if not had_answered_question:
+                from .exam_papers import backfill_answered
+
+                backfill_answered()
         except Exception as e:
             # Avoid crashing the app on import in serverless environments.
             import logging
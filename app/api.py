@@ -1,5 +1,8 @@
 from flask import Blueprint, jsonify, request, current_app
-from .api_service import QuestionsAPIService, SS2_SS3_SUBJECTS
+from .api_service import (
+    QuestionsAPIService, SS2_SS3_SUBJECTS, get_question_cache, get_http_client, get_single_flight,
+    get_circuit_breaker, get_stale_refresher, fetch_questions_concurrently
+)
 from flask_login import login_required, current_user
 
 api_bp = Blueprint('api', __name__)
@@ -77,6 +80,64 @@ def get_questions(subject, class_level):
         }), 500
 
 
+@api_bp.route('/questions/batch')
+@login_required
+def get_questions_batch():
+    """
+    Get questions for several subjects (and optionally years) in one round trip
+
+    Query params:
+        subjects: Comma-separated subject keys (e.g. chemistry,physics)
+        class_level: Class level (ss2 or ss3)
+        years: Optional comma-separated years; each subject is fetched once per year
+    """
+    class_level = (request.args.get('class_level') or '').lower()
+    if class_level not in ['ss2', 'ss3']:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid class level. Must be SS2 or SS3'
+        }), 400
+
+    subjects = [s.strip().lower() for s in (request.args.get('subjects') or '').split(',') if s.strip()]
+    invalid = [s for s in subjects if s not in SS2_SS3_SUBJECTS]
+    if not subjects or invalid:
+        return jsonify({
+            'success': False,
+            'error': f'Invalid subjects {invalid}. Available subjects: {list(SS2_SS3_SUBJECTS.keys())}'
+        }), 400
+
+    years = [y.strip() for y in (request.args.get('years') or '').split(',') if y.strip()] or [None]
+    jobs = [(subject, 'utme', year, 40) for subject in dict.fromkeys(subjects) for year in dict.fromkeys(years)]
+    max_jobs = current_app.config.get('QUESTIONS_API_BATCH_MAX_JOBS', 24)
+    if len(jobs) > max_jobs:
+        return jsonify({
+            'success': False,
+            'error': f'Too many subject/year combinations ({len(jobs)}); the limit is {max_jobs}'
+        }), 400
+
+    results = []
+    for (subject, _, year, _), result in zip(jobs, fetch_questions_concurrently(jobs)):
+        entry = {
+            'subject': subject,
+            'year': year,
+            'success': result['success'],
+            'status_code': result.get('status_code'),
+            'elapsed_ms': result.get('elapsed_ms')
+        }
+        if result['success']:
+            entry['data'] = result['data']
+        else:
+            entry['error'] = result['error']
+        results.append(entry)
+
+    succeeded = sum(1 for entry in results if entry['success'])
+    return jsonify({
+        'success': succeeded == len(results),
+        'class_level': class_level.upper(),
+        'results': results
+    }), (200 if succeeded else 502)
+
+
 @api_bp.route('/subjects')
 @login_required
 def get_available_subjects():
@@ -114,3 +175,23 @@ def test_api_connection():
         'message': 'API connection test',
         'result': result
     })
+
+
+@api_bp.route('/service-stats')
+@login_required
+def service_stats():
+    """Cache counters and upstream latency for the external questions API (teachers only)"""
+    if not current_user.is_teacher():
+        return jsonify({
+            'success': False,
+            'error': 'Teacher access required'
+        }), 403
+
+    return jsonify({
+        'success': True,
+        'cache': get_question_cache().stats(),
+        'http': get_http_client().stats(),
+        'single_flight': get_single_flight().stats(),
+        'circuit_breaker': get_circuit_breaker().stats(),
+        'stale_refresh': get_stale_refresher().stats()
+    })
@@ -1,12 +1,685 @@
 import requests
 import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from flask import current_app
-from typing import Dict, List, Optional
+from requests.adapters import HTTPAdapter
+from sqlalchemy import insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, List, Optional, Tuple
 import urllib3
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from . import db
+from .models import Subject, Question, Option, question_content_hash
 
 # Disable SSL warnings for API calls
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+logger = logging.getLogger(__name__)
+
+
+class QuestionCache:
+    """
+    Two-tier cache for upstream question payloads.
+
+    The first tier is a bounded in-process LRU. The second tier is a small
+    SQLite file shared by every gunicorn worker on the host, so a payload
+    fetched by one worker is served to the others without another upstream
+    call. Entries expire after ``ttl_seconds`` but are kept for another
+    ``stale_seconds`` so ``get_stale`` can still serve them while upstream
+    is down. The SQLite tier is also trimmed to ``max_bytes`` by evicting
+    the least recently used rows.
+    If the SQLite file cannot be opened (e.g. read-only filesystem) the
+    cache degrades to the in-process tier only.
+    """
+
+    def __init__(self, db_path: Optional[str], ttl_seconds: int = 600,
+                 max_memory_entries: int = 256, max_bytes: int = 64 * 1024 * 1024,
+                 stale_seconds: int = 24 * 3600):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_bytes = max_bytes
+        self._memory: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'stale_hits': 0, 'misses': 0, 'stores': 0,
+                          'evictions': 0}
+        if self.db_path:
+            try:
+                self._init_db()
+            except sqlite3.Error as e:
+                logger.warning("Question cache disk tier disabled (%s): %s", self.db_path, e)
+                self.db_path = None
+
+    @staticmethod
+    def make_key(subject: str, exam_type: str, year: Optional[str], limit: int) -> str:
+        return f"{subject.lower()}|{exam_type.lower()}|{year or ''}|{limit}"
+
+    @staticmethod
+    def _encode(payload: Dict) -> str:
+        return json.dumps(payload, separators=(',', ':'))
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS question_cache ('
+                ' key TEXT PRIMARY KEY,'
+                ' payload TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' last_access REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS ix_question_cache_last_access ON question_cache (last_access)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS question_fetch_lease ('
+                ' key TEXT PRIMARY KEY,'
+                ' owner TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL)'
+            )
+
+    def _bump(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def _remember(self, key: str, expires_at: float, payload: Dict) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, payload)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a fresh cached payload for ``key`` or None."""
+        payload, tier = self._lookup(key)
+        self._bump(f'{tier}_hits' if tier else 'misses')
+        return payload
+
+    def peek(self, key: str) -> Optional[Dict]:
+        """Like get, but not counted as a hit or miss; for callers polling for a payload to land."""
+        payload, _ = self._lookup(key)
+        return payload
+
+    def get_stale(self, key: str) -> Optional[Dict]:
+        """Return a cached payload for ``key`` even if expired, as long as it is within the stale window."""
+        payload, _ = self._lookup(key, stale=True)
+        if payload is not None:
+            self._bump('stale_hits')
+        return payload
+
+    def _lookup(self, key: str, stale: bool = False) -> Tuple[Optional[Dict], Optional[str]]:
+        now = time.time()
+        threshold = now - self.stale_seconds if stale else now
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > threshold:
+                    self._memory.move_to_end(key)
+                    return entry[1], 'memory'
+                if entry[0] + self.stale_seconds <= now:
+                    del self._memory[key]
+
+        if self.db_path:
+            try:
+                with closing(self._connect()) as conn:
+                    row = conn.execute(
+                        'SELECT payload, expires_at FROM question_cache WHERE key = ? AND expires_at > ?',
+                        (key, threshold),
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute('UPDATE question_cache SET last_access = ? WHERE key = ?', (now, key))
+            except sqlite3.Error as e:
+                logger.warning("Question cache read failed: %s", e)
+                row = None
+            if row is not None:
+                payload = json.loads(row[0])
+                self._remember(key, row[1], payload)
+                return payload, 'disk'
+
+        return None, None
+
+    def set(self, key: str, payload: Dict) -> None:
+        """Store ``payload`` in both tiers and trim the disk tier if needed."""
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        self._remember(key, expires_at, payload)
+        self._bump('stores')
+        if not self.db_path:
+            return
+        encoded = self._encode(payload)
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO question_cache (key, payload, size, expires_at, last_access) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, encoded, len(encoded), expires_at, now),
+                )
+                self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning("Question cache write failed: %s", e)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute('DELETE FROM question_cache WHERE expires_at <= ?', (now - self.stale_seconds,))
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM question_cache').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute('SELECT key, size FROM question_cache ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM question_cache WHERE key = ?', (key,))
+            total -= size
+            evicted += 1
+        self._bump('evictions', evicted)
+
+    def acquire_lease(self, key: str, owner: str, ttl_seconds: float) -> bool:
+        """
+        Try to become the one worker fetching ``key`` from upstream.
+
+        Returns True when the lease was granted (or there is no shared tier to
+        coordinate through), False while another live owner holds it.
+        """
+        if not self.db_path:
+            return True
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute(
+                    'SELECT owner, expires_at FROM question_fetch_lease WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and row[0] != owner and row[1] > now:
+                    conn.execute('COMMIT')
+                    return False
+                conn.execute(
+                    'INSERT OR REPLACE INTO question_fetch_lease (key, owner, expires_at) VALUES (?, ?, ?)',
+                    (key, owner, now + ttl_seconds),
+                )
+                conn.execute('COMMIT')
+                return True
+        except sqlite3.Error as e:
+            logger.warning("Question fetch lease failed: %s", e)
+            return True
+
+    def lease_held(self, key: str) -> bool:
+        if not self.db_path:
+            return False
+        try:
+            with closing(self._connect()) as conn:
+                row = conn.execute(
+                    'SELECT 1 FROM question_fetch_lease WHERE key = ? AND expires_at > ?', (key, time.time())
+                ).fetchone()
+        except sqlite3.Error:
+            return False
+        return row is not None
+
+    def release_lease(self, key: str, owner: str) -> None:
+        if not self.db_path:
+            return
+        try:
+            with closing(self._connect()) as conn:
+                conn.execute('DELETE FROM question_fetch_lease WHERE key = ? AND owner = ?', (key, owner))
+        except sqlite3.Error as e:
+            logger.warning("Question fetch lease release failed: %s", e)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.db_path:
+            with closing(self._connect()) as conn:
+                conn.execute('DELETE FROM question_cache')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters['memory_entries'] = len(self._memory)
+        lookups = counters['memory_hits'] + counters['disk_hits'] + counters['misses']
+        counters['hit_ratio'] = round((counters['memory_hits'] + counters['disk_hits']) / lookups, 4) if lookups else 0.0
+        counters['disk_enabled'] = bool(self.db_path)
+        return counters
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent fetches of the same cache key.
+
+    Within a process, the first thread to ask for a key becomes the leader and
+    every other thread waits for its result. Across gunicorn workers, the
+    leader also takes a lease in the shared cache file; a worker that finds
+    the lease held polls the shared cache for the leader's payload instead of
+    calling upstream itself, and only fetches on its own if the lease expires
+    without a payload appearing.
+    """
+
+    def __init__(self, cache: QuestionCache, lease_seconds: float = 45, poll_interval: float = 0.1):
+        self.cache = cache
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Dict] = {}
+        self._counters = {'leader_calls': 0, 'coalesced_threads': 0, 'coalesced_workers': 0}
+
+    def do(self, key: str, fetch) -> Dict:
+        """Return ``fetch()`` for ``key``, sharing one in-flight call among concurrent callers."""
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = {'done': threading.Event(), 'result': None}
+                self._in_flight[key] = flight
+            else:
+                self._counters['coalesced_threads'] += 1
+
+        if not leader:
+            flight['done'].wait()
+            return dict(flight['result'], coalesced=True)
+
+        try:
+            flight['result'] = self._lead(key, fetch)
+            return flight['result']
+        except Exception as e:
+            flight['result'] = {'success': False, 'error': f'Request failed: {str(e)}', 'status_code': None}
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight['done'].set()
+
+    def _lead(self, key: str, fetch) -> Dict:
+        owner = f'{os.getpid()}:{threading.get_ident()}'
+        while not self.cache.acquire_lease(key, owner, self.lease_seconds):
+            # Another worker is fetching this key; wait for its payload to land
+            while self.cache.lease_held(key):
+                time.sleep(self.poll_interval)
+                payload = self.cache.peek(key)
+                if payload is not None:
+                    with self._lock:
+                        self._counters['coalesced_workers'] += 1
+                    return {'success': True, 'data': payload, 'status_code': 200, 'cached': True, 'coalesced': True}
+            payload = self.cache.peek(key)
+            if payload is not None:
+                with self._lock:
+                    self._counters['coalesced_workers'] += 1
+                return {'success': True, 'data': payload, 'status_code': 200, 'cached': True, 'coalesced': True}
+        try:
+            with self._lock:
+                self._counters['leader_calls'] += 1
+            return fetch()
+        finally:
+            self.cache.release_lease(key, owner)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters['in_flight'] = len(self._in_flight)
+        counters['coalesced'] = counters['coalesced_threads'] + counters['coalesced_workers']
+        return counters
+
+
+class CircuitBreaker:
+    """
+    Per-process circuit breaker for the questions API.
+
+    ``failure_threshold`` consecutive failures open the circuit. A call that
+    succeeds but takes longer than ``slow_call_ms`` counts as a failure, so
+    latency spikes open it too. While open, calls are refused for
+    ``reset_seconds``; after that a single probe is let through (half-open),
+    and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30, slow_call_ms: float = 8000):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.slow_call_ms = slow_call_ms
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._counters = {'opened': 0, 'rejected': 0}
+
+    def allow(self) -> bool:
+        """Return True if a call may go upstream now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._counters['rejected'] += 1
+            return False
+
+    def record(self, success: bool, elapsed_ms: float) -> None:
+        """Record the outcome of an allowed call."""
+        failed = not success or elapsed_ms > self.slow_call_ms
+        with self._lock:
+            self._probe_in_flight = False
+            if not failed:
+                self._state = self.CLOSED
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self._counters['opened'] += 1
+                    logger.warning("Questions API circuit opened after %s failure(s)", self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._counters, state=self._state, consecutive_failures=self._failures)
+
+
+class StaleRefresher:
+    """Refreshes stale cache entries in the background, at most one pending refresh per key"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._counters = {'scheduled': 0, 'refreshed': 0}
+
+    def schedule(self, app, key: str, subject: str, exam_type: str, year: Optional[str], limit: int) -> None:
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+            self._counters['scheduled'] += 1
+        get_fetch_executor(app).submit(self._refresh, app, key, subject, exam_type, year, limit)
+
+    def _refresh(self, app, key: str, subject: str, exam_type: str, year: Optional[str], limit: int) -> None:
+        try:
+            with app.app_context():
+                service = QuestionsAPIService()
+                result = service.single_flight.do(
+                    key, lambda: service._fetch_remote(subject, exam_type, year, limit, key)
+                )
+                if result['success']:
+                    with self._lock:
+                        self._counters['refreshed'] += 1
+        except Exception:
+            logger.exception("Background refresh of %s failed", key)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._counters, pending=len(self._pending))
+
+
+def get_question_cache(app=None) -> QuestionCache:
+    """Return the process-wide question cache for ``app``, creating it on first use."""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('question_cache')
+    if cache is None:
+        cache = QuestionCache(
+            app.config.get('QUESTIONS_CACHE_PATH'),
+            ttl_seconds=app.config.get('QUESTIONS_CACHE_TTL_SECONDS', 600),
+            max_memory_entries=app.config.get('QUESTIONS_CACHE_MEMORY_ENTRIES', 256),
+            max_bytes=app.config.get('QUESTIONS_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+            stale_seconds=app.config.get('QUESTIONS_CACHE_STALE_SECONDS', 24 * 3600),
+        )
+        app.extensions['question_cache'] = cache
+    return cache
+
+
+def get_single_flight(app=None) -> SingleFlight:
+    """Return the process-wide single-flight coordinator for ``app``."""
+    app = app or current_app._get_current_object()
+    single_flight = app.extensions.get('questions_single_flight')
+    if single_flight is None:
+        single_flight = SingleFlight(
+            get_question_cache(app),
+            lease_seconds=app.config.get('QUESTIONS_FETCH_LEASE_SECONDS', 45),
+        )
+        app.extensions['questions_single_flight'] = single_flight
+    return single_flight
+
+
+class JitteredRetry(Retry):
+    """urllib3 Retry with full jitter so retrying workers don't stampede upstream together"""
+
+    def get_backoff_time(self) -> float:
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+# Connections opened by the current thread's call, counted where they are opened so
+# concurrent calls from other threads are not attributed to it
+_handshakes = threading.local()
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        _handshakes.count = getattr(_handshakes, 'count', 0) + 1
+        super().connect()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _handshakes.count = getattr(_handshakes, 'count', 0) + 1
+        super().connect()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class _CountingHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+
+class QuestionsHTTPClient:
+    """
+    Process-wide keep-alive HTTP client for the questions API.
+
+    Wraps a single ``requests.Session`` whose connection pool is reused by
+    every request handled in this process, and records per-call latency.
+    Calls that had to open a new connection (TCP + TLS handshake) are tracked
+    separately from calls that reused a pooled one, so the handshake share of
+    exam-start latency is visible in ``stats()``.
+
+    Connect errors and 5xx answers are retried with jittered backoff. Read
+    timeouts are not: a hung upstream already held the request thread for
+    ``read_timeout``, so a call never waits longer than one read timeout
+    plus the connect attempts.
+    """
+
+    def __init__(self, pool_size: int = 10, connect_timeout: float = 3.05, read_timeout: float = 15,
+                 retries: int = 2, backoff_factor: float = 0.3, sample_size: int = 500):
+        self.timeout = (connect_timeout, read_timeout)
+        self.adapter = _CountingHTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=JitteredRetry(
+                total=retries,
+                connect=retries,
+                read=False,
+                status=retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset(['GET']),
+                raise_on_status=False,
+            ),
+        )
+        self.session = requests.Session()
+        self.session.verify = False  # Bypass SSL certificate verification
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        self._lock = threading.Lock()
+        self._samples = {'new': deque(maxlen=sample_size), 'reused': deque(maxlen=sample_size)}
+        self._counters = {'calls': 0, 'errors': 0, 'new_connections': 0}
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        _handshakes.count = 0
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.get(url, **kwargs)
+            failed = response.status_code >= 500
+            return response
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            opened = _handshakes.count
+            with self._lock:
+                self._counters['calls'] += 1
+                self._counters['errors'] += int(failed)
+                self._counters['new_connections'] += opened
+                self._samples['new' if opened > 0 else 'reused'].append(elapsed_ms)
+
+    @staticmethod
+    def _summarize(samples: List[float]) -> Dict:
+        if not samples:
+            return {'count': 0}
+        ordered = sorted(samples)
+
+        def pct(p):
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 1)
+
+        return {
+            'count': len(ordered),
+            'mean_ms': round(sum(ordered) / len(ordered), 1),
+            'p50_ms': pct(50),
+            'p95_ms': pct(95),
+            'p99_ms': pct(99),
+            'max_ms': round(ordered[-1], 1),
+        }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = dict(self._counters)
+            new = list(self._samples['new'])
+            reused = list(self._samples['reused'])
+        counters['latency'] = self._summarize(new + reused)
+        counters['latency_new_connection'] = self._summarize(new)
+        counters['latency_reused_connection'] = self._summarize(reused)
+        return counters
+
+
+def get_circuit_breaker(app=None) -> CircuitBreaker:
+    """Return the process-wide circuit breaker guarding the questions API."""
+    app = app or current_app._get_current_object()
+    breaker = app.extensions.get('questions_breaker')
+    if breaker is None:
+        breaker = CircuitBreaker(
+            failure_threshold=app.config.get('QUESTIONS_API_BREAKER_FAILURES', 5),
+            reset_seconds=app.config.get('QUESTIONS_API_BREAKER_RESET_SECONDS', 30),
+            slow_call_ms=app.config.get('QUESTIONS_API_SLOW_CALL_MS', 8000),
+        )
+        app.extensions['questions_breaker'] = breaker
+    return breaker
+
+
+def get_stale_refresher(app=None) -> StaleRefresher:
+    app = app or current_app._get_current_object()
+    refresher = app.extensions.get('questions_refresher')
+    if refresher is None:
+        refresher = StaleRefresher()
+        app.extensions['questions_refresher'] = refresher
+    return refresher
+
+
+def get_http_client(app=None) -> QuestionsHTTPClient:
+    """Return the process-wide pooled HTTP client for ``app``, creating it on first use."""
+    app = app or current_app._get_current_object()
+    client = app.extensions.get('questions_http')
+    if client is None:
+        client = QuestionsHTTPClient(
+            pool_size=app.config.get('QUESTIONS_API_POOL_SIZE', 10),
+            connect_timeout=app.config.get('QUESTIONS_API_CONNECT_TIMEOUT', 3.05),
+            read_timeout=app.config.get('QUESTIONS_API_READ_TIMEOUT', 15),
+            retries=app.config.get('QUESTIONS_API_RETRIES', 2),
+            backoff_factor=app.config.get('QUESTIONS_API_BACKOFF_FACTOR', 0.3),
+        )
+        app.extensions['questions_http'] = client
+    return client
+
+
+def get_fetch_executor(app=None) -> ThreadPoolExecutor:
+    """Return the process-wide bounded thread pool used for concurrent upstream fetches."""
+    app = app or current_app._get_current_object()
+    executor = app.extensions.get('questions_executor')
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=app.config.get('QUESTIONS_API_FANOUT_WORKERS', 8),
+            thread_name_prefix='questions-fetch',
+        )
+        app.extensions['questions_executor'] = executor
+    return executor
+
+
+def _fetch_in_app_context(app, subject: str, exam_type: str, year: Optional[str], limit: int) -> Dict:
+    with app.app_context():
+        started = time.perf_counter()
+        result = QuestionsAPIService().fetch_questions(subject, exam_type, year, limit)
+        result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+
+def fetch_questions_concurrently(jobs: List[Tuple[str, str, Optional[str], int]]) -> List[Dict]:
+    """
+    Fetch several subject/year combinations at once on the shared thread pool.
+
+    Args:
+        jobs: (subject, exam_type, year, limit) tuples
+
+    Returns:
+        One fetch_questions result per job, in the same order, each with an
+        extra 'elapsed_ms'. Total latency is roughly that of the slowest job.
+    """
+    app = current_app._get_current_object()
+    executor = get_fetch_executor(app)
+    futures = [executor.submit(_fetch_in_app_context, app, *job) for job in jobs]
+    results = []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:  # never let one subject fail the whole batch
+            results.append({'success': False, 'error': f'Fetch failed: {str(e)}', 'status_code': None})
+    return results
+
 
 class QuestionsAPIService:
     """Service class to handle external questions API integration"""
@@ -14,8 +687,23 @@ class QuestionsAPIService:
     def __init__(self):
         self.base_url = current_app.config.get('QUESTIONS_API_BASE_URL')
         self.headers = current_app.config.get('QUESTIONS_API_HEADERS')
+        self.cache = get_question_cache()
+        self.client = get_http_client()
+        self.single_flight = get_single_flight()
+        self.breaker = get_circuit_breaker()
+
+    def _endpoint_url(self, limit: int) -> str:
+        """Single-question (/q) URL for limit 1, otherwise the multiple-questions (/m) URL"""
+        if limit <= 1:
+            return self.base_url
+        # Only swap the trailing path segment; the host itself contains "/q"
+        multiple_url = self.base_url.rsplit('/', 1)[0] + '/m'
+        if limit != 40:  # Default limit
+            multiple_url = f"{multiple_url}/{limit}"
+        return multiple_url
     
-    def fetch_questions(self, subject: str, exam_type: str = "utme", year: Optional[str] = None, limit: int = 40) -> Dict:
+    def fetch_questions(self, subject: str, exam_type: str = "utme", year: Optional[str] = None, limit: int = 40,
+                        use_cache: bool = True) -> Dict:
         """
         Fetch questions from external API
         
@@ -24,18 +712,72 @@ class QuestionsAPIService:
             exam_type: Type of exam (default: 'utme')
             year: Optional year filter
             limit: Number of questions to fetch (default: 40)
+            use_cache: Serve from / store into the question cache (default: True)
             
         Returns:
             Dict containing API response or error information
         """
+        cache_key = QuestionCache.make_key(subject, exam_type, year, limit)
+        if not use_cache:
+            return self._fetch_remote(subject, exam_type, year, limit)
+
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return {
+                'success': True,
+                'data': cached,
+                'status_code': 200,
+                'cached': True
+            }
+
+        # Stale-while-revalidate: answer from the last good payload at once and
+        # refresh it in the background. While the circuit is open that refresh is
+        # refused, and the next stale hit schedules another one
+        stale = self.cache.get_stale(cache_key)
+        if stale is not None:
+            get_stale_refresher().schedule(
+                current_app._get_current_object(), cache_key, subject, exam_type, year, limit
+            )
+            return {
+                'success': True,
+                'data': stale,
+                'status_code': 200,
+                'cached': True,
+                'stale': True
+            }
+
+        # Identical concurrent misses share a single upstream call
+        return self.single_flight.do(
+            cache_key, lambda: self._fetch_remote(subject, exam_type, year, limit, cache_key)
+        )
+
+    def _fetch_remote(self, subject: str, exam_type: str, year: Optional[str], limit: int,
+                      cache_key: Optional[str] = None) -> Dict:
+        """Call the upstream API through the circuit breaker; successful payloads
+        are cached under ``cache_key`` when given"""
+        if not self.breaker.allow():
+            return {
+                'success': False,
+                'error': 'Questions service is temporarily unavailable. Please try again shortly.',
+                'status_code': 503,
+                'circuit_open': True
+            }
+        started = time.perf_counter()
+        result = None
+        try:
+            result = self._request_upstream(subject, exam_type, year, limit, cache_key)
+            return result
+        finally:
+            # Always record, even when the call raised, so a half-open probe is released.
+            # 4xx means we asked for something the API doesn't have, not that it is unhealthy
+            healthy = result is not None and (result['success'] or (result.get('status_code') or 500) < 500)
+            self.breaker.record(healthy, (time.perf_counter() - started) * 1000)
+
+    def _request_upstream(self, subject: str, exam_type: str, year: Optional[str], limit: int,
+                          cache_key: Optional[str]) -> Dict:
         try:
             # Use the multiple questions endpoint for better exam experience
-            if limit > 1:
-                api_url = f"{self.base_url.replace('/q', '/m')}"
-                if limit != 40:  # Default limit
-                    api_url = f"{self.base_url.replace('/q', '/m')}/{limit}"
-            else:
-                api_url = self.base_url
+            api_url = self._endpoint_url(limit)
             
             params = {
                 'subject': subject
@@ -48,18 +790,19 @@ class QuestionsAPIService:
             if year:
                 params['year'] = year
             
-            response = requests.get(
+            response = self.client.get(
                 api_url,
                 headers=self.headers,
-                params=params,
-                timeout=30,
-                verify=False  # Bypass SSL certificate verification
+                params=params
             )
             
             if response.status_code == 200:
+                data = response.json()
+                if cache_key and isinstance(data, dict) and data.get('data'):
+                    self.cache.set(cache_key, data)
                 return {
                     'success': True,
-                    'data': response.json(),
+                    'data': data,
                     'status_code': response.status_code
                 }
             else:
@@ -180,6 +923,170 @@ class QuestionsAPIService:
         return self.fetch_questions('insurance', 'utme', year)
 
 
+OPTION_KEYS = ['a', 'b', 'c', 'd', 'e']
+BANK_SOURCE = 'aloc'
+
+
+def get_bank_subject(subject_key: str) -> Subject:
+    """Return (creating if needed) the bank Subject holding stored API questions for ``subject_key``"""
+    subject = Subject.query.filter_by(bank_key=subject_key).first()
+    if subject is None:
+        name = SS2_SS3_SUBJECTS.get(subject_key, subject_key.title())
+        subject = Subject(
+            name=name,
+            description=f'{name} question bank harvested from the external API',
+            duration_minutes=45,
+            bank_key=subject_key,
+        )
+        db.session.add(subject)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker created it first
+            db.session.rollback()
+            subject = Subject.query.filter_by(bank_key=subject_key).one()
+    return subject
+
+
+def _parse_upstream_question(q_data, year: Optional[str] = None) -> Optional[Dict]:
+    if not isinstance(q_data, dict) or not q_data.get('question'):
+        return None
+    try:
+        upstream_id = int(q_data.get('id'))
+    except (TypeError, ValueError):
+        return None
+    option_dict = q_data.get('option') or {}
+    answer = (q_data.get('answer') or '').lower()
+    options = [(option_dict[key], key == answer) for key in OPTION_KEYS if option_dict.get(key)]
+    return {
+        'upstream_id': upstream_id,
+        'text': q_data['question'],
+        'options': options,
+        # aloc names the field examyear; the year the question was requested for fills in when it is missing
+        'year': str(q_data.get('examyear') or q_data.get('year') or year or '') or None,
+        'examtype': q_data.get('examtype') or None,
+        'content_hash': question_content_hash(q_data['question'], [text for text, _ in options]),
+    }
+
+
+def ingest_questions(subject_key: str, questions_data, year: Optional[str] = None) -> Dict:
+    """
+    Upsert upstream questions into the subject's bank as Question/Option rows.
+
+    A question already stored under the same upstream id, or with the same
+    normalized content hash, is not inserted again; missing year/examtype/hash
+    metadata is filled in on the stored row. New questions and their options
+    are written with two bulk INSERTs, so a whole /m payload costs one
+    transaction and a handful of statements.
+
+    Args:
+        subject_key: SS2_SS3_SUBJECTS key
+        questions_data: Upstream /m list (or a single /q question dict)
+        year: Exam year the questions were fetched for, used for questions
+            that carry no examyear of their own
+
+    Returns:
+        Dict with 'inserted', 'updated' and 'duplicates' counts and
+        'question_ids' mapping upstream id to local Question id
+    """
+    if isinstance(questions_data, dict):
+        questions_data = [questions_data]
+    subject = get_bank_subject(subject_key)
+
+    incoming = {}
+    for q_data in questions_data or []:
+        item = _parse_upstream_question(q_data, year)
+        if item is not None:
+            incoming.setdefault(item['upstream_id'], item)
+    if not incoming:
+        return {'inserted': 0, 'updated': 0, 'duplicates': 0, 'question_ids': {}}
+    try:
+        return _ingest(subject, incoming)
+    except IntegrityError:
+        # A concurrent ingest stored some of these rows first; the retry matches them
+        db.session.rollback()
+        return _ingest(subject, incoming)
+
+
+def _ingest(subject: Subject, incoming: Dict[int, Dict]) -> Dict:
+    summary = {'inserted': 0, 'updated': 0, 'duplicates': 0, 'question_ids': {}}
+    hashes = {item['content_hash'] for item in incoming.values()}
+    existing = db.session.query(
+        Question.id, Question.upstream_id, Question.content_hash, Question.year, Question.examtype
+    ).filter(
+        Question.subject_id == subject.id,
+        or_(Question.upstream_id.in_(list(incoming)), Question.content_hash.in_(hashes)),
+    ).all()
+    by_upstream = {row.upstream_id: row for row in existing if row.upstream_id is not None}
+    by_hash = {row.content_hash: row for row in existing if row.content_hash}
+
+    new_items, updates, pending_hash = [], [], {}
+    for upstream_id, item in incoming.items():
+        match = by_upstream.get(upstream_id) or by_hash.get(item['content_hash'])
+        if match is not None:
+            summary['duplicates'] += 1
+            summary['question_ids'][upstream_id] = match.id
+            changes = {
+                field: item[field] for field in ('year', 'examtype', 'content_hash')
+                if item[field] and not getattr(match, field)
+            }
+            if changes:
+                updates.append(dict(changes, id=match.id))
+        elif item['content_hash'] in pending_hash:
+            summary['duplicates'] += 1
+            pending_hash[item['content_hash']].append(upstream_id)
+        else:
+            pending_hash[item['content_hash']] = [upstream_id]
+            new_items.append(item)
+
+    if new_items:
+        # render_nulls keeps rows with missing year/examtype in the same multi-row INSERT
+        inserted = db.session.execute(
+            insert(Question).returning(Question.id, Question.upstream_id).execution_options(render_nulls=True),
+            [
+                {
+                    'subject_id': subject.id,
+                    'text': item['text'],
+                    'source': BANK_SOURCE,
+                    'upstream_id': item['upstream_id'],
+                    'year': item['year'],
+                    'examtype': item['examtype'],
+                    'content_hash': item['content_hash'],
+                }
+                for item in new_items
+            ],
+        ).all()
+        local_ids = {row.upstream_id: row.id for row in inserted}
+        option_rows = [
+            {'question_id': local_ids[item['upstream_id']], 'text': text, 'is_correct': is_correct}
+            for item in new_items
+            for text, is_correct in item['options']
+        ]
+        if option_rows:
+            stored_options = db.session.execute(
+                insert(Option).returning(Option.id, Option.question_id, Option.is_correct), option_rows
+            ).all()
+            correct_options = {}
+            for row in stored_options:
+                if row.is_correct:
+                    correct_options.setdefault(row.question_id, row.id)
+            if correct_options:
+                db.session.execute(update(Question), [
+                    {'id': question_id, 'correct_option_id': option_id}
+                    for question_id, option_id in correct_options.items()
+                ])
+        for item in new_items:
+            for upstream_id in pending_hash[item['content_hash']]:
+                summary['question_ids'][upstream_id] = local_ids[item['upstream_id']]
+        summary['inserted'] = len(new_items)
+
+    if updates:
+        db.session.execute(update(Question), updates)
+        summary['updated'] = len(updates)
+    db.session.commit()
+    return summary
+
+
 # Available subjects for SS2 and SS3 (tested and working)
 SS2_SS3_SUBJECTS = {
     'chemistry': 'Chemistry',
@@ -0,0 +1,221 @@
+"""
+Bulk report cards for a whole class, streamed as one ZIP of PDFs.
+
+Each student's report card HTML is rendered in the calling process (it needs
+the database and Jinja). The CPU-bound xhtml2pdf conversion runs on a
+ProcessPoolExecutor, with at most a few conversions per worker in flight.
+The pool is started on the first export and kept for the app's lifetime, so
+later downloads do not pay process start-up; a pool whose worker died is
+replaced on the next export.
+Results are yielded in student order as soon as the head of that window is
+done, and each PDF is written into the ZIP stream and dropped. Memory use
+therefore depends on the worker count rather than on the class size.
+Reports already in the PDF cache are not converted again, and new ones are
+stored there for the students' own downloads.
+
+With REPORT_CARD_PDF_WORKERS = 0, PDFs are converted inline. Use that on
+hosts that cannot fork worker processes (serverless).
+"""
+import logging
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from werkzeug.utils import secure_filename
+
+from .models import User, UserRole
+from .pdf_cache import get_pdf_cache
+from .report_card import html_to_pdf, report_card_html
+
+logger = logging.getLogger(__name__)
+
+# Conversions queued per worker before the oldest one is waited for
+IN_FLIGHT_PER_WORKER = 2
+
+ProgressCallback = Callable[[int, int], None]
+
+_executor_lock = threading.Lock()
+
+
+def class_names() -> List[str]:
+    """Distinct class names that have at least one student"""
+    rows = (
+        User.query.with_entities(User.class_name)
+        .filter(User.role == UserRole.STUDENT.value, User.class_name.isnot(None))
+        .distinct()
+        .order_by(User.class_name)
+        .all()
+    )
+    return [name for name, in rows if name]
+
+
+def class_students(class_name: str) -> List[User]:
+    return (
+        User.query.filter_by(role=UserRole.STUDENT.value, class_name=class_name)
+        .order_by(User.full_name, User.id)
+        .all()
+    )
+
+
+def report_card_filename(student: User) -> str:
+    return f"{secure_filename(student.full_name) or 'student'}_{student.id}.pdf"
+
+
+def get_pdf_executor(app=None) -> Optional[ProcessPoolExecutor]:
+    """Return the process-wide PDF worker pool for ``app``, starting it on first use; None when workers are off."""
+    app = app or current_app._get_current_object()
+    workers = app.config.get('REPORT_CARD_PDF_WORKERS', 0)
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        executor = app.extensions.get('report_card_executor')
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            app.extensions['report_card_executor'] = executor
+    return executor
+
+
+def _discard_pdf_executor(app, executor: ProcessPoolExecutor) -> None:
+    with _executor_lock:
+        if app.extensions.get('report_card_executor') is executor:
+            del app.extensions['report_card_executor']
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def render_report_cards(students: List[User], workers: Optional[int] = None,
+                        progress: Optional[ProgressCallback] = None) -> Iterator[Tuple[User, Optional[bytes]]]:
+    """
+    Yield (student, pdf_bytes) in the order of ``students``. pdf_bytes is
+    None where xhtml2pdf failed for that student. Runs inside an app context.
+    Conversions run on the shared pool unless ``workers`` asks for a pool of
+    a given size, which then lives only for this call.
+    """
+    app = current_app._get_current_object()
+    shared = workers is None
+    if shared:
+        workers = app.config.get('REPORT_CARD_PDF_WORKERS', 0)
+        executor = get_pdf_executor(app)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    cache = get_pdf_cache()
+    total = len(students)
+    window = max(1, workers * IN_FLIGHT_PER_WORKER)
+    pending: "deque[Tuple[User, str, object]]" = deque()
+    done = 0
+
+    def finish():
+        nonlocal done
+        student, key, result = pending.popleft()
+        if isinstance(result, Future):
+            result = result.result()
+            if result is not None:
+                cache.put(key, result)
+        done += 1
+        if progress:
+            progress(done, total)
+        return student, result
+
+    try:
+        for student in students:
+            html = report_card_html(student)
+            key = cache.make_key(html)
+            result = cache.get(key)
+            if result is None:
+                if executor is not None:
+                    result = executor.submit(html_to_pdf, html)
+                else:
+                    result = html_to_pdf(html)
+                    if result is not None:
+                        cache.put(key, result)
+            pending.append((student, key, result))
+            while len(pending) >= window:
+                yield finish()
+        while pending:
+            yield finish()
+    except BrokenProcessPool:
+        if shared:
+            _discard_pdf_executor(app, executor)
+        raise
+    finally:
+        if executor is not None and not shared:
+            executor.shutdown(wait=False, cancel_futures=True)
+        # An abandoned download leaves nothing queued on the shared pool
+        for _, _, result in pending:
+            if isinstance(result, Future):
+                result.cancel()
+
+
+class _ChunkSink:
+    """Write-only file object that zipfile writes into and the stream drains"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(files: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """Yield a ZIP archive of ``files`` chunk by chunk, one member at a time"""
+    sink = _ChunkSink()
+    # The sink cannot seek, so zipfile writes sizes after each member's data
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
+
+
+def report_card_zip(students: List[User], workers: Optional[int] = None,
+                    progress: Optional[ProgressCallback] = None) -> Iterator[bytes]:
+    """Stream a ZIP holding the report card of each of ``students``"""
+    def files():
+        failed = []
+        for student, pdf in render_report_cards(students, workers, progress):
+            if pdf is None:
+                logger.warning("Report card PDF failed for student %s", student.id)
+                failed.append(student.full_name)
+                continue
+            yield report_card_filename(student), pdf
+        if failed:
+            yield 'FAILED.txt', ('\n'.join(failed) + '\n').encode('utf-8')
+
+    return stream_zip(files())
+
+
+report_cards_cli = AppGroup('report-cards', help='Generate report cards in bulk.')
+
+
+@report_cards_cli.command('export')
+@click.argument('class_name')
+@click.argument('output', type=click.Path(dir_okay=False, writable=True))
+@click.option('--workers', type=int, default=None, help='PDF worker processes (default REPORT_CARD_PDF_WORKERS).')
+def export_command(class_name, output, workers):
+    """Write every report card for CLASS_NAME into the ZIP file OUTPUT."""
+    def progress(done, total):
+        click.echo(f"{done}/{total} report cards rendered")
+
+    students = class_students(class_name)
+    if not students:
+        raise click.ClickException(f"No students in class {class_name!r}.")
+    with open(output, 'wb') as fh:
+        for chunk in report_card_zip(students, workers, progress):
+            fh.write(chunk)
+    click.echo(f"Wrote {output}")
@@ -0,0 +1,157 @@
+"""
+Server-side store for SS2/SS3 API exam papers.
+
+When an API exam starts, the questions shown to the student are frozen into
+an ExamPaper row together with a precomputed answer vector. The exam form
+only carries the paper's opaque token, so the answer key never reaches the
+browser and grading is a keyed lookup instead of re-parsing the payload.
+Grading also records the paper's bank questions in answered_question, so
+later papers can leave them out with one indexed lookup.
+"""
+import json
+import secrets
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from .api_service import OPTION_KEYS
+from .models import AnsweredQuestion, ExamPaper
+
+
+def _compact(questions_data, question_ids: Optional[Dict[int, int]] = None) -> List[Dict]:
+    """Reduce an upstream /m or /q payload to what the exam and results pages need"""
+    if isinstance(questions_data, dict):
+        questions_data = [questions_data]
+    question_ids = question_ids or {}
+    questions = []
+    seen = set()
+    for q_data in questions_data or []:
+        if not isinstance(q_data, dict) or 'question' not in q_data:
+            continue
+        # /m samples with replacement, so one payload can repeat a question
+        if q_data.get('id') is not None:
+            if q_data['id'] in seen:
+                continue
+            seen.add(q_data['id'])
+        option_dict = q_data.get('option') or {}
+        try:
+            upstream_id = int(q_data.get('id'))
+        except (TypeError, ValueError):
+            upstream_id = None
+        questions.append({
+            'id': f'api_{q_data.get("id", "1")}',
+            'qid': q_data.get('qid') or question_ids.get(upstream_id),
+            'question': q_data.get('question', ''),
+            'options': [option_dict[key] for key in OPTION_KEYS if option_dict.get(key)],
+            'answer': option_dict.get(q_data.get('answer', '')),
+            'year': q_data.get('year', ''),
+            'examtype': q_data.get('examtype', ''),
+        })
+    return questions
+
+
+def create_paper(student_id: int, subject_key: str, class_level: str, questions_data,
+                 question_ids: Optional[Dict[int, int]] = None) -> ExamPaper:
+    """
+    Freeze ``questions_data`` into a new paper for the student and return it.
+
+    ``question_ids`` maps upstream ids to the local bank Question ids they
+    were stored under, so each paper entry records which bank row it came from.
+    """
+    questions = _compact(questions_data, question_ids)
+    answer_key = [q.pop('answer') for q in questions]
+    paper = ExamPaper(
+        token=secrets.token_urlsafe(32),
+        student_id=student_id,
+        subject_key=subject_key,
+        class_level=class_level,
+        questions_json=json.dumps(questions, separators=(',', ':')),
+        answer_key_json=json.dumps(answer_key, separators=(',', ':')),
+    )
+    db.session.add(paper)
+    db.session.commit()
+    return paper
+
+
+def paper_questions(paper: ExamPaper) -> List[Dict]:
+    return json.loads(paper.questions_json)
+
+
+def find_paper(token: Optional[str], student_id: int, subject_key: str) -> Optional[ExamPaper]:
+    if not token:
+        return None
+    return ExamPaper.query.filter_by(token=token, student_id=student_id, subject_key=subject_key).first()
+
+
+def grade_paper(paper: ExamPaper, answers) -> List[Dict]:
+    """
+    Grade submitted ``answers`` (a mapping of form key to option text) against
+    the paper's answer vector, store the score and return per-question results.
+    """
+    questions = paper_questions(paper)
+    answer_key = json.loads(paper.answer_key_json)
+    results = []
+    correct_answers = 0
+    for question, correct_answer in zip(questions, answer_key):
+        submitted_answer = answers.get(f'question_{question["id"]}')
+        is_correct = submitted_answer is not None and submitted_answer == correct_answer
+        correct_answers += int(is_correct)
+        results.append({
+            'question': question['question'],
+            'submitted_answer': submitted_answer,
+            'correct_answer': correct_answer,
+            'is_correct': is_correct,
+            'options': [{'option': text, 'answer': text == correct_answer} for text in question['options']],
+        })
+
+    paper.submitted_at = datetime.utcnow()
+    paper.total_questions = len(results)
+    paper.correct_answers = correct_answers
+    paper.score_percentage = (correct_answers / len(results) * 100) if results else 0
+    record_answered(paper.student_id, paper.subject_key, [q['qid'] for q in questions if q.get('qid')])
+    db.session.commit()
+    return results
+
+
+def record_answered(student_id: int, subject_key: str, question_ids: Iterable[int]) -> None:
+    """Add ``question_ids`` to the student's answered bank questions, skipping known ones. The caller commits."""
+    rows = [
+        {"student_id": student_id, "subject_key": subject_key, "question_id": question_id}
+        for question_id in sorted(set(question_ids))
+    ]
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(AnsweredQuestion).values(rows)
+        db.session.execute(stmt.on_conflict_do_nothing(index_elements=["student_id", "subject_key", "question_id"]))
+        return
+    known = {
+        question_id for question_id, in db.session.query(AnsweredQuestion.question_id).filter(
+            AnsweredQuestion.student_id == student_id,
+            AnsweredQuestion.subject_key == subject_key,
+            AnsweredQuestion.question_id.in_([row["question_id"] for row in rows]),
+        )
+    }
+    rows = [row for row in rows if row["question_id"] not in known]
+    if rows:
+        db.session.execute(insert(AnsweredQuestion), rows)
+
+
+def backfill_answered(batch_size: int = 500) -> int:
+    """Fill answered_question from papers submitted before it existed; returns papers read"""
+    papers = (
+        db.session.query(ExamPaper.student_id, ExamPaper.subject_key, ExamPaper.questions_json)
+        .filter(ExamPaper.submitted_at.isnot(None))
+        .order_by(ExamPaper.id)
+        .yield_per(batch_size)
+    )
+    read = 0
+    for student_id, subject_key, questions_json in papers:
+        record_answered(student_id, subject_key, [q['qid'] for q in json.loads(questions_json) if q.get('qid')])
+        read += 1
+    db.session.commit()
+    return read
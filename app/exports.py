@@ -0,0 +1,125 @@
+"""
+Streaming CSV export of exam session results for teachers.
+
+Sessions are read through a ``yield_per`` cursor ordered by session id and
+written out a few hundred rows per chunk, so the header goes out before the
+first batch is fetched and memory stays flat however many sessions match.
+With per-question answers, the responses are read from a second cursor in
+the same session order and merged in as the sessions stream past.
+"""
+import csv
+import io
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import select
+
+from . import db
+from .models import ExamSession, Option, Question, Response, Subject, User, nigeria_grade
+
+FETCH_SIZE = 1000
+ROWS_PER_CHUNK = 500
+
+SESSION_COLUMNS = [
+    "session_id", "student_id", "student_name", "class_name", "subject", "started_at", "completed_at",
+    "duration_seconds", "total_questions", "correct_answers", "score_percentage", "grade",
+]
+
+
+def _cell(value):
+    """Keep spreadsheet apps from evaluating user-entered text as a formula"""
+    if isinstance(value, str) and value[:1] in ("=", "+", "-", "@"):
+        return "'" + value
+    return value
+
+
+def _session_rows(subject_ids: List[int], class_name: Optional[str]):
+    query = (
+        select(
+            ExamSession.id, ExamSession.student_id, User.full_name, User.class_name, Subject.name,
+            ExamSession.started_at, ExamSession.completed_at, ExamSession.total_questions,
+            ExamSession.correct_answers, ExamSession.score_percentage,
+        )
+        .join(User, User.id == ExamSession.student_id)
+        .join(Subject, Subject.id == ExamSession.subject_id)
+        .where(ExamSession.subject_id.in_(subject_ids))
+        .order_by(ExamSession.id)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+    if class_name is not None:
+        query = query.where(User.class_name == class_name)
+    return db.session.execute(query)
+
+
+def _response_rows(subject_id: int, class_name: Optional[str]):
+    query = (
+        select(Response.session_id, Response.question_id, Option.text)
+        .join(ExamSession, ExamSession.id == Response.session_id)
+        .join(Option, Option.id == Response.selected_option_id)
+        .where(ExamSession.subject_id == subject_id)
+        .order_by(Response.session_id)
+        .execution_options(yield_per=FETCH_SIZE)
+    )
+    if class_name is not None:
+        query = query.join(User, User.id == ExamSession.student_id).where(User.class_name == class_name)
+    return db.session.execute(query)
+
+
+def results_csv(subject_ids: List[int], class_name: Optional[str] = None,
+                with_answers: bool = False) -> Iterator[str]:
+    """
+    Yield CSV text for every session of ``subject_ids``, optionally only for
+    students in ``class_name``. ``with_answers`` adds one column per question
+    holding the selected option's text and needs exactly one subject.
+    """
+    question_ids: List[int] = []
+    header = list(SESSION_COLUMNS)
+    if with_answers:
+        if len(subject_ids) != 1:
+            raise ValueError("Per-question answers can only be exported for one subject")
+        questions = (
+            db.session.query(Question.id).filter(Question.subject_id == subject_ids[0]).order_by(Question.id).all()
+        )
+        question_ids = [question_id for question_id, in questions]
+        header += [f"Q{n}" for n in range(1, len(question_ids) + 1)]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+
+    responses = iter(_response_rows(subject_ids[0], class_name)) if with_answers else None
+    pending_response = next(responses, None) if responses else None
+    written = 0
+    for (session_id, student_id, full_name, student_class, subject_name, started_at, completed_at,
+         total, correct, score) in _session_rows(subject_ids, class_name):
+        duration = None
+        if started_at and completed_at:
+            duration = int((completed_at - started_at).total_seconds())
+        row = [
+            session_id, student_id, _cell(full_name), _cell(student_class or ""), _cell(subject_name),
+            started_at.isoformat(sep=" ", timespec="seconds") if started_at else "",
+            completed_at.isoformat(sep=" ", timespec="seconds") if completed_at else "",
+            "" if duration is None else duration,
+            "" if total is None else total,
+            "" if correct is None else correct,
+            "" if score is None else round(score, 2),
+            nigeria_grade(score) if score is not None else "",
+        ]
+        if with_answers:
+            # Both cursors run in session id order, so this session's answers are next
+            answers: Dict[int, str] = {}
+            while pending_response is not None and pending_response[0] <= session_id:
+                if pending_response[0] == session_id:
+                    answers[pending_response[1]] = pending_response[2]
+                pending_response = next(responses, None)
+            row += [_cell(answers.get(question_id, "")) for question_id in question_ids]
+        writer.writerow(row)
+        written += 1
+        if written % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,433 @@
+"""
+Set-based grading for teacher-created exams.
+
+A session is graded with a fixed number of statements regardless of paper
+size: the answer key for the subject is loaded in one query, all submitted
+responses are upserted in one INSERT ... ON CONFLICT statement, and the score
+is computed in memory from the key and the session's responses.
+
+Answer keys are shared across requests by AnswerKeyCache, stamped with the
+subject's key_version. Teacher edits that change a subject's questions or
+options call invalidate_answer_key(), which bumps the version in the database
+(so other workers rebuild on their next lookup) and drops the local entry.
+When the edit moves a question's correct option, regrade_question() adjusts
+the stored scores of just the sessions that picked the old or new option.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import case, delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import selectinload
+
+from . import db
+from .models import ExamSession, Subject, Question, Option, Response, ScoreRegrade, Submission
+from .results import rebuild_results, refresh_result, refresh_subject_results
+
+logger = logging.getLogger(__name__)
+
+
+class AnswerKey:
+    """Question ids of a subject in display order, their correct option and their valid options"""
+
+    def __init__(self, question_ids: List[int], correct: Dict[int, Optional[int]], option_question: Dict[int, int]):
+        self.question_ids = question_ids
+        self.correct = correct
+        self.option_question = option_question
+
+    def __len__(self) -> int:
+        return len(self.question_ids)
+
+    def is_correct(self, question_id: int, option_id: Optional[int]) -> bool:
+        return option_id is not None and self.correct.get(question_id) == option_id
+
+    def score(self, selections: Dict[int, int]) -> Tuple[int, int, float]:
+        """(total, correct, percentage) for ``selections`` mapping question id to option id"""
+        total = len(self.question_ids)
+        correct = sum(1 for qid in self.question_ids if self.is_correct(qid, selections.get(qid)))
+        percentage = (correct / total * 100) if total > 0 else 0
+        return total, correct, percentage
+
+
+def load_answer_key(subject_id: int) -> AnswerKey:
+    """Load every question of ``subject_id`` with its correct and valid options in a single query"""
+    rows = db.session.query(Question.id, Question.correct_option_id, Option.id).outerjoin(
+        Option, Option.question_id == Question.id
+    ).filter(Question.subject_id == subject_id).order_by(Question.id, Option.id).all()
+
+    question_ids, correct, option_question = [], {}, {}
+    for question_id, correct_option_id, option_id in rows:
+        if question_id not in correct:
+            question_ids.append(question_id)
+            correct[question_id] = correct_option_id
+        if option_id is not None:
+            option_question[option_id] = question_id
+    return AnswerKey(question_ids, correct, option_question)
+
+
+class AnswerKeyCache:
+    """Process-wide answer keys per subject, valid while the subject's key_version is unchanged"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._counters = {'hits': 0, 'builds': 0, 'invalidations': 0}
+
+    def get(self, subject: Subject) -> AnswerKey:
+        version = subject.key_version or 0
+        with self._lock:
+            entry = self._entries.get(subject.id)
+            if entry is not None and entry[0] == version:
+                self._counters['hits'] += 1
+                return entry[1]
+        key = load_answer_key(subject.id)
+        with self._lock:
+            self._entries[subject.id] = (version, key)
+            self._counters['builds'] += 1
+        return key
+
+    def invalidate(self, subject_id: int) -> None:
+        with self._lock:
+            self._entries.pop(subject_id, None)
+            self._counters['invalidations'] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._counters, subjects=len(self._entries))
+
+
+def get_answer_key_cache(app=None) -> AnswerKeyCache:
+    """Return the process-wide answer-key cache for ``app``, creating it on first use."""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('answer_key_cache')
+    if cache is None:
+        cache = AnswerKeyCache()
+        app.extensions['answer_key_cache'] = cache
+    return cache
+
+
+def answer_key_for(subject: Subject) -> AnswerKey:
+    """Cached answer key for ``subject``; costs no query while its key_version is current"""
+    return get_answer_key_cache().get(subject)
+
+
+def invalidate_answer_key(subject: Subject) -> None:
+    """
+    Mark the subject's answer key as changed. Call it in the same transaction
+    as the edit; the version bump is an atomic SQL increment.
+    """
+    subject.key_version = Subject.key_version + 1
+    get_answer_key_cache().invalidate(subject.id)
+
+
+def regrade_question(question: Question, old_option_id: Optional[int],
+                     changed_by_id: Optional[int] = None) -> Optional[ScoreRegrade]:
+    """
+    Bring stored scores in line after ``question``'s correct option changed
+    from ``old_option_id`` to ``question.correct_option_id``.
+
+    Only sessions with a response to the question that selected the old or
+    the new option change: +1 correct answer for the new option, -1 for the
+    old one. Each score_percentage is recomputed in the same UPDATE
+    statement. The change is recorded as a ScoreRegrade row, and the
+    affected students' summary rows are refreshed. The caller commits.
+    """
+    new_option_id = question.correct_option_id
+    if old_option_id == new_option_id:
+        return None
+    changed = [option_id for option_id in (old_option_id, new_option_id) if option_id is not None]
+    delta_by_option = case(
+        (Response.selected_option_id == new_option_id, 1),
+        (Response.selected_option_id == old_option_id, -1),
+        else_=0,
+    )
+    affected = select(Response.session_id).where(
+        Response.question_id == question.id, Response.selected_option_id.in_(changed)
+    )
+    scored = (
+        ExamSession.id.in_(affected),
+        ExamSession.correct_answers.isnot(None),
+        ExamSession.total_questions > 0,
+    )
+
+    counts = dict(
+        db.session.query(delta_by_option, func.count())
+        .join(ExamSession, ExamSession.id == Response.session_id)
+        .filter(Response.question_id == question.id, Response.selected_option_id.in_(changed),
+                ExamSession.correct_answers.isnot(None), ExamSession.total_questions > 0)
+        .group_by(delta_by_option)
+        .all()
+    )
+    regrade = ScoreRegrade(
+        subject_id=question.subject_id,
+        question_id=question.id,
+        old_option_id=old_option_id,
+        new_option_id=new_option_id,
+        sessions_gained=counts.get(1, 0),
+        sessions_lost=counts.get(-1, 0),
+        changed_by_id=changed_by_id,
+    )
+    db.session.add(regrade)
+    db.session.flush()
+    if not counts:
+        return regrade
+
+    student_ids = [student_id for student_id, in db.session.query(ExamSession.student_id).filter(
+        *scored, ExamSession.completed_at.isnot(None)
+    ).distinct()]
+    delta = (
+        select(delta_by_option)
+        .where(Response.session_id == ExamSession.id, Response.question_id == question.id)
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(ExamSession)
+        .where(*scored)
+        .values(
+            correct_answers=ExamSession.correct_answers + delta,
+            score_percentage=(ExamSession.correct_answers + delta) * 100.0 / ExamSession.total_questions,
+        )
+        .execution_options(synchronize_session='fetch')
+    )
+    refresh_subject_results(question.subject_id, student_ids)
+    return regrade
+
+
+def session_selections(session_id: int) -> Dict[int, int]:
+    """Map question id to selected option id for every stored response of the session"""
+    rows = db.session.query(Response.question_id, Response.selected_option_id).filter(
+        Response.session_id == session_id
+    )
+    return {question_id: option_id for question_id, option_id in rows}
+
+
+def selections_from_form(form, key: AnswerKey) -> Dict[int, int]:
+    """
+    Read ``question_<id>`` fields for the key's questions, keeping only option
+    ids that belong to the question they were submitted for.
+    """
+    selections = {}
+    for question_id in key.question_ids:
+        value = form.get(f"question_{question_id}")
+        if not value:
+            continue
+        try:
+            option_id = int(value)
+        except (TypeError, ValueError):
+            continue
+        if key.option_question.get(option_id) == question_id:
+            selections[question_id] = option_id
+    return selections
+
+
+def upsert_responses(session_id: int, selections: Dict[int, int]) -> None:
+    """Insert or update the session's responses for ``selections`` in one statement"""
+    upsert_response_rows([
+        {"session_id": session_id, "question_id": question_id, "selected_option_id": option_id}
+        for question_id, option_id in selections.items()
+    ])
+
+
+def upsert_response_rows(rows: List[Dict]) -> None:
+    """Insert or update response rows, possibly of several sessions, in one statement"""
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert_stmt = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(Response).values(rows)
+        db.session.execute(insert_stmt.on_conflict_do_update(
+            index_elements=["session_id", "question_id"],
+            set_={"selected_option_id": insert_stmt.excluded.selected_option_id},
+        ))
+    else:
+        by_session: Dict[int, List[int]] = {}
+        for row in rows:
+            by_session.setdefault(row["session_id"], []).append(row["question_id"])
+        for session_id, question_ids in by_session.items():
+            db.session.execute(delete(Response).where(
+                Response.session_id == session_id, Response.question_id.in_(question_ids)
+            ))
+        db.session.execute(insert(Response), rows)
+
+
+def upsert_open_response_rows(rows: List[Dict]) -> int:
+    """
+    Like upsert_response_rows, but only for sessions that are still open: not
+    completed and without a submission waiting to be graded. The check is part
+    of the statement that writes the rows, so a submit cannot land between the
+    two. Each row's question is taken from its option.
+
+    Returns:
+        The number of rows written
+    """
+    if not rows:
+        return 0
+    pairs = {(row["session_id"], row["selected_option_id"]) for row in rows}
+    session_ids = sorted({session_id for session_id, _ in pairs})
+    source = (
+        select(ExamSession.id, Option.question_id, Option.id)
+        .where(
+            ExamSession.id.in_(session_ids),
+            Option.id.in_(sorted({option_id for _, option_id in pairs})),
+            tuple_(ExamSession.id, Option.id).in_(sorted(pairs)),
+            ExamSession.completed_at.is_(None),
+            ~select(Submission.id).where(
+                Submission.session_id == ExamSession.id, Submission.status.in_(("pending", "processing"))
+            ).exists(),
+        )
+    )
+    columns = ["session_id", "question_id", "selected_option_id"]
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert_stmt = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(Response).from_select(columns, source)
+        result = db.session.execute(insert_stmt.on_conflict_do_update(
+            index_elements=["session_id", "question_id"],
+            set_={"selected_option_id": insert_stmt.excluded.selected_option_id},
+        ))
+    else:
+        db.session.execute(delete(Response).where(
+            tuple_(Response.session_id, Response.question_id).in_(
+                source.with_only_columns(ExamSession.id, Option.question_id)
+            )
+        ))
+        result = db.session.execute(insert(Response).from_select(columns, source))
+    return result.rowcount
+
+
+def store_score(session: ExamSession, total: int, correct: int, percentage: float, complete: bool = True) -> None:
+    if complete:
+        session.completed_at = datetime.utcnow()
+    session.total_questions = total
+    session.correct_answers = correct
+    session.score_percentage = percentage
+
+
+def grade_session(session: ExamSession, new_selections: Optional[Dict[int, int]] = None,
+                  key: Optional[AnswerKey] = None, complete: bool = True) -> Tuple[int, int, float]:
+    """
+    Upsert ``new_selections`` for the session, score every stored response
+    against the answer key, set the session's score fields and refresh the
+    student's StudentSubjectResult row. The caller commits.
+
+    Returns:
+        (total_questions, correct_answers, score_percentage)
+    """
+    key = key or answer_key_for(db.session.get(Subject, session.subject_id))
+    if new_selections:
+        upsert_responses(session.id, new_selections)
+    selections = session_selections(session.id)
+    total, correct, percentage = key.score(selections)
+    store_score(session, total, correct, percentage, complete)
+    if session.completed_at is not None:
+        refresh_result(session.student_id, session.subject_id)
+    return total, correct, percentage
+
+
+def session_details(session: ExamSession) -> List[Dict]:
+    """
+    Per-question breakdown for the session report: each question with its
+    options preloaded, the selected option and the correct option.
+    """
+    questions = (
+        Question.query.options(selectinload(Question.options))
+        .filter(Question.subject_id == session.subject_id)
+        .order_by(Question.id)
+        .all()
+    )
+    selections = session_selections(session.id)
+    details = []
+    for question in questions:
+        options = {option.id: option for option in question.options}
+        correct_option = options.get(question.correct_option_id)
+        selected = options.get(selections.get(question.id))
+        details.append({
+            "question": question,
+            "selected": selected,
+            "correct_option": correct_option,
+            "is_correct": bool(selected and correct_option and selected.id == correct_option.id),
+        })
+    return details
+
+
+def _unscored_sessions():
+    return ExamSession.query.filter(
+        ExamSession.completed_at.isnot(None),
+        (ExamSession.total_questions.is_(None) |
+         ExamSession.correct_answers.is_(None) |
+         ExamSession.score_percentage.is_(None))
+    )
+
+
+def backfill_scores(batch_size: int = 200, limit: Optional[int] = None, echo=None) -> Dict:
+    """
+    Score completed sessions that have no stored score, ``batch_size`` at a time.
+
+    Each batch is committed before the next is read and batches are walked by
+    ascending session id, so an interrupted run simply resumes with whatever is
+    still unscored. Progress is logged and passed to ``echo`` after every batch;
+    the summary's 'last_id' is the last session scored and 'remaining' how many
+    are still unscored. When nothing is unscored it returns after one EXISTS query.
+    """
+    summary = {'pending': 0, 'scored': 0, 'batches': 0, 'last_id': None, 'remaining': 0}
+    if not db.session.query(_unscored_sessions().exists()).scalar():
+        return summary
+    summary['pending'] = _unscored_sessions().count()
+    target = min(summary['pending'], limit) if limit else summary['pending']
+
+    last_id = 0
+    while summary['scored'] < target:
+        size = min(batch_size, target - summary['scored'])
+        batch = _unscored_sessions().filter(ExamSession.id > last_id).order_by(ExamSession.id).limit(size).all()
+        if not batch:
+            break
+        subjects = {
+            subject.id: subject
+            for subject in Subject.query.filter(Subject.id.in_({session.subject_id for session in batch}))
+        }
+        for session in batch:
+            subject = subjects.get(session.subject_id)
+            key = answer_key_for(subject) if subject is not None else AnswerKey([], {}, {})
+            grade_session(session, key=key, complete=False)
+        db.session.commit()
+        last_id = batch[-1].id
+        summary['scored'] += len(batch)
+        summary['batches'] += 1
+        summary['last_id'] = last_id
+        message = f"[{summary['scored']}/{target}] scored sessions up to id {last_id}"
+        logger.info("Score backfill %s", message)
+        if echo:
+            echo(message)
+    summary['remaining'] = summary['pending'] - summary['scored']
+    return summary
+
+
+scores_cli = AppGroup('scores', help='Maintain stored exam session scores.')
+
+
+@scores_cli.command('backfill')
+@click.option('--batch-size', default=200, show_default=True, help='Sessions scored per transaction.')
+@click.option('--limit', type=int, default=None, help='Stop after scoring this many sessions.')
+def backfill_command(batch_size, limit):
+    """Store scores for completed sessions that are missing them."""
+    summary = backfill_scores(batch_size=batch_size, limit=limit, echo=click.echo)
+    if not summary['pending']:
+        click.echo("Nothing to do: every completed session has a stored score.")
+        return
+    click.echo(f"Backfill finished: {summary['scored']} of {summary['pending']} sessions scored "
+               f"in {summary['batches']} batches.")
+    if summary['remaining']:
+        click.echo(f"Stopped after session id {summary['last_id']}; {summary['remaining']} sessions are "
+                   f"still unscored. Run the command again to resume from there.")
+
+
+@scores_cli.command('rebuild-results')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows inserted per statement.')
+def rebuild_results_command(batch_size):
+    """Regenerate the student_subject_result summary table from exam sessions."""
+    written = rebuild_results(batch_size=batch_size, echo=click.echo)
+    click.echo(f"Rebuilt student results: {written} student/subject rows.")
@@ -0,0 +1,207 @@
+"""
+Item analysis of teacher-created subjects.
+
+Completed sessions of a subject are loaded once into a response matrix: one
+row per session and one column per question. Each cell holds the position of
+the selected option within the question's options in id order, or -1 if the
+question was not answered. Every statistic is computed from that matrix
+with NumPy:
+
+- difficulty (p-value): share of sessions answering the question correctly
+- discrimination: point-biserial correlation of the item with the rest of
+  the score (total minus the item), so an item is not correlated with itself
+- option rates: share of sessions selecting each option, distractors included
+- KR-20 reliability of the whole paper
+
+Matrices are kept per subject by ItemAnalysisCache. An analysis first checks
+the subject's key_version. If it is unchanged, only sessions completed since
+the last load are fetched, and their rows are replaced or appended. If the
+questions or the key changed, the matrix is rebuilt from scratch.
+"""
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from flask import current_app
+
+from . import db
+from .grading import answer_key_for
+from .models import ExamSession, Response, Subject
+
+# Flag thresholds shown to teachers
+TOO_EASY = 0.9
+TOO_HARD = 0.2
+LOW_DISCRIMINATION = 0.2
+
+
+class ResponseMatrix:
+    """Selected option positions of a subject's completed sessions"""
+
+    def __init__(self, subject: Subject):
+        key = answer_key_for(subject)
+        self.key_version = subject.key_version or 0
+        self.question_ids: List[int] = list(key.question_ids)
+        self._column = {question_id: n for n, question_id in enumerate(self.question_ids)}
+        options_by_question: Dict[int, List[int]] = {question_id: [] for question_id in self.question_ids}
+        for option_id, question_id in sorted(key.option_question.items()):
+            options_by_question[question_id].append(option_id)
+        # option id -> position within its question
+        self._position = {option_id: n for option_ids in options_by_question.values()
+                          for n, option_id in enumerate(option_ids)}
+        self.option_ids = [options_by_question[question_id] for question_id in self.question_ids]
+        self.option_counts = np.array([len(ids) for ids in self.option_ids], dtype=np.int64)
+        self.correct = np.array(
+            [self._position.get(key.correct.get(question_id), -2) for question_id in self.question_ids],
+            dtype=np.int16,
+        )  # -2 never matches a selection, so keyless questions score nobody
+        self.selected = np.empty((0, len(self.question_ids)), dtype=np.int16)
+        self._row: Dict[int, int] = {}
+        self.watermark: Optional[datetime] = None
+
+    @property
+    def sessions(self) -> int:
+        return self.selected.shape[0]
+
+    def load(self, subject_id: int) -> int:
+        """Fetch sessions completed since the last load into the matrix; returns how many"""
+        query = db.session.query(ExamSession.id, ExamSession.completed_at).filter(
+            ExamSession.subject_id == subject_id, ExamSession.completed_at.isnot(None)
+        )
+        if self.watermark is not None:
+            # >= so sessions sharing the watermark timestamp are re-read; rows are replaced, not duplicated
+            query = query.filter(ExamSession.completed_at >= self.watermark)
+        sessions = query.order_by(ExamSession.id).all()
+        if not sessions:
+            return 0
+
+        new_ids = [session_id for session_id, _ in sessions if session_id not in self._row]
+        if new_ids:
+            grown = np.full((self.sessions + len(new_ids), len(self.question_ids)), -1, dtype=np.int16)
+            grown[:self.sessions] = self.selected
+            for session_id in new_ids:
+                self._row[session_id] = len(self._row)
+            self.selected = grown
+        rows = np.array([self._row[session_id] for session_id, _ in sessions], dtype=np.int64)
+        self.selected[rows] = -1
+
+        responses = query.join(Response, Response.session_id == ExamSession.id).with_entities(
+            Response.session_id, Response.question_id, Response.selected_option_id
+        ).order_by(None).all()
+        cells = [
+            (self._row[session_id], self._column[question_id], self._position[option_id])
+            for session_id, question_id, option_id in responses
+            if session_id in self._row and question_id in self._column and option_id in self._position
+        ]
+        if cells:
+            r, c, v = np.array(cells, dtype=np.int64).T
+            self.selected[r, c] = v
+
+        latest = max(completed_at for _, completed_at in sessions)
+        self.watermark = latest if self.watermark is None else max(self.watermark, latest)
+        return len(sessions)
+
+    def analyse(self) -> Dict:
+        """Per-question difficulty, discrimination and option rates plus KR-20 for the paper"""
+        n, k = self.selected.shape
+        items: List[Dict] = []
+        result = {"sessions": n, "questions": k, "kr20": None, "mean_score": None, "items": items}
+        if k == 0:
+            return result
+
+        scored = (self.selected == self.correct).astype(np.float64)  # n x k of 0/1
+        totals = scored.sum(axis=1)
+        p = scored.mean(axis=0) if n else np.zeros(k)
+        pq = p * (1 - p)
+
+        discrimination = np.full(k, np.nan)
+        if n > 1:
+            rest = totals[:, None] - scored  # n x k score without the item itself
+            item_dev = scored - p
+            rest_dev = rest - rest.mean(axis=0)
+            cov = (item_dev * rest_dev).mean(axis=0)
+            denom = np.sqrt(pq * (rest_dev ** 2).mean(axis=0))
+            np.divide(cov, denom, out=discrimination, where=denom > 0)
+
+        variance = totals.var() if n else 0.0
+        if k > 1 and variance > 0:
+            result["kr20"] = float(k / (k - 1) * (1 - pq.sum() / variance))
+        if n:
+            result["mean_score"] = float(totals.mean())
+
+        width = int(self.option_counts.max()) if k else 0
+        rates = np.zeros((k, width))
+        if n and width:
+            answered = self.selected >= 0
+            columns = np.broadcast_to(np.arange(k), self.selected.shape)[answered]
+            counts = np.bincount(columns * width + self.selected[answered], minlength=k * width)
+            rates = counts.reshape(k, width) / n
+        unanswered = (self.selected < 0).mean(axis=0) if n else np.zeros(k)
+
+        for column, question_id in enumerate(self.question_ids):
+            difficulty = float(p[column]) if n else None
+            disc = None if np.isnan(discrimination[column]) else float(discrimination[column])
+            flags = []
+            if self.correct[column] < 0:
+                flags.append("no correct option")
+            elif n:
+                if difficulty >= TOO_EASY:
+                    flags.append("too easy")
+                elif difficulty <= TOO_HARD:
+                    flags.append("too hard")
+                if disc is not None and disc < 0:
+                    flags.append("check key")
+                elif disc is not None and disc < LOW_DISCRIMINATION:
+                    flags.append("low discrimination")
+            items.append({
+                "question_id": question_id,
+                "difficulty": difficulty,
+                "discrimination": disc,
+                "unanswered": float(unanswered[column]),
+                "options": [
+                    {"option_id": option_id, "rate": float(rates[column, n_option]),
+                     "is_correct": bool(n_option == self.correct[column])}
+                    for n_option, option_id in enumerate(self.option_ids[column])
+                ],
+                "flags": flags,
+            })
+        return result
+
+
+class ItemAnalysisCache:
+    """Response matrices per subject, rebuilt when the subject's key_version changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matrices: Dict[int, ResponseMatrix] = {}
+        self._counters = {'builds': 0, 'updates': 0}
+
+    def analyse(self, subject: Subject) -> Dict:
+        with self._lock:
+            matrix = self._matrices.get(subject.id)
+            if matrix is None or matrix.key_version != (subject.key_version or 0):
+                matrix = ResponseMatrix(subject)
+                self._matrices[subject.id] = matrix
+                self._counters['builds'] += 1
+            else:
+                self._counters['updates'] += 1
+            matrix.load(subject.id)
+            return matrix.analyse()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._counters, subjects=len(self._matrices))
+
+
+def get_item_analysis_cache(app=None) -> ItemAnalysisCache:
+    """Return the process-wide item analysis cache for ``app``, creating it on first use."""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('item_analysis_cache')
+    if cache is None:
+        cache = ItemAnalysisCache()
+        app.extensions['item_analysis_cache'] = cache
+    return cache
+
+
+def analyse_subject(subject: Subject) -> Dict:
+    return get_item_analysis_cache().analyse(subject)
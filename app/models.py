@@ -1,3 +1,6 @@
+import hashlib
+import html
+import re
 from datetime import datetime
 from enum import Enum
 from flask_login import UserMixin
@@ -45,20 +48,45 @@ class Subject(db.Model):
     description = db.Column(db.Text)
     duration_minutes = db.Column(db.Integer, nullable=False, default=30)
     class_name = db.Column(db.String(64))  # Class this subject applies to
-    teacher_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    teacher_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)  # None for question-bank subjects
+    bank_key = db.Column(db.String(64))  # SS2_SS3_SUBJECTS key for harvested question banks
+    key_version = db.Column(db.Integer, nullable=False, default=0)  # bumped whenever the answer key changes
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     questions = db.relationship("Question", backref="subject", cascade="all,delete-orphan", lazy=True)
 
+    __table_args__ = (db.Index("ux_subject_bank_key", "bank_key", unique=True),)
+
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     subject_id = db.Column(db.Integer, db.ForeignKey("subject.id"), nullable=False)
     text = db.Column(db.Text, nullable=False)
     time_limit_seconds = db.Column(db.Integer, nullable=True)  # Optional per-question time limit
+    # Provenance for questions harvested from the external API (None for teacher questions)
+    source = db.Column(db.String(32))
+    upstream_id = db.Column(db.Integer)
+    year = db.Column(db.String(16))
+    examtype = db.Column(db.String(32))
+    content_hash = db.Column(db.String(64))  # question_content_hash() of text + options, for dedup
+    # Authoritative correct answer; Option.is_correct mirrors it for display. No FK
+    # constraint because option.question_id already points back at this table.
+    correct_option_id = db.Column(db.Integer)
 
     options = db.relationship("Option", backref="question", cascade="all,delete-orphan", lazy=True)
 
+    def set_correct_option(self, option):
+        """Make ``option`` (or no option) the correct answer, keeping Option.is_correct in step"""
+        for other in self.options:
+            other.is_correct = other is option
+        self.correct_option_id = option.id if option is not None else None
+
+    __table_args__ = (
+        db.Index("ux_question_subject_upstream", "subject_id", "upstream_id", unique=True),
+        db.Index("ix_question_subject_content_hash", "subject_id", "content_hash"),
+        db.Index("ix_question_subject_year", "subject_id", "year"),
+    )
+
 
 class Option(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -79,6 +107,10 @@ class ExamSession(db.Model):
 
     responses = db.relationship("Response", backref="session", cascade="all,delete-orphan", lazy=True)
 
+    __table_args__ = (
+        db.Index("ix_exam_session_student_subject_completed", "student_id", "subject_id", "completed_at"),
+    )
+
 
 class Response(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -86,6 +118,144 @@ class Response(db.Model):
     question_id = db.Column(db.Integer, db.ForeignKey("question.id"), nullable=False)
     selected_option_id = db.Column(db.Integer, db.ForeignKey("option.id"), nullable=False)
 
+    __table_args__ = (
+        db.Index("ux_response_session_question", "session_id", "question_id", unique=True),
+        db.Index("ix_response_question_option", "question_id", "selected_option_id"),
+    )
+
+
+class ScoreRegrade(db.Model):
+    """Audit record of one answer-key change and the stored scores it adjusted"""
+    __tablename__ = "score_regrade"
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey("subject.id"), nullable=False)
+    question_id = db.Column(db.Integer, nullable=False)  # no FK: the audit outlives deleted questions
+    old_option_id = db.Column(db.Integer)
+    new_option_id = db.Column(db.Integer)
+    sessions_gained = db.Column(db.Integer, nullable=False, default=0)
+    sessions_lost = db.Column(db.Integer, nullable=False, default=0)
+    changed_by_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Submission(db.Model):
+    """Queued final submit of an exam session, graded by the submission workers"""
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey("exam_session.id"), nullable=False)
+    selections_json = db.Column(db.Text, nullable=False)  # {question_id: option_id} from the submitted form
+    status = db.Column(db.String(16), nullable=False, default="pending")  # pending, processing, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(64))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    processed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index("ix_submission_status_id", "status", "id"),
+        db.Index("ix_submission_session", "session_id"),
+        # At most one submission per session waiting to be graded; a second final submit fails on it
+        db.Index(
+            "ux_submission_active", "session_id", unique=True,
+            sqlite_where=db.text("status IN ('pending', 'processing')"),
+            postgresql_where=db.text("status IN ('pending', 'processing')"),
+        ),
+    )
+
+
+class StudentSubjectResult(db.Model):
+    """Per student and subject summary of completed sessions, kept current on every submission"""
+    __tablename__ = "student_subject_result"
+
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey("subject.id"), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    best_score = db.Column(db.Float)
+    latest_session_id = db.Column(db.Integer, db.ForeignKey("exam_session.id"))
+    latest_total = db.Column(db.Integer)
+    latest_correct = db.Column(db.Integer)
+    latest_score = db.Column(db.Float)
+    grade = db.Column(db.String(8))  # nigeria_grade() of latest_score
+    last_completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    subject = db.relationship("Subject")
+
+    __table_args__ = (
+        db.Index("ux_student_subject_result", "student_id", "subject_id", unique=True),
+    )
+
+
+class HarvestCursor(db.Model):
+    """Progress of the question-bank harvester for one subject/exam type/year"""
+    id = db.Column(db.Integer, primary_key=True)
+    subject_key = db.Column(db.String(64), nullable=False)
+    exam_type = db.Column(db.String(32), nullable=False)
+    year = db.Column(db.String(16), nullable=False)
+    calls = db.Column(db.Integer, nullable=False, default=0)
+    questions_found = db.Column(db.Integer, nullable=False, default=0)
+    dry_calls = db.Column(db.Integer, nullable=False, default=0)  # consecutive calls with nothing new
+    completed_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint("subject_key", "exam_type", "year"),)
+
+
+class ExamPaper(db.Model):
+    """Frozen SS2/SS3 API exam paper, referenced from the exam form by an opaque token"""
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(43), unique=True, nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    subject_key = db.Column(db.String(64), nullable=False)
+    class_level = db.Column(db.String(8), nullable=False)
+    questions_json = db.Column(db.Text, nullable=False)  # compact question/option list as shown to the student
+    answer_key_json = db.Column(db.Text, nullable=False)  # correct option text per question, same order
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    submitted_at = db.Column(db.DateTime)
+    total_questions = db.Column(db.Integer)
+    correct_answers = db.Column(db.Integer)
+    score_percentage = db.Column(db.Float)
+
+    __table_args__ = (
+        db.Index("ix_exam_paper_student_subject", "student_id", "subject_key"),
+    )
+
+
+class AnsweredQuestion(db.Model):
+    """Bank question that was on one of a student's submitted API exam papers"""
+    __tablename__ = "answered_question"
+
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    subject_key = db.Column(db.String(64), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey("question.id"), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index("ux_answered_question", "student_id", "subject_key", "question_id", unique=True),
+    )
+
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def _normalize_text(value) -> str:
+    text = html.unescape(_TAG_RE.sub(" ", str(value or "")))
+    return _SPACE_RE.sub(" ", text).strip().lower()
+
+
+def question_content_hash(text: str, option_texts) -> str:
+    """Hash of a question's normalized text and its (order-independent) option texts.
+
+    Markup, entity encoding, case and whitespace differences are ignored, so the
+    same question re-served upstream under another id still deduplicates.
+    """
+    parts = [_normalize_text(text)] + sorted(_normalize_text(o) for o in option_texts)
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
 
 def nigeria_grade(score_percentage: float) -> str:
     if score_percentage >= 75:
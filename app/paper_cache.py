@@ -0,0 +1,82 @@
+"""
+Compiled exam papers, shared by every student sitting a subject.
+
+The questions and options of a subject's exam are the same for everyone, so
+the paper fragment is rendered once per subject and key_version, with all
+options loaded in one query. It is then served to every take_exam page from
+memory. Teacher edits to questions or options go through
+invalidate_answer_key(), and that bump makes every worker rebuild the paper
+on its next request. The fragment's ETag lets a refreshing browser revalidate
+with a 304 and skip the download.
+
+Saved answers are per student, so they are not part of the fragment. The exam
+page applies them after loading the paper.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, NamedTuple
+
+from flask import current_app, render_template
+from sqlalchemy.orm import selectinload
+
+from .models import Question, Subject
+
+
+class CompiledPaper(NamedTuple):
+    version: int
+    etag: str
+    html: str
+
+
+def compile_paper(subject: Subject) -> CompiledPaper:
+    questions = (
+        Question.query.filter_by(subject_id=subject.id)
+        .options(selectinload(Question.options))
+        .order_by(Question.id)
+        .all()
+    )
+    html = render_template("student/_exam_paper.html", questions=questions)
+    etag = hashlib.sha256(html.encode("utf-8")).hexdigest()[:32]
+    return CompiledPaper(subject.key_version or 0, etag, html)
+
+
+class ExamPaperCache:
+    """Compiled papers per subject, valid while the subject's key_version is unchanged"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, CompiledPaper]" = OrderedDict()
+        self._counters = {'hits': 0, 'builds': 0}
+
+    def get(self, subject: Subject) -> CompiledPaper:
+        version = subject.key_version or 0
+        with self._lock:
+            paper = self._entries.get(subject.id)
+            if paper is not None and paper.version == version:
+                self._entries.move_to_end(subject.id)
+                self._counters['hits'] += 1
+                return paper
+        paper = compile_paper(subject)
+        with self._lock:
+            self._entries[subject.id] = paper
+            self._entries.move_to_end(subject.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._counters['builds'] += 1
+        return paper
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries))
+
+
+def get_exam_paper_cache(app=None) -> ExamPaperCache:
+    """Return the process-wide exam paper cache for ``app``, creating it on first use."""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('exam_paper_cache')
+    if cache is None:
+        cache = ExamPaperCache(app.config.get('EXAM_PAPER_CACHE_ENTRIES', 256))
+        app.extensions['exam_paper_cache'] = cache
+    return cache
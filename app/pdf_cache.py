@@ -0,0 +1,123 @@
+"""
+Content-addressed disk cache for generated report-card PDFs.
+
+A PDF is stored under the SHA-256 of the HTML it was rendered from plus
+PDF_RENDER_VERSION. That HTML is a pure function of the report inputs (user
+details, rows, grades and the template itself), so a completed session, a
+renamed student or an edited template produces a new key and the old file is
+simply never asked for again. The same key is the response ETag.
+
+Files live in one directory shared by every worker on the host and are
+written atomically. When the directory grows past ``max_bytes`` the least
+recently served files are removed. With no directory configured (or one that
+cannot be created) the cache stores nothing and every request renders.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict, Optional
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Bump when the HTML to PDF conversion changes in a way the HTML does not show
+PDF_RENDER_VERSION = "1"
+
+
+class PDFCache:
+    def __init__(self, directory: Optional[str], max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        if self.directory:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+            except OSError as e:
+                logger.warning("Report card PDF cache disabled (%s): %s", self.directory, e)
+                self.directory = None
+
+    @staticmethod
+    def make_key(html: str) -> str:
+        return hashlib.sha256(f"{PDF_RENDER_VERSION}\0{html}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pdf")
+
+    def _bump(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.directory:
+            self._bump('misses')
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            os.utime(path)  # mtime doubles as last access for eviction
+        except OSError:
+            self._bump('misses')
+            return None
+        self._bump('hits')
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.directory:
+            return
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning("Could not store report card PDF %s: %s", key, e)
+            return
+        self._bump('stores')
+        self._trim()
+
+    def _trim(self) -> None:
+        entries = []
+        total = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith('.pdf'):
+                        continue
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        except OSError:
+            return
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self._bump('evictions')
+            if total <= self.max_bytes:
+                break
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+def get_pdf_cache(app=None) -> PDFCache:
+    """Return the report-card PDF cache for ``app``, creating it on first use."""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('pdf_cache')
+    if cache is None:
+        cache = PDFCache(
+            app.config.get('REPORT_CARD_PDF_CACHE_DIR'),
+            max_bytes=app.config.get('REPORT_CARD_PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+        )
+        app.extensions['pdf_cache'] = cache
+    return cache
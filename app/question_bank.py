@@ -0,0 +1,376 @@
+"""
+Local question bank harvested from the external questions API.
+
+``flask questions harvest`` walks every subject in SS2_SS3_SUBJECTS and every
+year the aloc wiki lists for it, calling the /m endpoint repeatedly until a
+subject/year stops yielding new question ids. Questions are stored as regular
+Question/Option rows under one bank Subject per subject key, so API exams can
+be assembled locally instead of waiting on the remote API at exam time.
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.orm import selectinload
+
+from . import db
+from .api_service import (
+    QuestionsAPIService, SS2_SS3_SUBJECTS, OPTION_KEYS, get_bank_subject, get_fetch_executor, ingest_questions,
+)
+from .models import Subject, Question, HarvestCursor, AnsweredQuestion
+
+logger = logging.getLogger(__name__)
+
+
+# Years per subject as documented in aloc-endpoints.wiki/Subject-&-Year.md
+SUBJECT_YEARS = {
+    'english': ['2003', '2004', '2005', '2006', '2007', '2008', '2009', '2010'],
+    'mathematics': ['2006', '2007', '2008', '2009', '2013'],
+    'commerce': ['1900', '2000', '2001', '2002', '2003', '2004', '2005', '2006', '2007', '2008', '2009',
+                 '2010', '2011', '2012', '2013', '2016'],
+    'accounting': ['1997', '2004', '2006', '2007', '2009', '2010', '2011', '2012', '2013', '2014', '2015', '2016'],
+    'biology': ['2003', '2004', '2005', '2006', '2008', '2009', '2010', '2011', '2012'],
+    'physics': ['2006', '2007', '2009', '2010', '2011', '2012'],
+    'chemistry': ['2001', '2002', '2003', '2004', '2005', '2006', '2010'],
+    'government': ['1999', '2000', '2006', '2007', '2008', '2009', '2010', '2011', '2012', '2013', '2016'],
+    'geography': ['2006', '2007', '2008', '2009', '2010', '2011', '2012', '2013', '2014'],
+    'economics': ['2001', '2003', '2004', '2005', '2006', '2007', '2008', '2009', '2010', '2011', '2012', '2013'],
+    'insurance': ['1', '2', '3', '4', '5', '2014', '2015'],
+    'history': ['2013'],
+}
+
+# Subjects the wiki says must be queried with a specific exam type
+SUBJECT_EXAM_TYPES = {
+    'history': 'post-utme-aaua',
+}
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at least ``1 / rate`` seconds apart"""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _harvest_year(app, subject_key: str, exam_type: str, year: str, subject_lock: threading.Lock,
+                  limiter: RateLimiter, batch_size: int, max_calls: int, saturation: int) -> Dict:
+    """Call /m for one subject/year until ``saturation`` consecutive calls bring nothing new"""
+    with app.app_context():
+        cursor = HarvestCursor.query.filter_by(subject_key=subject_key, exam_type=exam_type, year=year).first()
+        if cursor is None:
+            cursor = HarvestCursor(subject_key=subject_key, exam_type=exam_type, year=year,
+                                   calls=0, questions_found=0, dry_calls=0)
+            db.session.add(cursor)
+            db.session.commit()
+        if cursor.completed_at is not None:
+            return {'subject': subject_key, 'year': year, 'added': 0, 'calls': 0, 'skipped': True}
+
+        service = QuestionsAPIService()
+        added_total = 0
+        calls = 0
+        error = None
+        while cursor.dry_calls < saturation and cursor.calls < max_calls:
+            limiter.wait()
+            result = service.fetch_questions(subject_key, exam_type, year, limit=batch_size, use_cache=False)
+            calls += 1
+            cursor.calls += 1
+            if not result['success']:
+                error = result['error']
+                db.session.commit()
+                break
+            questions = result['data'].get('data') or []
+            if isinstance(questions, dict):
+                questions = [questions]
+            with subject_lock:
+                added = ingest_questions(subject_key, questions, year)['inserted']
+            added_total += added
+            cursor.questions_found += added
+            cursor.dry_calls = 0 if added else cursor.dry_calls + 1
+            db.session.commit()
+
+        if error is None:
+            cursor.completed_at = datetime.utcnow()
+            db.session.commit()
+        return {'subject': subject_key, 'year': year, 'added': added_total, 'calls': calls,
+                'skipped': False, 'error': error}
+
+
+def harvest(subject_keys: Optional[List[str]] = None, workers: int = 4, rate: float = 2.0,
+            batch_size: int = 40, max_calls: int = 50, saturation: int = 3, echo=print) -> Dict:
+    """
+    Harvest the question bank for ``subject_keys`` (default: all SS2/SS3 subjects).
+
+    Subject/year pairs run on a bounded thread pool; all upstream calls share
+    one rate limiter. Progress is recorded in HarvestCursor rows, so an
+    interrupted run resumes where it stopped.
+    """
+    app = current_app._get_current_object()
+    limiter = RateLimiter(rate)
+    subject_keys = subject_keys or list(SS2_SS3_SUBJECTS)
+
+    for subject_key in subject_keys:
+        get_bank_subject(subject_key)
+    # Workers on the same subject ingest one at a time so dedup sees each other's rows
+    subject_locks = {subject_key: threading.Lock() for subject_key in subject_keys}
+
+    jobs = [
+        (subject_key, SUBJECT_EXAM_TYPES.get(subject_key, 'utme'), year)
+        for subject_key in subject_keys
+        for year in SUBJECT_YEARS.get(subject_key, [])
+    ]
+    summary = {'jobs': len(jobs), 'added': 0, 'calls': 0, 'skipped': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            pool.submit(_harvest_year, app, subject_key, exam_type, year, subject_locks[subject_key],
+                        limiter, batch_size, max_calls, saturation)
+            for subject_key, exam_type, year in jobs
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            summary['added'] += result['added']
+            summary['calls'] += result['calls']
+            summary['skipped'] += int(result['skipped'])
+            summary['failed'] += int(bool(result.get('error')))
+            status = 'skipped (done)' if result['skipped'] else (
+                f"failed: {result['error']}" if result.get('error') else f"+{result['added']} in {result['calls']} calls"
+            )
+            echo(f"[{done}/{len(jobs)}] {result['subject']} {result['year']}: {status}")
+    return summary
+
+
+def bank_question_count(subject_key: str) -> int:
+    subject = Subject.query.filter_by(bank_key=subject_key).first()
+    if subject is None:
+        return 0
+    return Question.query.filter_by(subject_id=subject.id).count()
+
+
+class QuestionPool:
+    """
+    Per-process index of bank question ids per subject (and optionally year).
+
+    Id lists are loaded with one indexed query and kept for ``ttl_seconds``,
+    so assembling a paper only samples from memory and loads the N chosen
+    rows by primary key. When a pool runs low the pool schedules a top-up
+    from upstream on the shared fetch executor; assembly never waits on it.
+    """
+
+    def __init__(self, ttl_seconds: float = 60, low_water: int = 2, topup_batch: int = 40):
+        self.ttl_seconds = ttl_seconds
+        self.low_water = low_water
+        self.topup_batch = topup_batch
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._topups = set()
+        self._counters = {'assembled': 0, 'short': 0, 'loads': 0, 'topups': 0, 'topup_added': 0}
+
+    def ids(self, subject_key: str, year: Optional[str] = None) -> Tuple[List[int], Set[int]]:
+        """Return the pool's id list and id set, reloading them once ``ttl_seconds`` have passed"""
+        key = (subject_key, year)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._ids.get(key)
+            if entry is not None and entry[0] > now:
+                return entry[1], entry[2]
+        subject = Subject.query.filter_by(bank_key=subject_key).first()
+        ids = []
+        if subject is not None:
+            query = db.session.query(Question.id).filter(Question.subject_id == subject.id)
+            if year:
+                query = query.filter(Question.year == year)
+            ids = [row[0] for row in query]
+        id_set = set(ids)
+        with self._lock:
+            self._ids[key] = (now + self.ttl_seconds, ids, id_set)
+            self._counters['loads'] += 1
+        return ids, id_set
+
+    def invalidate(self, subject_key: str) -> None:
+        with self._lock:
+            for key in [key for key in self._ids if key[0] == subject_key]:
+                del self._ids[key]
+
+    def schedule_topup(self, app, subject_key: str, year: Optional[str] = None) -> None:
+        key = (subject_key, year)
+        with self._lock:
+            if key in self._topups:
+                return
+            self._topups.add(key)
+            self._counters['topups'] += 1
+        get_fetch_executor(app).submit(self._topup, app, subject_key, year)
+
+    def _topup(self, app, subject_key: str, year: Optional[str]) -> None:
+        try:
+            with app.app_context():
+                exam_type = SUBJECT_EXAM_TYPES.get(subject_key, 'utme')
+                result = QuestionsAPIService().fetch_questions(
+                    subject_key, exam_type, year, limit=self.topup_batch, use_cache=False
+                )
+                if result['success']:
+                    added = ingest_questions(subject_key, result['data'].get('data') or [], year)['inserted']
+                    self.invalidate(subject_key)
+                    with self._lock:
+                        self._counters['topup_added'] += added
+        except Exception:
+            logger.exception("Question pool top-up for %s failed", subject_key)
+        finally:
+            with self._lock:
+                self._topups.discard((subject_key, year))
+
+    def assemble(self, subject_key: str, size: int, exclude=(), year: Optional[str] = None,
+                 app=None) -> Optional[List[int]]:
+        """
+        Pick ``size`` distinct question ids not in ``exclude``, or return None
+        when the pool cannot cover the paper. Schedules a top-up whenever fewer
+        than ``low_water * size`` unseen questions remain.
+        """
+        app = app or current_app._get_current_object()
+        ids, id_set = self.ids(subject_key, year)
+        exclude = set(exclude)
+        available = len(ids) - len(exclude & id_set)
+        if available < size * self.low_water:
+            self.schedule_topup(app, subject_key, year)
+        if available < size:
+            with self._lock:
+                self._counters['short'] += 1
+            return None
+
+        # Rejection sampling: expected O(size) draws while unseen questions dominate the pool
+        chosen = []
+        picked = set()
+        draws = 0
+        while len(chosen) < size and draws < size * 20:
+            qid = ids[random.randrange(len(ids))]
+            draws += 1
+            if qid not in picked and qid not in exclude:
+                picked.add(qid)
+                chosen.append(qid)
+        if len(chosen) < size:
+            remaining = [qid for qid in ids if qid not in picked and qid not in exclude]
+            chosen.extend(random.sample(remaining, size - len(chosen)))
+        with self._lock:
+            self._counters['assembled'] += 1
+        return chosen
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(
+                self._counters,
+                pools={f'{subject}:{year or "all"}': len(entry[1]) for (subject, year), entry in self._ids.items()},
+                pending_topups=len(self._topups),
+            )
+
+
+def get_question_pool(app=None) -> QuestionPool:
+    """Return the process-wide question pool for ``app``, creating it on first use."""
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get('question_pool')
+    if pool is None:
+        pool = QuestionPool(
+            ttl_seconds=app.config.get('QUESTION_POOL_TTL_SECONDS', 60),
+            low_water=app.config.get('QUESTION_POOL_LOW_WATER', 2),
+            topup_batch=app.config.get('QUESTION_POOL_TOPUP_BATCH', 40),
+        )
+        app.extensions['question_pool'] = pool
+    return pool
+
+
+def answered_question_ids(student_id: int, subject_key: str) -> Set[int]:
+    """Bank question ids on the student's submitted papers for ``subject_key`` (one index range scan)"""
+    rows = db.session.query(AnsweredQuestion.question_id).filter(
+        AnsweredQuestion.student_id == student_id,
+        AnsweredQuestion.subject_key == subject_key,
+    )
+    return {question_id for question_id, in rows}
+
+
+def assemble_paper(subject_key: str, size: int, student_id: Optional[int] = None,
+                   year: Optional[str] = None) -> Optional[List[Dict]]:
+    """
+    Draw ``size`` unique bank questions the student has not answered before,
+    in the upstream /m payload shape, or None when the local pool is too small.
+    """
+    exclude = answered_question_ids(student_id, subject_key) if student_id else set()
+    chosen = get_question_pool().assemble(subject_key, size, exclude, year)
+    if chosen is None:
+        return None
+    questions = (
+        Question.query.options(selectinload(Question.options))
+        .filter(Question.id.in_(chosen))
+        .all()
+    )
+    by_id = {question.id: question for question in questions}
+    payload = []
+    for qid in chosen:
+        question = by_id.get(qid)
+        if question is None:
+            continue
+        options = sorted(question.options, key=lambda o: o.id)
+        option_dict = {key: opt.text for key, opt in zip(OPTION_KEYS, options)}
+        answer = next((key for key, opt in zip(OPTION_KEYS, options) if opt.id == question.correct_option_id), '')
+        payload.append({
+            'id': question.upstream_id,
+            'qid': question.id,
+            'question': question.text,
+            'option': option_dict,
+            'answer': answer,
+            'year': question.year or '',
+            'examtype': question.examtype or '',
+            'subject': subject_key,
+        })
+    return payload
+
+
+questions_cli = AppGroup('questions', help='Manage the local question bank.')
+
+
+@questions_cli.command('harvest')
+@click.option('--subject', 'subjects', multiple=True, type=click.Choice(sorted(SS2_SS3_SUBJECTS)),
+              help='Subject key to harvest (repeatable). Defaults to all SS2/SS3 subjects.')
+@click.option('--workers', default=4, show_default=True, help='Concurrent subject/year workers.')
+@click.option('--rate', default=2.0, show_default=True, help='Maximum upstream calls per second.')
+@click.option('--batch-size', default=40, show_default=True, help='Questions requested per /m call.')
+@click.option('--max-calls', default=50, show_default=True, help='Upper bound on calls per subject/year.')
+@click.option('--saturation', default=3, show_default=True,
+              help='Stop a subject/year after this many consecutive calls with no new questions.')
+@click.option('--restart', is_flag=True, help='Forget previous progress and walk every subject/year again.')
+def harvest_command(subjects, workers, rate, batch_size, max_calls, saturation, restart):
+    """Harvest questions for every subject and year into the local bank."""
+    subject_keys = list(subjects) or list(SS2_SS3_SUBJECTS)
+    if restart:
+        HarvestCursor.query.filter(HarvestCursor.subject_key.in_(subject_keys)).delete(synchronize_session=False)
+        db.session.commit()
+    summary = harvest(subject_keys, workers=workers, rate=rate, batch_size=batch_size,
+                      max_calls=max_calls, saturation=saturation, echo=click.echo)
+    click.echo(
+        f"Harvest finished: {summary['added']} new questions from {summary['calls']} calls "
+        f"({summary['skipped']} subject/years already done, {summary['failed']} failed)."
+    )
+
+
+@questions_cli.command('status')
+def status_command():
+    """Show how many questions the local bank holds per subject."""
+    for subject_key, name in SS2_SS3_SUBJECTS.items():
+        done = HarvestCursor.query.filter(
+            HarvestCursor.subject_key == subject_key, HarvestCursor.completed_at.isnot(None)
+        ).count()
+        click.echo(f"{name:<20} {bank_question_count(subject_key):>6} questions  "
+                   f"{done}/{len(SUBJECT_YEARS.get(subject_key, []))} years harvested")
@@ -1,19 +1,73 @@
-from flask import Blueprint, render_template
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+from flask import Blueprint, current_app, jsonify, render_template
 from flask_login import login_required, current_user
-from .models import ExamSession, Question, Option, Response, nigeria_grade
+from markupsafe import Markup
+from . import db
+from .models import ExamSession, Subject, nigeria_grade
+from .grading import session_details
+from .submissions import active_submission, grade_if_stale
 
 report_bp = Blueprint("report", __name__)
 
 
-@report_bp.route("/session/<int:session_id>")
-@login_required
-def session_report(session_id):
-    session = ExamSession.query.get_or_404(session_id)
-    if session.student_id != current_user.id and not current_user.is_teacher():
-        return render_template("errors/403.html"), 403
+class SessionReportCache:
+    """
+    Rendered report bodies of completed sessions, least recently used evicted.
+
+    A completed session's report only changes when the session is submitted
+    again (new completed_at) or the subject's questions change (key_version
+    bump), so both are part of the key and stale entries simply age out. A
+    deleted subject can change no further and keys as version 0.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Markup]" = OrderedDict()
+        self._counters = {'hits': 0, 'misses': 0}
 
-    questions = Question.query.filter_by(subject_id=session.subject_id).all()
-    details = []
+    @staticmethod
+    def make_key(session: ExamSession, subject: Optional[Subject]) -> Hashable:
+        version = (subject.key_version or 0) if subject is not None else 0
+        return session.id, version, session.completed_at
+
+    def get(self, key: Hashable) -> Optional[Markup]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return body
+
+    def set(self, key: Hashable, body: Markup) -> None:
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries))
+
+
+def get_session_report_cache(app=None) -> SessionReportCache:
+    """Return the process-wide session report cache for ``app``, creating it on first use."""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get('session_report_cache')
+    if cache is None:
+        cache = SessionReportCache(app.config.get('SESSION_REPORT_CACHE_ENTRIES', 512))
+        app.extensions['session_report_cache'] = cache
+    return cache
+
+
+def render_session_body(session: ExamSession) -> Markup:
+    details = session_details(session)
 
     # Use stored scores if available, otherwise calculate
     if session.total_questions is not None and session.correct_answers is not None and session.score_percentage is not None:
@@ -22,31 +76,49 @@ def session_report(session_id):
         percentage = session.score_percentage
     else:
         # Fallback: calculate scores (for old sessions)
-        total = len(questions)
-        correct = 0
-        
-        for q in questions:
-            resp = Response.query.filter_by(session_id=session.id, question_id=q.id).first()
-            selected = Option.query.get(resp.selected_option_id) if resp else None
-            correct_option = Option.query.filter_by(question_id=q.id, is_correct=True).first()
-            is_correct = selected and selected.id == (correct_option.id if correct_option else None)
-            correct += 1 if is_correct else 0
-        
+        total = len(details)
+        correct = sum(1 for d in details if d["is_correct"])
         percentage = (correct / total * 100) if total else 0
 
-    # Get detailed results for display
-    for q in questions:
-        resp = Response.query.filter_by(session_id=session.id, question_id=q.id).first()
-        selected = Option.query.get(resp.selected_option_id) if resp else None
-        correct_option = Option.query.filter_by(question_id=q.id, is_correct=True).first()
-        is_correct = selected and selected.id == (correct_option.id if correct_option else None)
-        details.append({
-            "question": q,
-            "selected": selected,
-            "correct_option": correct_option,
-            "is_correct": is_correct,
-        })
-
     grade = nigeria_grade(percentage)
 
-    return render_template("report/session.html", session=session, details=details, total=total, correct=correct, percentage=percentage, grade=grade)
+    return Markup(render_template("report/_session_body.html", session=session, details=details, total=total,
+                                  correct=correct, percentage=percentage, grade=grade))
+
+
+@report_bp.route("/session/<int:session_id>")
+@login_required
+def session_report(session_id):
+    session = ExamSession.query.get_or_404(session_id)
+    if session.student_id != current_user.id and not current_user.is_teacher():
+        return render_template("errors/403.html"), 403
+
+    # A queued submission is shown as pending until a worker (or grade_if_stale) grades it
+    submission = active_submission(session.id)
+    if submission is not None and not grade_if_stale(submission):
+        return render_template("report/pending.html", session=session, submission=submission)
+
+    if session.completed_at is None:
+        body = render_session_body(session)
+    else:
+        cache = get_session_report_cache()
+        key = cache.make_key(session, db.session.get(Subject, session.subject_id))
+        body = cache.get(key)
+        if body is None:
+            body = render_session_body(session)
+            cache.set(key, body)
+
+    return render_template("report/session.html", session=session, body=body)
+
+
+@report_bp.route("/session/<int:session_id>/status")
+@login_required
+def session_status(session_id):
+    """Grading status polled by the pending report page"""
+    session = ExamSession.query.get_or_404(session_id)
+    if session.student_id != current_user.id and not current_user.is_teacher():
+        return jsonify({"error": "Not authorized"}), 403
+    submission = active_submission(session.id)
+    if submission is None or grade_if_stale(submission):
+        return jsonify({"status": "graded"})
+    return jsonify({"status": submission.status})
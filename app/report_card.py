@@ -0,0 +1,115 @@
+"""
+Report card data shared by the HTML and PDF report card routes.
+
+Rows come from the student's student_subject_result summary rows (one
+indexed range scan); app startup fills that table from older sessions. For a
+student without summary rows, the latest completed session per subject comes
+from one windowed query over that student's sessions, so the cost depends on
+what the student sat rather than on how many subjects exist.
+"""
+from io import BytesIO
+from typing import Dict, List, Optional
+
+from flask import render_template
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from . import db
+from .grading import answer_key_for, session_selections
+from .models import ExamSession, StudentSubjectResult, Subject, User, nigeria_grade
+from xhtml2pdf import pisa
+
+
+def latest_sessions(student_id: int) -> List:
+    """(Subject, ExamSession) pairs for the student's latest completed session in each subject"""
+    ranked = db.session.query(
+        ExamSession.id.label("session_id"),
+        func.row_number().over(
+            partition_by=ExamSession.subject_id,
+            order_by=(ExamSession.completed_at.desc(), ExamSession.id.desc()),
+        ).label("rank"),
+    ).filter(
+        ExamSession.student_id == student_id,
+        ExamSession.completed_at.isnot(None),
+    ).subquery()
+
+    return (
+        db.session.query(Subject, ExamSession)
+        .join(ExamSession, ExamSession.subject_id == Subject.id)
+        .join(ranked, ranked.c.session_id == ExamSession.id)
+        .filter(ranked.c.rank == 1)
+        .order_by(Subject.id)
+        .all()
+    )
+
+
+def report_card_data(student_id: int) -> Dict:
+    """
+    Rows, overall average and overall grade for the student's report card,
+    read from the student's student_subject_result rows. Students with no
+    summary rows fall back to the session query.
+    """
+    results = (
+        StudentSubjectResult.query.options(joinedload(StudentSubjectResult.subject))
+        .filter(StudentSubjectResult.student_id == student_id)
+        .order_by(StudentSubjectResult.subject_id)
+        .all()
+    )
+    if results:
+        rows = []
+        for result in results:
+            total, correct, percentage = result.latest_total, result.latest_correct, result.latest_score
+            if percentage is None:
+                # The latest session was completed without a stored score
+                total, correct, percentage = answer_key_for(result.subject).score(
+                    session_selections(result.latest_session_id)
+                )
+            rows.append({
+                "subject": result.subject,
+                "total": total,
+                "correct": correct,
+                "percentage": percentage,
+                "grade": nigeria_grade(percentage),
+                "completed_at": result.last_completed_at,
+                "attempts": result.attempts,
+                "best": result.best_score,
+            })
+        return _with_overall(rows)
+
+    rows = []
+    for subject, sess in latest_sessions(student_id):
+        # Use stored scores if available, otherwise calculate (for old sessions)
+        if sess.total_questions is not None and sess.correct_answers is not None and sess.score_percentage is not None:
+            total, correct, percentage = sess.total_questions, sess.correct_answers, sess.score_percentage
+        else:
+            total, correct, percentage = answer_key_for(subject).score(session_selections(sess.id))
+        rows.append({
+            "subject": subject,
+            "total": total,
+            "correct": correct,
+            "percentage": percentage,
+            "grade": nigeria_grade(percentage),
+            "completed_at": sess.completed_at,
+        })
+    return _with_overall(rows)
+
+
+def _with_overall(rows: List[Dict]) -> Dict:
+    overall = sum(row["percentage"] for row in rows) / len(rows) if rows else 0
+    return {"rows": rows, "overall": overall, "overall_grade": nigeria_grade(overall)}
+
+
+def report_card_html(user: User) -> str:
+    """The student's report card rendered with the PDF template"""
+    return render_template("student/report_card_pdf.html", user=user, **report_card_data(user.id))
+
+
+def html_to_pdf(html: str) -> Optional[bytes]:
+    """
+    Convert report card HTML to PDF bytes, or None if xhtml2pdf reports an
+    error. Needs no app context, so process pool workers can run it.
+    """
+    pdf = BytesIO()
+    if pisa.CreatePDF(src=html, dest=pdf).err:
+        return None
+    return pdf.getvalue()
@@ -0,0 +1,157 @@
+"""
+Materialized per student/subject results (student_subject_result).
+
+refresh_result() recomputes one student's row for one subject from that
+student's completed sessions with two indexed lookups; the grading path calls
+it in the same transaction as the score it just stored. rebuild_results()
+regenerates the whole table from exam_session, for first deployment or after
+bulk changes; app startup runs it through populate_results() while the table
+is still empty, so an upgraded database never has summary rows for only some
+of a student's subjects. Sessions of deleted subjects get no summary rows.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from . import db
+from .models import ExamSession, StudentSubjectResult, Subject, nigeria_grade
+
+_UPDATE_COLUMNS = (
+    "attempts", "best_score", "latest_session_id", "latest_total", "latest_correct",
+    "latest_score", "grade", "last_completed_at", "updated_at",
+)
+
+
+def _result_row(student_id: int, subject_id: int, attempts: int, best_score: Optional[float],
+                latest: Optional[ExamSession]) -> Dict:
+    latest_score = latest.score_percentage if latest is not None else None
+    return {
+        "student_id": student_id,
+        "subject_id": subject_id,
+        "attempts": attempts,
+        "best_score": best_score,
+        "latest_session_id": latest.id if latest is not None else None,
+        "latest_total": latest.total_questions if latest is not None else None,
+        "latest_correct": latest.correct_answers if latest is not None else None,
+        "latest_score": latest_score,
+        "grade": nigeria_grade(latest_score or 0),
+        "last_completed_at": latest.completed_at if latest is not None else None,
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def _upsert(rows) -> None:
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(StudentSubjectResult).values(rows)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=["student_id", "subject_id"],
+            set_={column: stmt.excluded[column] for column in _UPDATE_COLUMNS},
+        ))
+    else:
+        for row in rows:
+            db.session.execute(delete(StudentSubjectResult).where(
+                StudentSubjectResult.student_id == row["student_id"],
+                StudentSubjectResult.subject_id == row["subject_id"],
+            ))
+        db.session.execute(insert(StudentSubjectResult), rows)
+
+
+def refresh_result(student_id: int, subject_id: int) -> None:
+    """Recompute the student's summary row for the subject. The caller commits."""
+    db.session.flush()
+    completed = ExamSession.query.filter(
+        ExamSession.student_id == student_id,
+        ExamSession.subject_id == subject_id,
+        ExamSession.completed_at.isnot(None),
+    )
+    attempts, best_score = completed.with_entities(
+        func.count(ExamSession.id), func.max(ExamSession.score_percentage)
+    ).one()
+    if not attempts:
+        db.session.execute(delete(StudentSubjectResult).where(
+            StudentSubjectResult.student_id == student_id, StudentSubjectResult.subject_id == subject_id
+        ))
+        return
+    latest = completed.order_by(ExamSession.completed_at.desc(), ExamSession.id.desc()).first()
+    _upsert([_result_row(student_id, subject_id, attempts, best_score, latest)])
+
+
+def _latest_per_student_subject(*criteria):
+    """(latest ExamSession, attempts, best_score) per student and existing subject among completed sessions"""
+    ranked = db.session.query(
+        ExamSession.id.label("session_id"),
+        func.row_number().over(
+            partition_by=(ExamSession.student_id, ExamSession.subject_id),
+            order_by=(ExamSession.completed_at.desc(), ExamSession.id.desc()),
+        ).label("rank"),
+        func.count(ExamSession.id).over(
+            partition_by=(ExamSession.student_id, ExamSession.subject_id)
+        ).label("attempts"),
+        func.max(ExamSession.score_percentage).over(
+            partition_by=(ExamSession.student_id, ExamSession.subject_id)
+        ).label("best_score"),
+    ).filter(ExamSession.completed_at.isnot(None), *criteria).subquery()
+
+    return (
+        db.session.query(ExamSession, ranked.c.attempts, ranked.c.best_score)
+        .join(ranked, ranked.c.session_id == ExamSession.id)
+        .join(Subject, Subject.id == ExamSession.subject_id)
+        .filter(ranked.c.rank == 1)
+        .order_by(ExamSession.id)
+    )
+
+
+def refresh_subject_results(subject_id: int, student_ids: List[int]) -> None:
+    """Recompute the summary rows of ``student_ids`` for one subject in one query. The caller commits."""
+    if not student_ids:
+        return
+    db.session.flush()
+    rows = [
+        _result_row(sess.student_id, sess.subject_id, attempts, best_score, sess)
+        for sess, attempts, best_score in _latest_per_student_subject(
+            ExamSession.subject_id == subject_id, ExamSession.student_id.in_(student_ids)
+        )
+    ]
+    if rows:
+        _upsert(rows)
+
+
+def rebuild_results(batch_size: int = 1000, echo=None) -> int:
+    """Regenerate student_subject_result from every completed session; returns rows written"""
+    latest = _latest_per_student_subject()
+
+    db.session.execute(delete(StudentSubjectResult))
+    written = 0
+    batch = []
+    for sess, attempts, best_score in latest.all():
+        batch.append(_result_row(sess.student_id, sess.subject_id, attempts, best_score, sess))
+        if len(batch) >= batch_size:
+            db.session.execute(insert(StudentSubjectResult), batch)
+            written += len(batch)
+            batch = []
+            if echo:
+                echo(f"{written} result rows written")
+    if batch:
+        db.session.execute(insert(StudentSubjectResult), batch)
+        written += len(batch)
+    db.session.commit()
+    return written
+
+
+def populate_results() -> int:
+    """
+    Build student_subject_result if it is empty but completed sessions exist;
+    returns rows written. Sessions completed before scores were stored are
+    scored first, so their rows carry real scores rather than NULLs.
+    """
+    if db.session.query(StudentSubjectResult.id).first() is not None:
+        return 0
+    if db.session.query(ExamSession.id).filter(ExamSession.completed_at.isnot(None)).first() is None:
+        return 0
+    from .grading import backfill_scores  # grading imports this module
+
+    backfill_scores()
+    return rebuild_results()
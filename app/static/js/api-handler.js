@@ -49,6 +49,41 @@ class QuestionsAPIHandler {
         }
     }
 
+    /**
+     * Fetch questions for several subjects in one request (fetched concurrently on the server)
+     * @param {Array<string>} subjects - Subject names (e.g., ['chemistry', 'physics'])
+     * @param {string} classLevel - Class level ('ss2' or 'ss3')
+     * @param {Array<string>} years - Optional year filters; each subject is fetched once per year
+     * @returns {Promise} - Promise that resolves with per-subject results
+     */
+    async fetchQuestionsBatch(subjects, classLevel, years = []) {
+        try {
+            const url = new URL(`${this.baseUrl}/questions/batch`, window.location.origin);
+            url.searchParams.append('subjects', subjects.join(','));
+            url.searchParams.append('class_level', classLevel);
+            if (years.length) {
+                url.searchParams.append('years', years.join(','));
+            }
+
+            const response = await fetch(url, {
+                method: 'GET',
+                headers: {
+                    'Accept': 'application/json',
+                    'Content-Type': 'application/json'
+                }
+            });
+
+            const data = await response.json();
+            if (!data.results) {
+                throw new Error(data.error || 'Failed to fetch questions');
+            }
+            return data;
+        } catch (error) {
+            console.error('Error fetching questions batch:', error);
+            throw error;
+        }
+    }
+
     /**
      * Fetch SS2 Chemistry questions
      * @param {string} year - Optional year filter
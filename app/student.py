@@ -1,62 +1,26 @@
 from datetime import datetime, timedelta
-from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, make_response, current_app, jsonify
 from flask_login import login_required, current_user
 from .models import User, Subject, Question, Option, ExamSession, Response, nigeria_grade
 from . import db
+from .autosave import get_autosave_buffer
+from .grading import answer_key_for, backfill_scores as run_backfill, grade_session, selections_from_form, session_selections
+from .paper_cache import get_exam_paper_cache
+from .pdf_cache import get_pdf_cache
+from .report_card import html_to_pdf, report_card_data, report_card_html
+from .submissions import active_submission, enqueue_submission
 from sqlalchemy import desc
-from xhtml2pdf import pisa
-from io import BytesIO
 
 
 def backfill_session_scores():
     """Backfill scores for existing sessions that don't have stored scores"""
-    sessions_to_update = ExamSession.query.filter(
-        ExamSession.completed_at.isnot(None),
-        (ExamSession.total_questions.is_(None) | 
-         ExamSession.correct_answers.is_(None) | 
-         ExamSession.score_percentage.is_(None))
-    ).all()
-    
-    for session in sessions_to_update:
-        questions = Question.query.filter_by(subject_id=session.subject_id).all()
-        total = len(questions)
-        correct = 0
-        
-        for q in questions:
-            resp = Response.query.filter_by(session_id=session.id, question_id=q.id).first()
-            if resp:
-                selected_option = Option.query.get(resp.selected_option_id)
-                correct_option = Option.query.filter_by(question_id=q.id, is_correct=True).first()
-                if selected_option and correct_option and selected_option.id == correct_option.id:
-                    correct += 1
-        
-        percentage = (correct / total * 100) if total > 0 else 0
-        session.total_questions = total
-        session.correct_answers = correct
-        session.score_percentage = percentage
-    
-    if sessions_to_update:
-        db.session.commit()
-        print(f"Backfilled scores for {len(sessions_to_update)} sessions")
+    summary = run_backfill()
+    if summary['scored']:
+        print(f"Backfilled scores for {summary['scored']} sessions")
 
 student_bp = Blueprint("student", __name__)
 
 
-def _format_api_options(option_dict):
-    """Format API options from dictionary to list format"""
-    if not option_dict:
-        return []
-    
-    options = []
-    for key, value in option_dict.items():
-        if value and key in ['a', 'b', 'c', 'd', 'e']:
-            options.append({
-                'option': value,
-                'answer': False  # Will be set based on answer field
-            })
-    return options
-
-
 @student_bp.route("/")
 @login_required
 def index():
@@ -87,7 +51,7 @@ def index():
         teacher_subjects = Subject.query.filter(
             (Subject.class_name == None) | 
             (Subject.class_name == current_user.class_name)
-        ).order_by(Subject.created_at.desc()).all()
+        ).filter(Subject.bank_key.is_(None)).order_by(Subject.created_at.desc()).all()
         
         # Combine API subjects and teacher subjects
         all_subjects = api_subjects + teacher_subjects
@@ -96,10 +60,10 @@ def index():
         # For other classes, show subjects that are either for all classes or specifically for the user's class
         all_subjects = Subject.query.filter(
             (Subject.class_name == None) | (Subject.class_name == current_user.class_name)
-        ).order_by(Subject.created_at.desc()).all()
+        ).filter(Subject.bank_key.is_(None)).order_by(Subject.created_at.desc()).all()
     else:
         # If user has no class assigned, show all teacher-created subjects
-        all_subjects = Subject.query.order_by(Subject.created_at.desc()).all()
+        all_subjects = Subject.query.filter(Subject.bank_key.is_(None)).order_by(Subject.created_at.desc()).all()
     
     return render_template("student/index.html", subjects=all_subjects)
 
@@ -130,20 +94,35 @@ def take_api_exam(subject_id):
     class_level = parts[2]
     
     # Import API service
-    from .api_service import QuestionsAPIService, SS2_SS3_SUBJECTS
+    from .api_service import QuestionsAPIService, SS2_SS3_SUBJECTS, ingest_questions
     
     if subject_key not in SS2_SS3_SUBJECTS:
         flash("Subject not available", "error")
         return redirect(url_for("student.index"))
     
-    # Fetch questions from API (get 20 questions for a good exam experience)
-    api_service = QuestionsAPIService()
-    result = api_service.fetch_questions(subject_key, "utme", limit=20)
-    
-    if not result['success']:
-        flash(f"Failed to load questions: {result['error']}", "error")
-        return redirect(url_for("student.index"))
-    
+    # Assemble 20 unique questions the student has not answered yet from the
+    # local pool; only fall back to a live API fetch when the pool is too small
+    from .question_bank import assemble_paper
+
+    questions_data = assemble_paper(subject_key, 20, student_id=current_user.id)
+    question_ids = None
+    if questions_data is None:
+        api_service = QuestionsAPIService()
+        result = api_service.fetch_questions(subject_key, "utme", limit=20)
+
+        if not result['success']:
+            flash(f"Failed to load questions: {result['error']}", "error")
+            return redirect(url_for("student.index"))
+
+        questions_data = result['data'].get('data', [])
+
+        # Keep what the API served so the local bank grows with every live fetch
+        try:
+            question_ids = ingest_questions(subject_key, questions_data)['question_ids']
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning("Could not store API questions for %s: %s", subject_key, e)
+
     # Create a virtual subject for display
     virtual_subject = type('VirtualSubject', (), {
         'id': subject_id,
@@ -154,39 +133,22 @@ def take_api_exam(subject_id):
         'is_api_subject': True
     })()
     
-    # Process questions from API response
-    questions_data = result['data'].get('data', [])
-    questions = []
-    
-    # Handle multiple questions response (list format)
-    if isinstance(questions_data, list):
-        # Multiple questions response from /m endpoint
-        for q_data in questions_data:
-            if isinstance(q_data, dict) and 'question' in q_data:
-                virtual_question = type('VirtualQuestion', (), {
-                    'id': f'api_{q_data.get("id", "1")}',
-                    'text': q_data.get('question', ''),
-                    'options': _format_api_options(q_data.get('option', {})),
-                    'year': q_data.get('year', ''),
-                    'examtype': q_data.get('examtype', ''),
-                    'subject': q_data.get('subject', ''),
-                    'is_api_question': True
-                })()
-                questions.append(virtual_question)
-    elif isinstance(questions_data, dict) and 'question' in questions_data:
-        # Single question response from /q endpoint
-        q_data = questions_data
-        virtual_question = type('VirtualQuestion', (), {
-            'id': f'api_{q_data.get("id", "1")}',
-            'text': q_data.get('question', ''),
-            'options': _format_api_options(q_data.get('option', {})),
-            'year': q_data.get('year', ''),
-            'examtype': q_data.get('examtype', ''),
-            'subject': q_data.get('subject', ''),
+    # Freeze the paper server-side; the form only carries its opaque token
+    from .exam_papers import create_paper, paper_questions
+
+    paper = create_paper(current_user.id, subject_key, class_level, questions_data, question_ids)
+    questions = [
+        type('VirtualQuestion', (), {
+            'id': q['id'],
+            'text': q['question'],
+            'options': [{'option': text, 'answer': False} for text in q['options']],
+            'year': q['year'],
+            'examtype': q['examtype'],
             'is_api_question': True
         })()
-        questions.append(virtual_question)
-    
+        for q in paper_questions(paper)
+    ]
+
     if not questions:
         flash("No questions available for this subject", "error")
         return redirect(url_for("student.index"))
@@ -206,9 +168,7 @@ def take_api_exam(subject_id):
         questions=questions,
         session=virtual_session,
         end_remaining=45 * 60,  # 45 minutes in seconds
-        # Pass the original API payload through the form so grading uses the
-        # same questions the student answered (prevents mismatch on re-fetch).
-        questions_payload=questions_data
+        paper_token=paper.token
     )
 
 
@@ -229,106 +189,27 @@ def submit_api_exam(subject_id):
     subject_key = parts[1]
     class_level = parts[2]
     
-    # Import API service
-    from .api_service import QuestionsAPIService, SS2_SS3_SUBJECTS
+    from .api_service import SS2_SS3_SUBJECTS
+    from .exam_papers import find_paper, grade_paper
     
     if subject_key not in SS2_SS3_SUBJECTS:
         flash("Subject not available", "error")
         return redirect(url_for("student.index"))
     
-    # Prefer using the questions payload embedded in the submitted form. This
-    # ensures we grade the exact questions that were presented to the student
-    # (prevents mismatches when the external API returns different content on
-    # subsequent fetches). If not present, fall back to fetching from API.
-    import json
-
-    questions_payload_json = request.form.get('questions_payload_json')
-    questions_data = None
-    if questions_payload_json:
-        try:
-            questions_parsed = json.loads(questions_payload_json)
-            # The API payload may nest data under 'data'
-            if isinstance(questions_parsed, dict) and 'data' in questions_parsed:
-                questions_data = questions_parsed.get('data')
-            else:
-                questions_data = questions_parsed
-        except Exception as e:
-            print(f"DEBUG: Failed to parse questions_payload_json: {e}")
+    # Grade against the paper frozen when the exam started
+    paper = find_paper(request.form.get('paper_token'), current_user.id, subject_key)
+    if paper is None:
+        flash("This exam paper could not be found. Please start the exam again.", "error")
+        return redirect(url_for("student.index"))
+    if paper.submitted_at is not None:
+        flash("This exam has already been submitted.", "info")
+        return redirect(url_for("student.index"))
 
-    if questions_data is None:
-        api_service = QuestionsAPIService()
-        result = api_service.fetch_questions(subject_key, "utme", limit=20)
-        if not result['success']:
-            flash(f"Failed to load questions: {result['error']}", "error")
-            return redirect(url_for("student.index"))
-        questions_data = result['data'].get('data', [])
-    total_questions = 0
-    correct_answers = 0
-    results = []
-    
-    current_app.logger.debug("Processing API exam submission for subject %s", subject_key)
-    # Avoid dumping full form data (may contain non-encodable characters). Log keys only.
-    current_app.logger.debug("Form keys received: %s", list(request.form.keys()))
-    current_app.logger.debug("Questions data type: %s, length: %s", type(questions_data), len(questions_data) if hasattr(questions_data, '__len__') else 'N/A')
-    
-    # Handle multiple questions response (list format)
-    if isinstance(questions_data, list):
-        # Multiple questions response from /m endpoint
-        for q_data in questions_data:
-            if isinstance(q_data, dict) and 'question' in q_data:
-                total_questions += 1
-                question_id = f'api_{q_data.get("id", "1")}'
-                form_key = f'question_{question_id}'
-                submitted_answer = request.form.get(form_key)
-                
-                current_app.logger.debug("Question ID: %s, Form key: %s, Submitted answer: %s", question_id, form_key, submitted_answer)
-                
-                # Find correct answer from API format
-                correct_answer_key = q_data.get('answer', '')
-                correct_answer = None
-                if correct_answer_key and correct_answer_key in q_data.get('option', {}):
-                    correct_answer = q_data.get('option', {}).get(correct_answer_key)
-                
-                current_app.logger.debug("Correct answer key: %s, Correct answer: %s", correct_answer_key, correct_answer)
-                
-                is_correct = submitted_answer == correct_answer
-                if is_correct:
-                    correct_answers += 1
-                
-                results.append({
-                    'question': q_data.get('question', ''),
-                    'submitted_answer': submitted_answer,
-                    'correct_answer': correct_answer,
-                    'is_correct': is_correct,
-                    'options': _format_api_options(q_data.get('option', {}))
-                })
-    elif isinstance(questions_data, dict) and 'question' in questions_data:
-        # Single question response from /q endpoint
-        q_data = questions_data
-        total_questions = 1
-        question_id = f'api_{q_data.get("id", "1")}'
-        submitted_answer = request.form.get(f'question_{question_id}')
-        
-        # Find correct answer from API format
-        correct_answer_key = q_data.get('answer', '')
-        correct_answer = None
-        if correct_answer_key and correct_answer_key in q_data.get('option', {}):
-            correct_answer = q_data.get('option', {}).get(correct_answer_key)
-        
-        is_correct = submitted_answer == correct_answer
-        if is_correct:
-            correct_answers += 1
-        
-        results.append({
-            'question': q_data.get('question', ''),
-            'submitted_answer': submitted_answer,
-            'correct_answer': correct_answer,
-            'is_correct': is_correct,
-            'options': _format_api_options(q_data.get('option', {}))
-        })
-    
-    # Calculate score
-    percentage = (correct_answers / total_questions * 100) if total_questions > 0 else 0
+    current_app.logger.debug("Processing API exam submission for subject %s (paper %s)", subject_key, paper.id)
+    results = grade_paper(paper, request.form)
+    total_questions = paper.total_questions
+    correct_answers = paper.correct_answers
+    percentage = paper.score_percentage
     
     # Create virtual subject for display
     virtual_subject = type('VirtualSubject', (), {
@@ -447,42 +328,16 @@ def test_complete_session(session_id):
     
     session = ExamSession.query.get_or_404(session_id)
     
-    # Create some dummy responses
-    questions = Question.query.filter_by(subject_id=session.subject_id).all()
-    for question in questions:
-        # Find the first option for each question
-        first_option = Option.query.filter_by(question_id=question.id).first()
-        if first_option:
-            # Check if response already exists
-            existing_response = Response.query.filter_by(session_id=session.id, question_id=question.id).first()
-            if not existing_response:
-                response = Response(
-                    session_id=session.id,
-                    question_id=question.id,
-                    selected_option_id=first_option.id
-                )
-                db.session.add(response)
-    
-    # Calculate and store scores
-    total_questions = len(questions)
-    correct_answers = 0
-    
-    for question in questions:
-        response = Response.query.filter_by(session_id=session.id, question_id=question.id).first()
-        if response:
-            selected_option = Option.query.get(response.selected_option_id)
-            correct_option = Option.query.filter_by(question_id=question.id, is_correct=True).first()
-            if selected_option and correct_option and selected_option.id == correct_option.id:
-                correct_answers += 1
-    
-    percentage = (correct_answers / total_questions * 100) if total_questions > 0 else 0
-    
-    # Mark session as completed
-    session.completed_at = datetime.utcnow()
-    session.total_questions = total_questions
-    session.correct_answers = correct_answers
-    session.score_percentage = percentage
-    
+    # Answer every unanswered question with its first option
+    key = answer_key_for(Subject.query.get(session.subject_id))
+    answered = session_selections(session.id)
+    first_options = {}
+    for option_id, question_id in sorted(key.option_question.items()):
+        first_options.setdefault(question_id, option_id)
+    dummy = {qid: oid for qid, oid in first_options.items() if qid not in answered}
+
+    # Calculate and store scores, marking the session as completed
+    total_questions, correct_answers, percentage = grade_session(session, dummy, key=key)
     db.session.commit()
     
     flash(f"Session {session_id} completed manually. Scores: {correct_answers}/{total_questions} ({percentage:.1f}%)", "success")
@@ -592,16 +447,7 @@ def full_diagnostic():
                 percentage = sess.score_percentage
             else:
                 # Fallback: calculate scores
-                questions = Question.query.filter_by(subject_id=s.id).all()
-                total = len(questions)
-                correct = 0
-                for q in questions:
-                    resp = Response.query.filter_by(session_id=sess.id, question_id=q.id).first()
-                    sel = Option.query.get(resp.selected_option_id) if resp else None
-                    ans = Option.query.filter_by(question_id=q.id, is_correct=True).first()
-                    if sel and ans and sel.id == ans.id:
-                        correct += 1
-                percentage = (correct / total * 100) if total else 0
+                total, correct, percentage = answer_key_for(s).score(session_selections(sess.id))
             
             grade = nigeria_grade(percentage)
             rows.append({
@@ -676,128 +522,33 @@ def debug_report():
 @student_bp.route("/report-card")
 @login_required
 def report_card():
-    # Auto-backfill scores for existing sessions if needed
-    try:
-        backfill_session_scores()
-    except Exception as e:
-        print(f"Auto-backfill failed: {e}")
-    
-    # Latest completed session per subject for current user
-    subjects = Subject.query.all()
-    rows = []
-    total_scores = []
-    
-    print(f"DEBUG: Generating report for user {current_user.full_name} (ID: {current_user.id})")
-    print(f"DEBUG: Found {len(subjects)} subjects")
-    
-    for s in subjects:
-        sess = (
-            ExamSession.query
-            .filter_by(subject_id=s.id, student_id=current_user.id)
-            .filter(ExamSession.completed_at.isnot(None))
-            .order_by(desc(ExamSession.completed_at))
-            .first()
-        )
-        if not sess:
-            continue
-        
-        # Use stored scores if available, otherwise calculate
-        if sess.total_questions is not None and sess.correct_answers is not None and sess.score_percentage is not None:
-            total = sess.total_questions
-            correct = sess.correct_answers
-            percentage = sess.score_percentage
-        else:
-            # Fallback: calculate scores (for old sessions)
-            questions = Question.query.filter_by(subject_id=s.id).all()
-            total = len(questions)
-            correct = 0
-            for q in questions:
-                resp = Response.query.filter_by(session_id=sess.id, question_id=q.id).first()
-                sel = Option.query.get(resp.selected_option_id) if resp else None
-                ans = Option.query.filter_by(question_id=q.id, is_correct=True).first()
-                if sel and ans and sel.id == ans.id:
-                    correct += 1
-            percentage = (correct / total * 100) if total else 0
-        
-        grade = nigeria_grade(percentage)
-        rows.append({
-            "subject": s,
-            "session": sess,
-            "total": total,
-            "correct": correct,
-            "percentage": percentage,
-            "grade": grade,
-        })
-        total_scores.append(percentage)
-    overall = sum(total_scores) / len(total_scores) if total_scores else 0
-    overall_grade = nigeria_grade(overall)
-    return render_template("student/report_card.html", rows=rows, overall=overall, overall_grade=overall_grade)
+    data = report_card_data(current_user.id)
+    return render_template("student/report_card.html", **data)
 
 
 @student_bp.route("/report-card.pdf")
 @login_required
 def report_card_pdf():
-    # Auto-backfill scores for existing sessions if needed
-    try:
-        backfill_session_scores()
-    except Exception as e:
-        print(f"Auto-backfill failed: {e}")
-    
-    # Get the same data as the report_card function
-    subjects = Subject.query.all()
-    rows = []
-    total_scores = []
-    for s in subjects:
-        sess = (
-            ExamSession.query
-            .filter_by(subject_id=s.id, student_id=current_user.id)
-            .filter(ExamSession.completed_at.isnot(None))
-            .order_by(desc(ExamSession.completed_at))
-            .first()
-        )
-        if not sess:
-            continue
-        
-        # Use stored scores if available, otherwise calculate
-        if sess.total_questions is not None and sess.correct_answers is not None and sess.score_percentage is not None:
-            total = sess.total_questions
-            correct = sess.correct_answers
-            percentage = sess.score_percentage
-        else:
-            # Fallback: calculate scores (for old sessions)
-            questions = Question.query.filter_by(subject_id=s.id).all()
-            total = len(questions)
-            correct = 0
-            for q in questions:
-                resp = Response.query.filter_by(session_id=sess.id, question_id=q.id).first()
-                sel = Option.query.get(resp.selected_option_id) if resp else None
-                ans = Option.query.filter_by(question_id=q.id, is_correct=True).first()
-                if sel and ans and sel.id == ans.id:
-                    correct += 1
-            percentage = (correct / total * 100) if total else 0
-        
-        grade = nigeria_grade(percentage)
-        rows.append({
-            "subject": s,
-            "session": sess,
-            "total": total,
-            "correct": correct,
-            "percentage": percentage,
-            "grade": grade,
-        })
-        total_scores.append(percentage)
-    overall = sum(total_scores) / len(total_scores) if total_scores else 0
-    overall_grade = nigeria_grade(overall)
-    
-    html = render_template("student/report_card_pdf.html", user=current_user, rows=rows, overall=overall, overall_grade=overall_grade)
-    pdf = BytesIO()
-    pisa_status = pisa.CreatePDF(src=html, dest=pdf)
-    if pisa_status.err:
-        flash("Failed to generate PDF", "error")
-        return redirect(url_for("student.report_card"))
-    response = make_response(pdf.getvalue())
+    html = report_card_html(current_user)
+    # The rendered HTML identifies the PDF, so unchanged reports skip pisa entirely
+    cache = get_pdf_cache()
+    key = cache.make_key(html)
+    if request.if_none_match.contains(key):
+        response = make_response('', 304)
+        response.set_etag(key)
+        return response
+    pdf_bytes = cache.get(key)
+    if pdf_bytes is None:
+        pdf_bytes = html_to_pdf(html)
+        if pdf_bytes is None:
+            flash("Failed to generate PDF", "error")
+            return redirect(url_for("student.report_card"))
+        cache.put(key, pdf_bytes)
+    response = make_response(pdf_bytes)
     response.headers['Content-Type'] = 'application/pdf'
     response.headers['Content-Disposition'] = 'attachment; filename=report_card.pdf'
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(key)
     return response
 
 
@@ -814,6 +565,9 @@ def start_exam(subject_id):
     existing = ExamSession.query.filter_by(subject_id=subject.id, student_id=current_user.id, completed_at=None).order_by(ExamSession.started_at.desc()).first()
     now = datetime.utcnow()
     new_session_needed = True
+    if existing and active_submission(existing.id) is not None:
+        # Submitted and waiting for a grading worker; it cannot be resumed
+        return redirect(url_for("report.session_report", session_id=existing.id))
     if existing:
         end_time = existing.started_at + timedelta(minutes=subject.duration_minutes)
         if end_time > now:
@@ -834,65 +588,29 @@ def take_exam(session_id):
         flash("Not authorized", "error")
         return redirect(url_for("student.index"))
     subject = Subject.query.get(session.subject_id)
-    questions = Question.query.filter_by(subject_id=subject.id).all()
+
+    if active_submission(session.id) is not None:
+        flash("This exam has already been submitted.", "info")
+        return redirect(url_for("report.session_report", session_id=session.id))
 
     if request.method == "POST":
-        print(f"DEBUG: Processing exam submission for session {session.id}")
-        
-        # Process all responses
-        responses_processed = 0
-        for q in questions:
-            key = f"question_{q.id}"
-            selected_option_id = request.form.get(key)
-            print(f"DEBUG: Question {q.id} - Form key: {key}, Selected option: {selected_option_id}")
-            if not selected_option_id:
-                print(f"DEBUG: No answer provided for question {q.id}")
-                continue
-            
-            existing_resp = Response.query.filter_by(session_id=session.id, question_id=q.id).first()
-            if existing_resp:
-                existing_resp.selected_option_id = int(selected_option_id)
-                print(f"DEBUG: Updated existing response for question {q.id}")
+        # Upsert all answers in one statement and score against the answer key in memory.
+        # The form carries every answer and is graded over what is stored, so the result does not
+        # depend on which worker's autosave buffer holds unflushed answers; this worker's are dropped.
+        key = answer_key_for(subject)
+        get_autosave_buffer().take(session.id)
+        selections = selections_from_form(request.form, key)
+        if current_app.config.get("SUBMISSION_QUEUE_ENABLED"):
+            # One insert; the submission workers grade it and the report page waits for them
+            if enqueue_submission(session, selections) is None:
+                flash("This exam has already been submitted.", "info")
             else:
-                db.session.add(Response(session_id=session.id, question_id=q.id, selected_option_id=int(selected_option_id)))
-                print(f"DEBUG: Created new response for question {q.id}")
-            responses_processed += 1
-        
-        print(f"DEBUG: Processed {responses_processed} responses out of {len(questions)} questions")
-        
-        # Calculate and store the score
-        total_questions = len(questions)
-        correct_answers = 0
-        
-        print(f"DEBUG: Starting score calculation for {total_questions} questions")
-        for q in questions:
-            resp = Response.query.filter_by(session_id=session.id, question_id=q.id).first()
-            if resp:
-                selected_option = Option.query.get(resp.selected_option_id)
-                correct_option = Option.query.filter_by(question_id=q.id, is_correct=True).first()
-                
-                print(f"DEBUG: Q{q.id} - Selected: {selected_option.text if selected_option else 'None'}, Correct: {correct_option.text if correct_option else 'None'}")
-                
-                if selected_option and correct_option and selected_option.id == correct_option.id:
-                    correct_answers += 1
-                    print(f"DEBUG: Q{q.id} - CORRECT")
-                else:
-                    print(f"DEBUG: Q{q.id} - WRONG")
-            else:
-                print(f"DEBUG: Q{q.id} - No response found")
-        
-        # Store the score in the session
-        percentage = (correct_answers / total_questions * 100) if total_questions > 0 else 0
-        session.completed_at = datetime.utcnow()
-        session.total_questions = total_questions
-        session.correct_answers = correct_answers
-        session.score_percentage = percentage
-        
-        print(f"DEBUG: Final scores - Total: {total_questions}, Correct: {correct_answers}, Percentage: {percentage}%")
-        print(f"DEBUG: Session completed_at set to: {session.completed_at}")
-        
+                flash("Exam submitted successfully! Your score will appear shortly.", "success")
+            return redirect(url_for("report.session_report", session_id=session.id))
+        stored = session_selections(session.id)
+        changed = {qid: oid for qid, oid in selections.items() if stored.get(qid) != oid}
+        grade_session(session, changed, key=key)
         db.session.commit()
-        print(f"DEBUG: Scores saved to database successfully")
         
         flash("Exam submitted successfully!", "success")
         return redirect(url_for("report.session_report", session_id=session.id))
@@ -911,10 +629,53 @@ def take_exam(session_id):
             end_time = session.started_at + timedelta(minutes=subject.duration_minutes)
             remaining_seconds = max(0, int((end_time - datetime.utcnow()).total_seconds()))
 
+    # Restore autosaved answers after a reload or a crashed browser; the page loads the questions from exam_paper
+    saved = {**session_selections(session.id), **get_autosave_buffer().pending(session.id)}
     return render_template(
         "student/take_exam.html",
         subject=subject,
-        questions=questions,
         session=session,
         end_remaining=remaining_seconds,
+        saved=saved,
     )
+
+
+@student_bp.route("/sessions/<int:session_id>/paper")
+@login_required
+def exam_paper(session_id):
+    """Questions and options of the session's subject, compiled once per answer-key version"""
+    session = ExamSession.query.get_or_404(session_id)
+    if session.student_id != current_user.id:
+        return render_template("errors/403.html"), 403
+    paper = get_exam_paper_cache().get(db.session.get(Subject, session.subject_id))
+    if request.if_none_match.contains(paper.etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(paper.html)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.set_etag(paper.etag)
+    return response
+
+
+@student_bp.route("/sessions/<int:session_id>/autosave", methods=["POST"])
+@login_required
+def autosave_answers(session_id):
+    """Buffer answers changed since the exam page's last autosave: {"answers": {question_id: option_id}}"""
+    session = ExamSession.query.get_or_404(session_id)
+    if session.student_id != current_user.id:
+        return jsonify({"success": False, "error": "Not authorized"}), 403
+    if session.completed_at is not None or active_submission(session.id) is not None:
+        return jsonify({"success": False, "error": "Session already submitted"}), 409
+    payload = request.get_json(silent=True) or {}
+    answers = payload.get("answers")
+    if not isinstance(answers, dict):
+        return jsonify({"success": False, "error": "Expected an answers object"}), 400
+
+    key = answer_key_for(Subject.query.get(session.subject_id))
+    selections = selections_from_form({f"question_{qid}": oid for qid, oid in answers.items()}, key)
+    buffer = get_autosave_buffer()
+    if buffer.add(session.id, selections):
+        buffer.flush()
+    else:
+        buffer.schedule(current_app._get_current_object())
+    return jsonify({"success": True, "saved": len(selections)})
@@ -0,0 +1,223 @@
+"""
+Durable queue for final exam submissions.
+
+With SUBMISSION_QUEUE_ENABLED, take_exam stores the submitted answers as one
+Submission row and redirects straight away. It does not upsert, grade or
+refresh results inside the request. `flask submissions work` runs the
+grading workers. Each worker claims a batch of pending submissions with one
+UPDATE, grades them all and commits the batch once. On SQLite, everyone
+auto-submitting at the bell then costs one short insert per request plus
+one write transaction per batch.
+
+Claims carry a lease. A worker that dies mid-batch leaves its rows
+"processing", and they return to the queue once SUBMISSION_LEASE_SECONDS
+have passed. A submission that keeps failing is marked "failed" after
+SUBMISSION_MAX_ATTEMPTS. While a submission is still waiting, the report
+page polls its status. After SUBMISSION_STALE_SECONDS with no worker picking
+it up, the poll grades it in the request itself, so the queue never strands
+a student.
+
+The waiting submission also locks its session: the session stays incomplete
+until it is graded, so the exam page, autosave and a second submit check
+active_submission() and refuse to change its answers. A partial unique index
+(ux_submission_active) lets only one submission per session wait at a time.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import secrets
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from . import db
+from .grading import answer_key_for, grade_session, session_selections
+from .models import ExamSession, Subject, Submission
+
+logger = logging.getLogger(__name__)
+
+PENDING, PROCESSING, DONE, FAILED = "pending", "processing", "done", "failed"
+
+
+def enqueue_submission(session: ExamSession, selections: Dict[int, int]) -> Optional[Submission]:
+    """Queue the session's final answers for grading and commit; None when a submission is already waiting"""
+    submission = Submission(
+        session_id=session.id,
+        selections_json=json.dumps({str(qid): oid for qid, oid in selections.items()}, separators=(',', ':')),
+        status=PENDING,
+    )
+    db.session.add(submission)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent submit of the same session got in first
+        db.session.rollback()
+        return None
+    return submission
+
+
+def active_submission(session_id: int) -> Optional[Submission]:
+    """The session's newest submission that has not been graded yet"""
+    return (
+        Submission.query.filter(Submission.session_id == session_id, Submission.status.in_((PENDING, PROCESSING)))
+        .order_by(Submission.id.desc())
+        .first()
+    )
+
+
+def _claimable(lease_seconds: float, now: datetime):
+    return or_(
+        Submission.status == PENDING,
+        and_(Submission.status == PROCESSING, Submission.claimed_at < now - timedelta(seconds=lease_seconds)),
+    )
+
+
+def claim_batch(worker: str, batch_size: int, lease_seconds: float) -> List[Submission]:
+    """Atomically claim up to ``batch_size`` submissions, oldest first, and commit the claim"""
+    now = datetime.utcnow()
+    claim = f"{worker}/{secrets.token_hex(4)}"
+    oldest = select(Submission.id).where(_claimable(lease_seconds, now)).order_by(Submission.id).limit(batch_size)
+    db.session.execute(
+        update(Submission)
+        # The status check is repeated so rows another worker claimed meanwhile are skipped
+        .where(Submission.id.in_(oldest.scalar_subquery()), _claimable(lease_seconds, now))
+        .values(status=PROCESSING, worker=claim, claimed_at=now, attempts=Submission.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return Submission.query.filter_by(worker=claim, status=PROCESSING).order_by(Submission.id).all()
+
+
+def grade_submission(submission: Submission) -> None:
+    """Store and grade the submission's answers and mark it done. The caller commits."""
+    session = db.session.get(ExamSession, submission.session_id)
+    key = answer_key_for(db.session.get(Subject, session.subject_id))
+    selections = {
+        int(qid): oid for qid, oid in json.loads(submission.selections_json).items()
+        if key.option_question.get(oid) == int(qid)
+    }
+    stored = session_selections(session.id)
+    grade_session(session, {qid: oid for qid, oid in selections.items() if stored.get(qid) != oid}, key=key)
+    submission.status = DONE
+    submission.error = None
+    submission.processed_at = datetime.utcnow()
+
+
+def _fail(submission: Submission, error: Exception, max_attempts: int) -> None:
+    submission.status = FAILED if submission.attempts >= max_attempts else PENDING
+    submission.error = repr(error)[:1000]
+    submission.claimed_at = None
+
+
+def process_batch(worker: str, batch_size: int = 50, lease_seconds: float = 120, max_attempts: int = 3) -> int:
+    """Claim and grade one batch; returns how many submissions were claimed"""
+    batch = claim_batch(worker, batch_size, lease_seconds)
+    if not batch:
+        return 0
+    try:
+        for submission in batch:
+            grade_submission(submission)
+        db.session.commit()
+        return len(batch)
+    except Exception:
+        logger.exception("Grading batch of %d failed, retrying one by one", len(batch))
+        db.session.rollback()
+
+    # Isolate the bad submission so the rest of the batch still commits
+    for submission_id in [submission.id for submission in batch]:
+        submission = db.session.get(Submission, submission_id)
+        try:
+            grade_submission(submission)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            submission = db.session.get(Submission, submission_id)
+            _fail(submission, e, max_attempts)
+            db.session.commit()
+    return len(batch)
+
+
+def grade_if_stale(submission: Submission) -> bool:
+    """Grade a submission in the request when no worker has claimed it in time"""
+    stale_after = current_app.config.get('SUBMISSION_STALE_SECONDS', 60)
+    if submission.status != PENDING or datetime.utcnow() - submission.created_at < timedelta(seconds=stale_after):
+        return False
+    claimed = db.session.execute(
+        update(Submission)
+        .where(Submission.id == submission.id, Submission.status == PENDING)
+        .values(status=PROCESSING, worker="request", claimed_at=datetime.utcnow(), attempts=Submission.attempts + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return False
+    try:
+        grade_submission(submission)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        submission = db.session.get(Submission, submission.id)
+        _fail(submission, e, current_app.config.get('SUBMISSION_MAX_ATTEMPTS', 3))
+        db.session.commit()
+        return False
+    return True
+
+
+def run_worker(batch_size: int, poll_seconds: float, once: bool = False, echo=None) -> int:
+    """Grade submissions until stopped (or until the queue is empty with ``once``); returns submissions claimed"""
+    config = current_app.config
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    total = 0
+    while True:
+        claimed = process_batch(
+            worker, batch_size,
+            lease_seconds=config.get('SUBMISSION_LEASE_SECONDS', 120),
+            max_attempts=config.get('SUBMISSION_MAX_ATTEMPTS', 3),
+        )
+        total += claimed
+        if claimed and echo:
+            echo(f"[{worker}] graded batch of {claimed}")
+        if not claimed:
+            if once:
+                return total
+            time.sleep(poll_seconds)
+        db.session.remove()
+
+
+def _worker_process(app, batch_size: int, poll_seconds: float, once: bool) -> None:
+    with app.app_context():
+        # Connections inherited through fork belong to the parent
+        db.engine.dispose(close=False)
+        run_worker(batch_size, poll_seconds, once, echo=click.echo)
+
+
+submissions_cli = AppGroup('submissions', help='Grade queued exam submissions.')
+
+
+@submissions_cli.command('work')
+@click.option('--processes', default=1, show_default=True, help='Worker processes to fork.')
+@click.option('--batch-size', default=50, show_default=True, help='Submissions graded per transaction.')
+@click.option('--poll', 'poll_seconds', default=0.5, show_default=True, help='Seconds to wait when the queue is empty.')
+@click.option('--once', is_flag=True, help='Exit once the queue is empty.')
+def work_command(processes, batch_size, poll_seconds, once):
+    """Run grading workers for queued submissions."""
+    if processes <= 1:
+        total = run_worker(batch_size, poll_seconds, once, echo=click.echo)
+        click.echo(f"Graded {total} submissions.")
+        return
+    app = current_app._get_current_object()
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_worker_process, args=(app, batch_size, poll_seconds, once))
+               for _ in range(processes)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
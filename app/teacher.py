@@ -1,8 +1,18 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+import logging
+
+from flask import Blueprint, Response, render_template, redirect, url_for, flash, request, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy.orm import selectinload
+from werkzeug.utils import secure_filename
 from .forms import SubjectForm, QuestionForm, OptionForm, DeleteForm
-from .models import Subject, Question, Option
+from .models import Subject, Question, Option, ScoreRegrade, StudentSubjectResult
 from . import db
+from .grading import get_answer_key_cache, invalidate_answer_key, regrade_question
+from .class_reports import class_names, class_students, report_card_zip
+from .exports import results_csv
+from .item_analysis import analyse_subject
+
+logger = logging.getLogger(__name__)
 
 teacher_bp = Blueprint("teacher", __name__)
 
@@ -29,7 +39,29 @@ def index():
         return redirect(url_for("main.dashboard"))
     subjects = Subject.query.filter_by(teacher_id=current_user.id).all()
     delete_form = DeleteForm()
-    return render_template("teacher/index.html", subjects=subjects, delete_form=delete_form)
+    return render_template("teacher/index.html", subjects=subjects, delete_form=delete_form,
+                           class_names=class_names())
+
+
+@teacher_bp.route("/classes/<class_name>/report-cards.zip")
+@login_required
+def class_report_cards(class_name):
+    """Stream every report card of a class as a ZIP while the PDFs are rendered"""
+    students = class_students(class_name)
+    if not students:
+        flash(f"No students in class {class_name}", "error")
+        return redirect(url_for("teacher.index"))
+
+    def progress(done, total):
+        if done == total or done % 25 == 0:
+            logger.info("Class %s report cards: %d/%d rendered", class_name, done, total)
+
+    response = Response(stream_with_context(report_card_zip(students, progress=progress)),
+                        mimetype="application/zip")
+    filename = f"report_cards_{secure_filename(class_name) or 'class'}.zip"
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    response.headers["X-Report-Card-Count"] = str(len(students))
+    return response
 
 
 @teacher_bp.route("/subjects/new", methods=["GET", "POST"])
@@ -82,8 +114,11 @@ def delete_subject(subject_id):
         return redirect(url_for("teacher.index"))
     form = DeleteForm()
     if form.validate_on_submit():
+        StudentSubjectResult.query.filter_by(subject_id=subject.id).delete()
+        ScoreRegrade.query.filter_by(subject_id=subject.id).delete()
         db.session.delete(subject)
         db.session.commit()
+        get_answer_key_cache().invalidate(subject_id)
         flash("Subject deleted", "info")
     return redirect(url_for("teacher.index"))
 
@@ -99,6 +134,52 @@ def subject_detail(subject_id):
     return render_template("teacher/subject_detail.html", subject=subject, delete_form=delete_form)
 
 
+def _csv_response(rows, filename):
+    response = Response(stream_with_context(rows), mimetype="text/csv")
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
+
+
+@teacher_bp.route("/subjects/<int:subject_id>/results.csv")
+@login_required
+def export_subject_results(subject_id):
+    """Every session of the subject as CSV; ?answers=1 adds a column per question"""
+    subject = Subject.query.get_or_404(subject_id)
+    if subject.teacher_id != current_user.id:
+        flash("Not authorized", "error")
+        return redirect(url_for("teacher.index"))
+    with_answers = request.args.get("answers") == "1"
+    filename = f"results_{secure_filename(subject.name) or subject.id}.csv"
+    return _csv_response(results_csv([subject.id], with_answers=with_answers), filename)
+
+
+@teacher_bp.route("/classes/<class_name>/results.csv")
+@login_required
+def export_class_results(class_name):
+    """Sessions of a class's students in this teacher's subjects as CSV"""
+    subject_ids = [subject_id for subject_id, in
+                   Subject.query.with_entities(Subject.id).filter_by(teacher_id=current_user.id).all()]
+    if not subject_ids:
+        flash("You have no subjects to export", "error")
+        return redirect(url_for("teacher.index"))
+    filename = f"results_{secure_filename(class_name) or 'class'}.csv"
+    return _csv_response(results_csv(subject_ids, class_name=class_name), filename)
+
+
+@teacher_bp.route("/subjects/<int:subject_id>/item-analysis")
+@login_required
+def item_analysis(subject_id):
+    subject = Subject.query.get_or_404(subject_id)
+    if subject.teacher_id != current_user.id:
+        flash("Not authorized", "error")
+        return redirect(url_for("teacher.index"))
+    analysis = analyse_subject(subject)
+    questions = {q.id: q for q in Question.query.options(selectinload(Question.options)).filter_by(subject_id=subject.id)}
+    options = {o.id: o for q in questions.values() for o in q.options}
+    return render_template("teacher/item_analysis.html", subject=subject, analysis=analysis,
+                           questions=questions, options=options)
+
+
 @teacher_bp.route("/subjects/<int:subject_id>/questions/new", methods=["GET", "POST"])
 @login_required
 def add_question(subject_id):
@@ -110,6 +191,7 @@ def add_question(subject_id):
     if form.validate_on_submit():
         q = Question(subject_id=subject.id, text=form.text.data, time_limit_seconds=form.time_limit_seconds.data)
         db.session.add(q)
+        invalidate_answer_key(subject)
         db.session.commit()
         flash("Question added", "success")
         return redirect(url_for("teacher.subject_detail", subject_id=subject.id))
@@ -128,6 +210,8 @@ def edit_question(question_id):
     if form.validate_on_submit():
         question.text = form.text.data
         question.time_limit_seconds = form.time_limit_seconds.data
+        # Cached session reports are keyed by key_version and show the question text
+        invalidate_answer_key(subject)
         db.session.commit()
         flash("Question updated", "success")
         return redirect(url_for("teacher.subject_detail", subject_id=subject.id))
@@ -145,6 +229,7 @@ def delete_question(question_id):
     form = DeleteForm()
     if form.validate_on_submit():
         db.session.delete(question)
+        invalidate_answer_key(subject)
         db.session.commit()
         flash("Question deleted", "info")
     return redirect(url_for("teacher.subject_detail", subject_id=subject.id))
@@ -160,10 +245,14 @@ def add_option(question_id):
         return redirect(url_for("teacher.index"))
     form = OptionForm()
     if form.validate_on_submit():
-        option = Option(question_id=question.id, text=form.text.data, is_correct=form.is_correct.data)
+        option = Option(text=form.text.data, is_correct=False)
+        question.options.append(option)
+        old_correct = question.correct_option_id
         if form.is_correct.data:
-            Option.query.filter_by(question_id=question.id, is_correct=True).update({"is_correct": False})
-        db.session.add(option)
+            db.session.flush()
+            question.set_correct_option(option)
+        regrade_question(question, old_correct, current_user.id)
+        invalidate_answer_key(subject)
         db.session.commit()
         flash("Option added", "success")
         return redirect(url_for("teacher.subject_detail", subject_id=subject.id))
@@ -182,9 +271,13 @@ def edit_option(option_id):
     form = OptionForm(obj=option)
     if form.validate_on_submit():
         option.text = form.text.data
+        old_correct = question.correct_option_id
         if form.is_correct.data:
-            Option.query.filter_by(question_id=question.id, is_correct=True).update({"is_correct": False})
-        option.is_correct = form.is_correct.data
+            question.set_correct_option(option)
+        elif question.correct_option_id == option.id:
+            question.set_correct_option(None)
+        regrade_question(question, old_correct, current_user.id)
+        invalidate_answer_key(subject)
         db.session.commit()
         flash("Option updated", "success")
         return redirect(url_for("teacher.subject_detail", subject_id=subject.id))
@@ -202,7 +295,11 @@ def delete_option(option_id):
         return redirect(url_for("teacher.index"))
     form = DeleteForm()
     if form.validate_on_submit():
+        if question.correct_option_id == option.id:
+            question.set_correct_option(None)
+            regrade_question(question, option.id, current_user.id)
         db.session.delete(option)
+        invalidate_answer_key(subject)
         db.session.commit()
         flash("Option deleted", "info")
     return redirect(url_for("teacher.subject_detail", subject_id=subject.id))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the SS2/SS3 API exam path.
+
+Starts fake_aloc_server.py in-process, points the app at it with a throwaway
+database and question cache, then drives take_api_exam and submit_api_exam
+through the Flask test client from several concurrent simulated students.
+Reports p50/p95/p99 latency and requests/s per endpoint, plus the service's
+own cache/pool/breaker counters, so caching and pooling changes can be
+measured offline.
+
+    python benchmark_api_exam.py --students 20 --exams 5 --latency-ms 200 --error-rate 0.02
+"""
+
+import argparse
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_aloc_server import FakeAlocAPI, serve_in_thread
+
+TOKEN_RE = re.compile(r'name="paper_token" value="([^"]+)"')
+ANSWER_RE = re.compile(r'name="(question_api_[^"]+)" value="([^"]*)"')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of ``samples`` (milliseconds)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def run_student(app, student_id, subject_ids, exams, timings, failures, lock):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(student_id)
+        session['_fresh'] = True
+
+    for _ in range(exams):
+        subject_id = random.choice(subject_ids)
+        started = time.perf_counter()
+        response = client.get(f'/student/api-subjects/{subject_id}/start')
+        elapsed = (time.perf_counter() - started) * 1000
+        html = response.get_data(as_text=True)
+        token = TOKEN_RE.search(html)
+        with lock:
+            timings['take_api_exam'].append(elapsed)
+            if response.status_code != 200 or token is None:
+                failures['take_api_exam'] += 1
+        if token is None:
+            continue
+
+        answers = {}
+        for name, value in ANSWER_RE.findall(html):
+            answers.setdefault(name, []).append(value)
+        form = {'paper_token': token.group(1)}
+        form.update({name: random.choice(values) for name, values in answers.items()})
+
+        started = time.perf_counter()
+        response = client.post(f'/student/api-subjects/{subject_id}/submit', data=form)
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            timings['submit_api_exam'].append(elapsed)
+            if response.status_code != 200:
+                failures['submit_api_exam'] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark take_api_exam/submit_api_exam against a fake aloc API')
+    parser.add_argument('--students', type=int, default=10, help='Concurrent simulated students')
+    parser.add_argument('--exams', type=int, default=5, help='Exams each student takes')
+    parser.add_argument('--subjects', default='chemistry,physics,mathematics', help='Comma-separated subject keys')
+    parser.add_argument('--latency-ms', type=float, default=100, help='Fake upstream latency')
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--pool-size', type=int, default=200, help='Distinct upstream questions per subject')
+    parser.add_argument('--pad-bytes', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # no per-request access log from the fake
+    api = FakeAlocAPI(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                      pool_size=args.pool_size, pad_bytes=args.pad_bytes, seed=args.seed)
+    server, base_url = serve_in_thread(api)
+    workdir = tempfile.mkdtemp(prefix='exam-bench-')
+
+    # Config reads these at import time, so they must be set before importing the app
+    os.environ['QUESTIONS_API_BASE_URL'] = base_url
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['QUESTIONS_CACHE_PATH'] = os.path.join(workdir, 'questions_cache.db')
+
+    from app import create_app, db
+    from app.api_service import get_circuit_breaker, get_question_cache, get_single_flight
+    from app.models import User
+    from app.question_bank import get_question_pool
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+
+    with app.app_context():
+        students = []
+        for n in range(args.students):
+            student = User(full_name=f'Bench Student {n}', email=f'bench{n}@example.com',
+                           role='student', class_name='SS 2')
+            student.set_password('bench')
+            students.append(student)
+        db.session.add_all(students)
+        db.session.commit()
+        student_ids = [student.id for student in students]
+
+    subject_ids = [f'api_{key.strip()}_ss2' for key in args.subjects.split(',') if key.strip()]
+    timings = {'take_api_exam': [], 'submit_api_exam': []}
+    failures = {'take_api_exam': 0, 'submit_api_exam': 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_student, args=(app, student_id, subject_ids, args.exams, timings, failures, lock))
+        for student_id in student_ids
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    server.shutdown()
+
+    print(f"{args.students} students x {args.exams} exams, upstream latency {args.latency_ms:.0f}"
+          f"+{args.jitter_ms:.0f}ms, error rate {args.error_rate:.0%}, wall time {wall:.2f}s")
+    print(f"{'endpoint':<18}{'count':>7}{'fail':>6}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'mean ms':>9}{'req/s':>8}")
+    for name, samples in timings.items():
+        mean = statistics.mean(samples) if samples else 0.0
+        print(f"{name:<18}{len(samples):>7}{failures[name]:>6}{percentile(samples, 50):>9.1f}"
+              f"{percentile(samples, 95):>9.1f}{percentile(samples, 99):>9.1f}{mean:>9.1f}"
+              f"{len(samples) / wall:>8.1f}")
+    total = sum(len(samples) for samples in timings.values())
+    print(f"overall: {total} requests, {total / wall:.1f} req/s")
+    print(f"upstream: {api.counters}")
+    with app.app_context():
+        cache = get_question_cache().stats()
+        print(f"cache: hits={cache.get('memory_hits', 0) + cache.get('disk_hits', 0)} misses={cache.get('misses', 0)}")
+        print(f"single-flight: {get_single_flight().stats()}")
+        print(f"circuit breaker: {get_circuit_breaker().stats()}")
+        pool = get_question_pool().stats()
+        print(f"question pool: assembled={pool['assembled']} short={pool['short']} topups={pool['topups']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,7 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # External API Configuration
-    QUESTIONS_API_BASE_URL = "https://questions.aloc.com.ng/api/v2/q"
+    QUESTIONS_API_BASE_URL = os.environ.get("QUESTIONS_API_BASE_URL", "https://questions.aloc.com.ng/api/v2/q")
     QUESTIONS_API_TOKEN = os.environ.get("QUESTIONS_API_TOKEN", "QB-23b20d59287d87f94d94")
     QUESTIONS_API_HEADERS = {
         'Accept': 'application/json',
@@ -20,6 +20,57 @@ class Config:
         'AccessToken': QUESTIONS_API_TOKEN
     }
 
+    # Pooled keep-alive client for the questions API
+    QUESTIONS_API_POOL_SIZE = int(os.environ.get("QUESTIONS_API_POOL_SIZE", 10))
+    QUESTIONS_API_CONNECT_TIMEOUT = 3.05
+    QUESTIONS_API_READ_TIMEOUT = 15
+    QUESTIONS_API_RETRIES = 2  # connect errors and 5xx only; read timeouts are not retried
+    QUESTIONS_API_BACKOFF_FACTOR = 0.3
+    QUESTIONS_API_FANOUT_WORKERS = 8
+    # Circuit breaker: open after N consecutive failures or calls slower than SLOW_CALL_MS
+    QUESTIONS_API_BREAKER_FAILURES = 5
+    QUESTIONS_API_BREAKER_RESET_SECONDS = 30
+    QUESTIONS_API_SLOW_CALL_MS = 8000
+    QUESTIONS_API_BATCH_MAX_JOBS = 24
+
+    # Question payload cache (in-process LRU + SQLite file shared by workers)
+    QUESTIONS_CACHE_PATH = os.environ.get("QUESTIONS_CACHE_PATH", str(BASE_DIR / "questions_cache.db"))
+    QUESTIONS_CACHE_TTL_SECONDS = int(os.environ.get("QUESTIONS_CACHE_TTL_SECONDS", 600))
+    QUESTIONS_CACHE_MEMORY_ENTRIES = 256
+    QUESTIONS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+    QUESTIONS_CACHE_STALE_SECONDS = 24 * 3600  # expired payloads served while upstream is down
+    QUESTIONS_FETCH_LEASE_SECONDS = 45  # how long other workers wait on one in-flight fetch
+
+    # Local question pool used to assemble API exam papers
+    QUESTION_POOL_TTL_SECONDS = 60  # how long a worker reuses a subject's id list
+    QUESTION_POOL_LOW_WATER = 2  # top up from upstream when fewer than LOW_WATER x paper size remain unseen
+    QUESTION_POOL_TOPUP_BATCH = 40
+
+    # Autosaved exam answers are buffered per worker and written in batches
+    AUTOSAVE_FLUSH_SECONDS = 5
+    AUTOSAVE_MAX_PENDING = 500
+
+    # Final submits go to a queue graded by `flask submissions work` instead of the request
+    SUBMISSION_QUEUE_ENABLED = os.environ.get("SUBMISSION_QUEUE_ENABLED", "0") == "1"
+    SUBMISSION_LEASE_SECONDS = 120  # a claimed batch not finished by then is handed to another worker
+    SUBMISSION_MAX_ATTEMPTS = 3
+    SUBMISSION_STALE_SECONDS = 60  # the report page grades a submission no worker has picked up
+
+    # Rendered bodies of completed session reports, per worker
+    SESSION_REPORT_CACHE_ENTRIES = 512
+    # Compiled take_exam question papers, one per subject, per worker
+    EXAM_PAPER_CACHE_ENTRIES = 256
+
+    # Generated report-card PDFs, keyed by a hash of their rendered HTML
+    REPORT_CARD_PDF_CACHE_DIR = os.environ.get("REPORT_CARD_PDF_CACHE_DIR", str(BASE_DIR / "pdf_cache"))
+    REPORT_CARD_PDF_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    # Processes converting PDFs for bulk class report cards; 0 converts inline
+    REPORT_CARD_PDF_WORKERS = int(os.environ.get("REPORT_CARD_PDF_WORKERS", os.cpu_count() or 1))
+
 class TestConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    QUESTIONS_CACHE_PATH = None
+    REPORT_CARD_PDF_CACHE_DIR = None
+    REPORT_CARD_PDF_WORKERS = 0
+    AUTOSAVE_FLUSH_SECONDS = 0  # write-through: no timer threads against the in-memory database
@@ -0,0 +1,58 @@
+"""
+Shared scaffolding for the exam test scripts: a teacher, a JSS1 student and a
+three-question Maths subject with one open exam session, on an in-memory
+database (config.TestConfig).
+
+pytest hands the data to tests through the ``exam`` fixture; the scripts'
+``__main__`` runners call setup_exam() themselves.
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from app import create_app, db
+from app.models import User, Subject, Question, Option, ExamSession
+
+
+def setup_exam():
+    """Return (app, student_id, subject_id, session_id, options), options mapping question id to its option ids"""
+    app = create_app("config.TestConfig")
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        teacher = User(full_name="Teacher", email="t@test.com", role="teacher")
+        teacher.set_password("x")
+        student = User(full_name="Student", email="s@test.com", role="student", class_name="JSS1")
+        student.set_password("x")
+        db.session.add_all([teacher, student])
+        db.session.flush()
+        subject = Subject(name="Maths", duration_minutes=30, teacher_id=teacher.id)
+        db.session.add(subject)
+        db.session.flush()
+        correct = {}
+        for n in range(3):
+            question = Question(subject_id=subject.id, text=f"Q{n}")
+            question.options = [Option(text=f"{n}-{k}") for k in range(4)]
+            db.session.add(question)
+            db.session.flush()
+            question.set_correct_option(question.options[1])
+            correct[question.id] = [o.id for o in question.options]
+        session = ExamSession(subject_id=subject.id, student_id=student.id)
+        db.session.add(session)
+        db.session.commit()
+        return app, student.id, subject.id, session.id, correct
+
+
+def login_client(app, user_id):
+    """A test client logged in as ``user_id``"""
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+    return client
+
+
+@pytest.fixture
+def exam():
+    return setup_exam()
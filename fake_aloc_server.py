@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the aloc questions API (/api/v2/q and /api/v2/m).
+
+Serves questions built from the recorded fixtures in fixtures/aloc/questions.json
+with configurable latency, error rate and payload size, so the SS2/SS3 API
+exam path can be exercised and load-tested without touching
+questions.aloc.com.ng.
+
+Run it standalone and point the app at it:
+
+    python fake_aloc_server.py --port 5055 --latency-ms 150 --error-rate 0.05
+    QUESTIONS_API_BASE_URL=http://127.0.0.1:5055/api/v2/q flask run
+
+or start it in-process with serve_in_thread() (see benchmark_api_exam.py).
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from werkzeug.serving import make_server
+from werkzeug.wrappers import Request, Response
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'aloc', 'questions.json')
+
+_ROUTE_RE = re.compile(r'^/api/v2/(q|m|q-by-id)(?:/(\d+))?/?$')
+
+
+class FakeAlocAPI:
+    """
+    WSGI app mimicking the aloc v2 endpoints.
+
+    Args:
+        fixtures_path: JSON file mapping subject -> list of recorded questions
+        latency_ms: Fixed delay added to every response
+        jitter_ms: Extra uniform random delay on top of latency_ms
+        error_rate: Fraction of requests answered with HTTP 500
+        pool_size: Distinct questions served per subject; recorded questions
+            are repeated as numbered variants to reach it
+        pad_bytes: Filler added to each question's solution to inflate payloads
+        token: Required AccessToken header value (None accepts any token)
+        seed: Seed for the random generator, for repeatable runs
+    """
+
+    def __init__(self, fixtures_path: str = FIXTURES_PATH, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0.0, pool_size: int = 200, pad_bytes: int = 0, token=None, seed=None):
+        with open(fixtures_path) as f:
+            self.fixtures = json.load(f)
+        self.default_questions = [q for questions in self.fixtures.values() for q in questions]
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.pool_size = pool_size
+        self.pad_bytes = pad_bytes
+        self.token = token
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._pools = {}
+        self._lock = threading.Lock()
+        self.counters = {'requests': 0, 'errors': 0, 'questions': 0}
+
+    def _pool(self, subject: str):
+        with self._lock:
+            pool = self._pools.get(subject)
+            if pool is None:
+                recorded = self.fixtures.get(subject) or self.default_questions
+                pool = []
+                for n in range(self.pool_size):
+                    base = recorded[n % len(recorded)]
+                    variant = n // len(recorded)
+                    question = dict(base, id=base['id'] + variant * 1000, option=dict(base['option']))
+                    if variant:
+                        question['question'] = f"{base['question']} (variant {variant})"
+                    if self.pad_bytes:
+                        question['solution'] = (question.get('solution') or '') + 'x' * self.pad_bytes
+                    pool.append(question)
+                self._pools[subject] = pool
+            return pool
+
+    def _questions(self, subject: str, exam_type: str, year, count: int):
+        pool = self._pool(subject)
+        matching = [q for q in pool if not year or q.get('examyear') == year] or pool
+        with self._random_lock:
+            # The live /m endpoint samples with replacement, so repeats are expected
+            chosen = [self._random.choice(matching) for _ in range(count)]
+        return [dict(q, examtype=exam_type) for q in chosen]
+
+    def _json(self, payload, status: int = 200) -> Response:
+        return Response(json.dumps(payload), status=status, mimetype='application/json')
+
+    def dispatch(self, request: Request) -> Response:
+        match = _ROUTE_RE.match(request.path)
+        if match is None:
+            return self._json({'status': 404, 'error': 'Not found'}, 404)
+        if self.token is not None and request.headers.get('AccessToken') != self.token:
+            return self._json({'status': 401, 'error': 'Invalid AccessToken'}, 401)
+        subject = request.args.get('subject')
+        if not subject:
+            return self._json({'status': 406, 'error': 'subject is required'}, 406)
+
+        with self._random_lock:
+            delay = self.latency_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000.0)
+        if failed:
+            with self._lock:
+                self.counters['errors'] += 1
+            return self._json({'status': 500, 'error': 'Simulated upstream failure'}, 500)
+
+        endpoint, number = match.group(1), match.group(2)
+        exam_type = request.args.get('type', 'utme')
+        year = request.args.get('year')
+        if endpoint == 'q-by-id':
+            wanted = int(number or 0)
+            data = next((q for q in self._pool(subject) if q['id'] == wanted), None)
+            if data is None:
+                return self._json({'status': 404, 'error': 'Question not found'}, 404)
+        elif endpoint == 'q' and number is None:
+            data = self._questions(subject, exam_type, year, 1)[0]
+        else:
+            default = 40
+            cap = 120 if endpoint == 'm' else 40
+            data = self._questions(subject, exam_type, year, min(int(number or default), cap))
+
+        with self._lock:
+            self.counters['questions'] += len(data) if isinstance(data, list) else 1
+        return self._json({'subject': subject, 'status': 200, 'data': data})
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.counters['requests'] += 1
+        return self.dispatch(Request(environ))(environ, start_response)
+
+
+def serve_in_thread(api: FakeAlocAPI, host: str = '127.0.0.1', port: int = 0):
+    """
+    Serve ``api`` on a background thread.
+
+    Returns:
+        (server, base_url) where base_url is the /api/v2/q URL to use as
+        QUESTIONS_API_BASE_URL; call server.shutdown() to stop it
+    """
+    server = make_server(host, port, api, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, name='fake-aloc', daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_port}/api/v2/q'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the aloc questions API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--pool-size', type=int, default=200, help='Distinct questions per subject')
+    parser.add_argument('--pad-bytes', type=int, default=0, help='Filler bytes added to each question')
+    parser.add_argument('--token', default=None, help='Require this AccessToken header')
+    parser.add_argument('--fixtures', default=FIXTURES_PATH)
+    args = parser.parse_args()
+
+    api = FakeAlocAPI(args.fixtures, args.latency_ms, args.jitter_ms, args.error_rate,
+                      args.pool_size, args.pad_bytes, args.token)
+    server = make_server(args.host, args.port, api, threaded=True)
+    print(f"Fake aloc API on http://{args.host}:{args.port}/api/v2/q")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,15 @@ Test script for SS2 and SS3 API integration
 This script tests the external API integration without running the full Flask app
 """
 
+import os
 import requests
 import json
 import sys
 from datetime import datetime
 
 # API Configuration
-API_BASE_URL = "https://questions.aloc.com.ng/api/v2/q"
+# Point at fake_aloc_server.py with QUESTIONS_API_BASE_URL=http://127.0.0.1:5055/api/v2/q
+API_BASE_URL = os.environ.get("QUESTIONS_API_BASE_URL", "https://questions.aloc.com.ng/api/v2/q")
 API_TOKEN = "QB-23b20d59287d87f94d94"
 API_HEADERS = {
     'Accept': 'application/json',
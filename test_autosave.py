@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script for the autosave write-behind buffer and the final submit.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from app import db
+from app.autosave import AutosaveBuffer, get_autosave_buffer
+from app.models import ExamSession, Response, Submission
+from conftest import login_client, setup_exam
+
+
+def test_autosave_buffers_coalesces_and_final_submit_grades(exam):
+    """Autosaved answers are coalesced per session and flushed in one batch; the final submit grades the form"""
+    app, student_id, subject_id, session_id, options = exam
+    qids = sorted(options)
+    client = login_client(app, student_id)
+
+    # TestConfig writes through; an option from another question is ignored
+    response = client.post(f"/student/sessions/{session_id}/autosave",
+                           json={"answers": {str(qids[0]): options[qids[0]][1], str(qids[1]): options[qids[0]][2]}})
+    assert response.get_json() == {"success": True, "saved": 1}
+    with app.app_context():
+        assert Response.query.filter_by(session_id=session_id).count() == 1
+    page = client.get(f"/student/sessions/{session_id}").get_data(as_text=True)
+    assert f'const saved = {{"{qids[0]}": {options[qids[0]][1]}}};' in page
+
+    with app.app_context():
+        other = ExamSession(subject_id=subject_id, student_id=student_id)
+        db.session.add(other)
+        db.session.commit()
+        buffer = AutosaveBuffer(flush_seconds=60, max_pending=10)
+        assert not buffer.add(session_id, {qids[1]: options[qids[1]][0]})
+        assert not buffer.add(session_id, {qids[1]: options[qids[1]][1]})
+        assert not buffer.add(other.id, {qids[2]: options[qids[2]][1]})
+        assert buffer.stats()['pending'] == 2
+        assert buffer.flush() == 2
+        assert Response.query.count() == 3
+        assert Response.query.filter_by(session_id=session_id, question_id=qids[1]).one().selected_option_id \
+            == options[qids[1]][1]
+
+        # The form is graded over the stored answers and this worker's pending ones are dropped
+        app.extensions['autosave_buffer'] = buffer
+        buffer.add(session_id, {qids[2]: options[qids[2]][0]})
+    client.post(f"/student/sessions/{session_id}", data={f"question_{qids[2]}": options[qids[2]][1]})
+    with app.app_context():
+        assert db.session.get(ExamSession, session_id).correct_answers == 3
+        assert buffer.pending(session_id) == {}
+        buffer.add(session_id, {qids[0]: options[qids[0]][0]})
+        assert buffer.flush() == 0 and buffer.stats()['dropped_completed'] == 1
+        assert get_autosave_buffer() is buffer
+    assert client.post(f"/student/sessions/{session_id}/autosave", json={"answers": {}}).status_code == 409
+
+
+def test_final_submit_independent_of_autosave_worker(exam):
+    """Answers buffered on one worker neither reach nor change a submit graded on another"""
+    app, student_id, subject_id, session_id, options = exam
+    qids = sorted(options)
+    client = login_client(app, student_id)
+    worker_a, worker_b = AutosaveBuffer(flush_seconds=60), AutosaveBuffer(flush_seconds=60)
+
+    def on(worker):
+        app.extensions['autosave_buffer'] = worker
+
+    on(worker_a)
+    client.post(f"/student/sessions/{session_id}/autosave",
+                json={"answers": {str(qids[0]): options[qids[0]][0], str(qids[2]): options[qids[2]][1]}})
+    assert worker_a.stats()['pending'] == 2
+    # The student changes an answer and leaves one blank; the submit lands on the other worker
+    on(worker_b)
+    client.post(f"/student/sessions/{session_id}",
+                data={f"question_{qids[0]}": options[qids[0]][1], f"question_{qids[1]}": options[qids[1]][1]})
+    with app.app_context():
+        assert db.session.get(ExamSession, session_id).correct_answers == 2
+        # Worker A's late flush is dropped rather than rewriting the graded exam
+        assert worker_a.flush() == 0 and worker_a.stats()['dropped_completed'] == 2
+        assert {r.question_id: r.selected_option_id for r in Response.query} == \
+            {qids[0]: options[qids[0]][1], qids[1]: options[qids[1]][1]}
+
+    # Same with the queue: buffered answers cannot slip in before the worker grades the submission
+    app.config['SUBMISSION_QUEUE_ENABLED'] = True
+    with app.app_context():
+        queued = ExamSession(subject_id=subject_id, student_id=student_id)
+        db.session.add(queued)
+        db.session.commit()
+        queued_id = queued.id
+    on(worker_a)
+    client.post(f"/student/sessions/{queued_id}/autosave", json={"answers": {str(qids[2]): options[qids[2]][1]}})
+    on(worker_b)
+    client.post(f"/student/sessions/{queued_id}", data={f"question_{qids[0]}": options[qids[0]][1]})
+    with app.app_context():
+        assert worker_a.flush() == 0
+        app.test_cli_runner().invoke(args=["submissions", "work", "--once"])
+        assert Submission.query.one().status == "done"
+        assert db.session.get(ExamSession, queued_id).correct_answers == 1
+
+
+def test_flush_racing_a_submit(exam):
+    """A session completed after the flush starts but before its upsert runs gets none of the buffered answers"""
+    app, student_id, subject_id, session_id, options = exam
+    qids = sorted(options)
+    with app.app_context():
+        buffer = AutosaveBuffer(flush_seconds=60)
+        buffer.add(session_id, {qids[0]: options[qids[0]][1]})
+        landed = []
+
+        def submit_lands(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT INTO response") and not landed:
+                landed.append(statement)
+                cursor.execute("UPDATE exam_session SET completed_at = CURRENT_TIMESTAMP WHERE id = ?", (session_id,))
+
+        event.listen(db.engine, "before_cursor_execute", submit_lands)
+        try:
+            assert buffer.flush() == 0
+        finally:
+            event.remove(db.engine, "before_cursor_execute", submit_lands)
+        assert landed
+        assert Response.query.count() == 0
+        assert buffer.stats()['dropped_completed'] == 1
+
+
+if __name__ == "__main__":
+    test_autosave_buffers_coalesces_and_final_submit_grades(setup_exam())
+    test_final_submit_independent_of_autosave_worker(setup_exam())
+    test_flush_racing_a_submit(setup_exam())
+    print("✅ Autosave tests passed!")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test script for the class report-card ZIP export.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import io
+import os
+import sys
+import zipfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import User
+from conftest import login_client, setup_exam
+
+
+def test_class_report_cards_zip(exam):
+    """A teacher downloads a ZIP with one PDF per student in the class, rendered on worker processes"""
+    app, student_id, subject_id, session_id, options = exam
+    with app.app_context():
+        other = User(full_name="Another Student", email="s2@test.com", role="student", class_name="JSS1")
+        other.set_password("x")
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.id
+    app.config['REPORT_CARD_PDF_WORKERS'] = 2
+
+    teacher = login_client(app, 1)
+    response = teacher.get("/teacher/classes/JSS1/report-cards.zip")
+    assert response.status_code == 200
+    assert response.headers["X-Report-Card-Count"] == "2"
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.namelist() == [f"Another_Student_{other_id}.pdf", f"Student_{student_id}.pdf"]
+    assert all(archive.read(name).startswith(b"%PDF") for name in archive.namelist())
+
+    # Later downloads reuse the worker pool started by the first one
+    executor = app.extensions['report_card_executor']
+    with app.app_context():
+        db.session.get(User, other_id).full_name = "Renamed Student"
+        db.session.commit()
+    again = zipfile.ZipFile(io.BytesIO(teacher.get("/teacher/classes/JSS1/report-cards.zip").data))
+    assert again.namelist() == [f"Renamed_Student_{other_id}.pdf", f"Student_{student_id}.pdf"]
+    assert app.extensions['report_card_executor'] is executor
+
+    assert teacher.get("/teacher/classes/SS3/report-cards.zip").status_code == 302
+    assert login_client(app, student_id).get("/teacher/classes/JSS1/report-cards.zip").status_code == 302
+
+
+if __name__ == "__main__":
+    test_class_report_cards_zip(setup_exam())
+    print("✅ Class report tests passed!")
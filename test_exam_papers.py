@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Test script for server-side SS2/SS3 API exam papers.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.exam_papers import create_paper, find_paper, grade_paper, paper_questions
+from app.models import ExamPaper, User
+
+SUBMIT_URL = "/student/api-subjects/api_chemistry_ss2/submit"
+
+
+def _payload():
+    return [
+        {'id': 11, 'question': 'Q11', 'option': {'a': 'H2O', 'b': 'CO2', 'c': 'O2'}, 'answer': 'a'},
+        {'id': 12, 'question': 'Q12', 'option': {'a': 'acid', 'b': 'base', 'c': 'salt', 'd': 'none'}, 'answer': 'c'},
+        # /m samples with replacement; the repeat must not shift the answer vector
+        {'id': 11, 'question': 'Q11', 'option': {'a': 'H2O', 'b': 'CO2', 'c': 'O2'}, 'answer': 'a'},
+        {'id': 13, 'question': 'Q13', 'option': {'a': 'yes', 'b': 'no'}, 'answer': 'b'},
+    ]
+
+
+def _setup():
+    app = create_app("config.TestConfig")
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        students = []
+        for n in range(2):
+            student = User(full_name=f"Student {n}", email=f"s{n}@test.com", role="student", class_name="SS 2")
+            student.set_password("x")
+            students.append(student)
+        db.session.add_all(students)
+        db.session.commit()
+        return app, [student.id for student in students]
+
+
+def _client(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+    return client
+
+
+def _flashes(client):
+    with client.session_transaction() as sess:
+        return [message for _, message in sess.get('_flashes', [])]
+
+
+def test_paper_graded_by_position_against_stored_key():
+    """The paper stores the answer vector apart from the questions and grades each answer by position"""
+    app, (student_id, _) = _setup()
+    with app.app_context():
+        paper = create_paper(student_id, 'chemistry', 'ss2', _payload())
+        questions = paper_questions(paper)
+        assert [q['id'] for q in questions] == ['api_11', 'api_12', 'api_13']
+        assert all('answer' not in q for q in questions)
+        assert json.loads(paper.answer_key_json) == ['H2O', 'salt', 'no']
+
+        results = grade_paper(paper, {'question_api_11': 'H2O', 'question_api_12': 'base', 'question_api_13': 'no'})
+        assert [r['is_correct'] for r in results] == [True, False, True]
+        assert [r['correct_answer'] for r in results] == ['H2O', 'salt', 'no']
+        assert (paper.total_questions, paper.correct_answers) == (3, 2)
+        assert round(paper.score_percentage, 2) == 66.67
+        assert paper.submitted_at is not None
+
+
+def test_forged_or_foreign_token_refused():
+    """Only the student's own paper for the subject can be submitted"""
+    app, (student_id, other_id) = _setup()
+    with app.app_context():
+        token = create_paper(student_id, 'chemistry', 'ss2', _payload()).token
+        assert find_paper(token, student_id, 'chemistry') is not None
+        assert find_paper(token, other_id, 'chemistry') is None
+        assert find_paper(token, student_id, 'physics') is None
+        assert find_paper(None, student_id, 'chemistry') is None
+
+    answers = {'question_api_11': 'H2O', 'question_api_12': 'salt', 'question_api_13': 'no'}
+    for user_id, form_token in ((student_id, 'forged-token'), (student_id, ''), (other_id, token)):
+        client = _client(app, user_id)
+        response = client.post(SUBMIT_URL, data=dict(answers, paper_token=form_token))
+        assert response.status_code == 302
+        assert _flashes(client) == ["This exam paper could not be found. Please start the exam again."]
+    physics = _client(app, student_id)
+    assert physics.post("/student/api-subjects/api_physics_ss2/submit",
+                        data=dict(answers, paper_token=token)).status_code == 302
+    with app.app_context():
+        paper = ExamPaper.query.filter_by(token=token).one()
+        assert paper.submitted_at is None and paper.correct_answers is None
+
+
+def test_second_submit_refused():
+    """A paper is graded once; submitting it again changes nothing"""
+    app, (student_id, _) = _setup()
+    with app.app_context():
+        token = create_paper(student_id, 'chemistry', 'ss2', _payload()).token
+    client = _client(app, student_id)
+
+    first = client.post(SUBMIT_URL, data={'paper_token': token, 'question_api_11': 'H2O'})
+    assert first.status_code == 200
+    again = client.post(SUBMIT_URL, data={'paper_token': token, 'question_api_11': 'H2O',
+                                          'question_api_12': 'salt', 'question_api_13': 'no'})
+    assert again.status_code == 302
+    assert "This exam has already been submitted." in _flashes(client)
+    with app.app_context():
+        assert ExamPaper.query.filter_by(token=token).one().correct_answers == 1
+
+
+if __name__ == "__main__":
+    test_paper_graded_by_position_against_stored_key()
+    test_forged_or_foreign_token_refused()
+    test_second_submit_refused()
+    print("✅ Exam paper tests passed!")
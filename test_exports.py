@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming CSV results exports.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import csv
+import io
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import ExamSession
+from conftest import login_client, setup_exam
+
+
+def test_results_csv_export_streams_sessions_with_answers(exam):
+    """The subject export has one row per session and, on request, the selected option per question"""
+    app, student_id, subject_id, session_id, options = exam
+    qids = sorted(options)
+    login_client(app, student_id).post(f"/student/sessions/{session_id}",
+                                  data={f"question_{qids[0]}": options[qids[0]][1],
+                                        f"question_{qids[2]}": options[qids[2]][3]})
+    with app.app_context():
+        db.session.add(ExamSession(subject_id=subject_id, student_id=student_id))  # still in progress
+        db.session.commit()
+
+    teacher = login_client(app, 1)
+    response = teacher.get(f"/teacher/subjects/{subject_id}/results.csv?answers=1")
+    assert response.status_code == 200 and response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 2
+    assert (rows[0]["correct_answers"], rows[0]["grade"]) == ("1", "F9")
+    assert (rows[0]["Q1"], rows[0]["Q2"], rows[0]["Q3"]) == ("0-1", "", "2-3")
+    assert rows[1]["completed_at"] == "" and rows[1]["Q1"] == ""
+
+    rows = list(csv.DictReader(io.StringIO(teacher.get("/teacher/classes/JSS1/results.csv").get_data(as_text=True))))
+    assert [row["session_id"] for row in rows] == [str(session_id), str(session_id + 1)]
+    assert "Q1" not in rows[0]
+
+
+if __name__ == "__main__":
+    test_results_csv_export_streams_sessions_with_answers(setup_exam())
+    print("✅ Export tests passed!")
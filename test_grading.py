@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Test script for the set-based grading engine.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.grading import grade_session, load_answer_key, session_details
+from app.models import Subject, Question, Option, ExamSession, Response
+from conftest import login_client, setup_exam
+
+
+def test_answer_key_single_query(exam):
+    """The key lists every question with its correct option and valid options"""
+    app, _, subject_id, _, options = exam
+    with app.app_context():
+        key = load_answer_key(subject_id)
+        assert key.question_ids == sorted(options)
+        assert all(key.correct[qid] == opts[1] for qid, opts in options.items())
+        assert len(key.option_question) == 12
+
+
+def test_take_exam_upserts_and_scores(exam):
+    """Submitting twice updates the same response rows and rescores the session"""
+    app, student_id, _, session_id, options = exam
+    client = login_client(app, student_id)
+    qids = sorted(options)
+
+    form = {f"question_{qids[0]}": options[qids[0]][1], f"question_{qids[1]}": options[qids[1]][0],
+            # an option from another question is ignored
+            f"question_{qids[2]}": options[qids[0]][2]}
+    assert client.post(f"/student/sessions/{session_id}", data=form).status_code == 302
+    with app.app_context():
+        session = db.session.get(ExamSession, session_id)
+        assert (session.total_questions, session.correct_answers) == (3, 1)
+        assert session.completed_at is not None
+        assert Response.query.filter_by(session_id=session_id).count() == 2
+
+    form = {f"question_{qid}": options[qid][1] for qid in qids}
+    client.post(f"/student/sessions/{session_id}", data=form)
+    with app.app_context():
+        session = db.session.get(ExamSession, session_id)
+        assert (session.total_questions, session.correct_answers) == (3, 3)
+        assert session.score_percentage == 100
+        assert Response.query.filter_by(session_id=session_id).count() == 3
+        details = session_details(session)
+        assert [d["is_correct"] for d in details] == [True, True, True]
+
+
+def test_response_dedupe_runs_only_before_unique_index():
+    """Startup removes duplicate responses once, when it creates the unique index, and not on later starts"""
+    import tempfile
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from config import TestConfig
+
+    with tempfile.TemporaryDirectory() as tmp:
+        class FileConfig(TestConfig):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp}/exam.db"
+
+        app = create_app(FileConfig)
+        with app.app_context():
+            db.session.execute(db.text("DROP INDEX ux_response_session_question"))
+            db.session.execute(db.text(
+                "INSERT INTO response (session_id, question_id, selected_option_id) VALUES (1, 1, 1), (1, 1, 2), (1, 2, 3)"
+            ))
+            db.session.commit()
+            db.engine.dispose()
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(Engine, "before_cursor_execute", listener)
+        try:
+            app = create_app(FileConfig)
+            with app.app_context():
+                assert [(r.question_id, r.selected_option_id) for r in Response.query.order_by(Response.id)] \
+                    == [(1, 2), (2, 3)]
+                db.engine.dispose()
+            assert sum("DELETE FROM response" in s for s in statements) == 1
+
+            statements.clear()
+            app = create_app(FileConfig)
+            with app.app_context():
+                db.engine.dispose()
+            assert not any("DELETE FROM response" in s for s in statements)
+        finally:
+            event.remove(Engine, "before_cursor_execute", listener)
+
+
+def test_backfill_scores_existing_responses(exam):
+    """grade_session without new selections scores what is already stored"""
+    app, _, _, session_id, options = exam
+    with app.app_context():
+        qid = sorted(options)[0]
+        db.session.add(Response(session_id=session_id, question_id=qid, selected_option_id=options[qid][1]))
+        db.session.commit()
+        session = db.session.get(ExamSession, session_id)
+        total, correct, percentage = grade_session(session, complete=False)
+        assert (total, correct) == (3, 1)
+        assert session.completed_at is None
+
+
+def test_answer_key_cached_until_teacher_edit(exam):
+    """Grading reuses the cached key with no key queries; a teacher edit invalidates it"""
+    app, student_id, subject_id, session_id, options = exam
+    from sqlalchemy import event
+    from app.grading import get_answer_key_cache
+
+    qids = sorted(options)
+    form = {f"question_{qid}": options[qid][1] for qid in qids}
+    client = login_client(app, student_id)
+    client.post(f"/student/sessions/{session_id}", data=form)
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        client.post(f"/student/sessions/{session_id}", data=form)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert not any("JOIN option" in s for s in statements)
+    with app.app_context():
+        assert get_answer_key_cache().stats()['builds'] == 1
+
+    # The teacher makes option 2 of the first question correct instead
+    teacher = login_client(app, 1)
+    teacher.post(f"/teacher/options/{options[qids[0]][2]}/edit", data={"text": "new", "is_correct": "y"})
+    client.post(f"/student/sessions/{session_id}", data=form)
+    with app.app_context():
+        session = db.session.get(ExamSession, session_id)
+        assert session.correct_answers == 2
+        assert db.session.get(Subject, subject_id).key_version == 1
+        question = db.session.get(Question, qids[0])
+        assert question.correct_option_id == options[qids[0]][2]
+        assert [o.is_correct for o in question.options] == [False, False, True, False]
+        assert get_answer_key_cache().stats()['builds'] == 2
+
+
+def test_backfill_batches_and_fast_path(exam):
+    """The batch job scores every unscored completed session, then has nothing to do"""
+    from datetime import datetime
+    from app.grading import backfill_scores
+
+    app, student_id, subject_id, session_id, options = exam
+    with app.app_context():
+        qid = sorted(options)[0]
+        for _ in range(4):
+            session = ExamSession(subject_id=subject_id, student_id=student_id, completed_at=datetime.utcnow())
+            db.session.add(session)
+            db.session.flush()
+            db.session.add(Response(session_id=session.id, question_id=qid, selected_option_id=options[qid][1]))
+        db.session.commit()
+
+        progress = []
+        summary = backfill_scores(batch_size=3, echo=progress.append)
+        assert summary == {'pending': 4, 'scored': 4, 'batches': 2, 'last_id': session.id, 'remaining': 0}
+        assert len(progress) == 2
+        assert ExamSession.query.filter_by(correct_answers=1).count() == 4
+        assert backfill_scores() == {'pending': 0, 'scored': 0, 'batches': 0, 'last_id': None, 'remaining': 0}
+
+
+def test_backfill_command_reports_progress_and_resumes(exam):
+    """A limited CLI run echoes each batch and where it stopped; the next run picks up after that session"""
+    from datetime import datetime
+
+    app, student_id, subject_id, session_id, options = exam
+    with app.app_context():
+        qid = sorted(options)[0]
+        sessions = [ExamSession(subject_id=subject_id, student_id=student_id, completed_at=datetime.utcnow())
+                    for _ in range(5)]
+        db.session.add_all(sessions)
+        db.session.flush()
+        db.session.add_all(Response(session_id=s.id, question_id=qid, selected_option_id=options[qid][1])
+                           for s in sessions)
+        db.session.commit()
+        ids = [s.id for s in sessions]
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["scores", "backfill", "--batch-size", "2", "--limit", "3"])
+    assert result.output.splitlines() == [
+        f"[2/3] scored sessions up to id {ids[1]}",
+        f"[3/3] scored sessions up to id {ids[2]}",
+        "Backfill finished: 3 of 5 sessions scored in 2 batches.",
+        f"Stopped after session id {ids[2]}; 2 sessions are still unscored. "
+        "Run the command again to resume from there.",
+    ]
+    with app.app_context():
+        assert [s.id for s in ExamSession.query.filter(ExamSession.correct_answers.isnot(None))] == ids[:3]
+
+    result = runner.invoke(args=["scores", "backfill", "--batch-size", "2"])
+    assert result.output.splitlines() == [
+        f"[2/2] scored sessions up to id {ids[4]}",
+        "Backfill finished: 2 of 2 sessions scored in 1 batches.",
+    ]
+    with app.app_context():
+        assert ExamSession.query.filter_by(correct_answers=1).count() == 5
+    assert runner.invoke(args=["scores", "backfill"]).output == (
+        "Nothing to do: every completed session has a stored score.\n"
+    )
+
+
+def test_backfill_scores_route_scores_sessions(exam):
+    """The teacher-only backfill page runs the batch job instead of recursing into itself"""
+    from datetime import datetime
+
+    app, student_id, subject_id, session_id, options = exam
+    with app.app_context():
+        qid = sorted(options)[0]
+        session = db.session.get(ExamSession, session_id)
+        session.completed_at = datetime.utcnow()
+        db.session.add(Response(session_id=session_id, question_id=qid, selected_option_id=options[qid][1]))
+        db.session.commit()
+
+    assert login_client(app, student_id).get("/student/backfill-scores").status_code == 302
+    with app.app_context():
+        assert db.session.get(ExamSession, session_id).correct_answers is None
+
+    teacher = login_client(app, 1)
+    assert teacher.get("/student/backfill-scores").status_code == 302
+    with teacher.session_transaction() as sess:
+        assert sess['_flashes'] == [("success", "Scores backfilled successfully!")]
+    with app.app_context():
+        session = db.session.get(ExamSession, session_id)
+        assert (session.total_questions, session.correct_answers) == (3, 1)
+
+
+def test_report_card_latest_session_per_subject(exam):
+    """The report card shows only the latest completed session of each subject the student sat"""
+    from datetime import datetime, timedelta
+    from app.report_card import report_card_data
+
+    app, student_id, subject_id, session_id, options = exam
+    with app.app_context():
+        db.session.add(Subject(name="Unused", duration_minutes=30, teacher_id=1))
+        now = datetime.utcnow()
+        older = db.session.get(ExamSession, session_id)
+        older.completed_at, older.total_questions, older.correct_answers, older.score_percentage = \
+            now - timedelta(days=1), 3, 0, 0.0
+        db.session.add(ExamSession(subject_id=subject_id, student_id=student_id, completed_at=now,
+                                   total_questions=3, correct_answers=3, score_percentage=100.0))
+        db.session.add(ExamSession(subject_id=subject_id, student_id=student_id))  # still in progress
+        db.session.commit()
+
+        data = report_card_data(student_id)
+        assert [row["subject"].id for row in data["rows"]] == [subject_id]
+        assert data["rows"][0]["percentage"] == 100.0
+        assert data["overall"] == 100.0
+
+    client = login_client(app, student_id)
+    assert client.get("/student/report-card").status_code == 200
+
+
+def test_student_results_updated_on_submit_and_rebuilt(exam):
+    """Submitting keeps student_subject_result current; the rebuild reproduces the same row"""
+    from app.models import StudentSubjectResult
+    from app.report_card import report_card_data
+    from app.results import rebuild_results
+
+    app, student_id, subject_id, session_id, options = exam
+    client = login_client(app, student_id)
+    qids = sorted(options)
+    client.post(f"/student/sessions/{session_id}", data={f"question_{qids[0]}": options[qids[0]][1]})
+    with app.app_context():
+        db.session.add(ExamSession(subject_id=subject_id, student_id=student_id))
+        db.session.commit()
+        second_id = ExamSession.query.order_by(ExamSession.id.desc()).first().id
+    client.post(f"/student/sessions/{second_id}", data={f"question_{qid}": options[qid][1] for qid in qids})
+
+    with app.app_context():
+        result = StudentSubjectResult.query.filter_by(student_id=student_id, subject_id=subject_id).one()
+        assert (result.attempts, result.latest_session_id, result.latest_correct) == (2, second_id, 3)
+        assert result.best_score == 100 and result.grade == "A1"
+        assert report_card_data(student_id)["rows"][0]["attempts"] == 2
+
+        before = (result.attempts, result.best_score, result.latest_session_id, result.grade)
+        assert rebuild_results(batch_size=1) == 1
+        result = StudentSubjectResult.query.one()
+        assert (result.attempts, result.best_score, result.latest_session_id, result.grade) == before
+
+
+def test_results_populated_for_sessions_completed_before_upgrade(exam):
+    """Startup fills an empty result table, so a new submission does not hide subjects sat earlier"""
+    from datetime import datetime
+    from app.models import StudentSubjectResult
+    from app.report_card import report_card_data
+    from app.results import populate_results
+
+    app, student_id, subject_id, session_id, options = exam
+    with app.app_context():
+        # Sessions completed before student_subject_result existed have no summary rows
+        old = db.session.get(ExamSession, session_id)
+        old.completed_at, old.total_questions, old.correct_answers, old.score_percentage = \
+            datetime.utcnow(), 3, 3, 100.0
+        english = Subject(name="English", duration_minutes=30, teacher_id=1)
+        db.session.add(english)
+        db.session.flush()
+        question = Question(subject_id=english.id, text="E0")
+        question.options = [Option(text="right"), Option(text="wrong")]
+        db.session.add(question)
+        db.session.flush()
+        question.set_correct_option(question.options[0])
+        new = ExamSession(subject_id=english.id, student_id=student_id)
+        db.session.add(new)
+        db.session.commit()
+        assert StudentSubjectResult.query.count() == 0
+        english_id, new_id, question_id, right_id = english.id, new.id, question.id, question.options[0].id
+
+        assert populate_results() == 1
+        assert populate_results() == 0
+
+    login_client(app, student_id).post(f"/student/sessions/{new_id}",
+                                  data={f"question_{question_id}": right_id})
+    with app.app_context():
+        rows = report_card_data(student_id)["rows"]
+        assert [row["subject"].id for row in rows] == [subject_id, english_id]
+        assert [row["percentage"] for row in rows] == [100.0, 100.0]
+
+
+def test_results_skip_deleted_subjects_and_score_legacy_sessions(exam):
+    """Startup population scores unscored sessions and leaves out subjects that no longer exist"""
+    from datetime import datetime
+    from app.models import StudentSubjectResult
+    from app.report_card import report_card_data
+    from app.results import populate_results, rebuild_results
+
+    app, student_id, subject_id, session_id, options = exam
+    with app.app_context():
+        # A legacy session: answers and completed_at, but no stored score
+        legacy = db.session.get(ExamSession, session_id)
+        legacy.completed_at = datetime.utcnow()
+        qids = sorted(options)
+        db.session.add_all(Response(session_id=session_id, question_id=qid, selected_option_id=options[qid][1])
+                           for qid in qids[:2])
+        gone = Subject(name="Gone", duration_minutes=30, teacher_id=1)
+        db.session.add(gone)
+        db.session.flush()
+        db.session.add(ExamSession(subject_id=gone.id, student_id=student_id, completed_at=datetime.utcnow(),
+                                   total_questions=1, correct_answers=1, score_percentage=100.0))
+        db.session.delete(gone)
+        db.session.commit()
+
+        # Rows rebuilt before the scores are stored are graded when the report card is read
+        assert rebuild_results() == 1
+        assert StudentSubjectResult.query.one().latest_score is None
+        row, = report_card_data(student_id)["rows"]
+        assert (row["total"], row["correct"], round(row["percentage"], 2), row["grade"]) == (3, 2, 66.67, "B3")
+
+        StudentSubjectResult.query.delete()
+        db.session.commit()
+        assert populate_results() == 1
+        result = StudentSubjectResult.query.one()
+        assert result.subject_id == subject_id
+        assert (result.latest_correct, round(result.latest_score, 2)) == (2, 66.67)
+
+
+if __name__ == "__main__":
+    test_answer_key_single_query(setup_exam())
+    test_take_exam_upserts_and_scores(setup_exam())
+    test_response_dedupe_runs_only_before_unique_index()
+    test_backfill_scores_existing_responses(setup_exam())
+    test_answer_key_cached_until_teacher_edit(setup_exam())
+    test_backfill_batches_and_fast_path(setup_exam())
+    test_backfill_command_reports_progress_and_resumes(setup_exam())
+    test_backfill_scores_route_scores_sessions(setup_exam())
+    test_report_card_latest_session_per_subject(setup_exam())
+    test_student_results_updated_on_submit_and_rebuilt(setup_exam())
+    test_results_populated_for_sessions_completed_before_upgrade(setup_exam())
+    test_results_skip_deleted_subjects_and_score_legacy_sessions(setup_exam())
+    print("✅ Grading tests passed!")
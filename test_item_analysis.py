@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-subject item analysis statistics.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.item_analysis import analyse_subject, get_item_analysis_cache
+from app.models import Subject, ExamSession, Response
+from conftest import login_client, setup_exam
+
+
+def test_item_analysis_statistics_and_incremental_update(exam):
+    """Difficulty, discrimination, option rates and KR-20 match hand-computed values, and new sessions are added incrementally"""
+    app, student_id, subject_id, session_id, options = exam
+    qids = sorted(options)
+    # 1 = correct (option 1), 0 = wrong (option 0), None = unanswered
+    patterns = [(1, 1, 1), (1, 1, 0), (1, 0, 0), (0, 0, None)]
+    now = datetime.utcnow()
+    with app.app_context():
+        for n, pattern in enumerate(patterns):
+            session = ExamSession(subject_id=subject_id, student_id=student_id, completed_at=now - timedelta(minutes=10 - n))
+            db.session.add(session)
+            db.session.flush()
+            for qid, mark in zip(qids, pattern):
+                if mark is not None:
+                    db.session.add(Response(session_id=session.id, question_id=qid, selected_option_id=options[qid][mark]))
+        db.session.commit()
+
+        subject = db.session.get(Subject, subject_id)
+        result = analyse_subject(subject)
+        assert result["sessions"] == 4
+        assert [item["difficulty"] for item in result["items"]] == [0.75, 0.5, 0.25]
+        # totals 3,2,1,0: variance 1.25, sum(pq) = 0.1875 + 0.25 + 0.1875
+        assert abs(result["kr20"] - 1.5 * (1 - 0.625 / 1.25)) < 1e-9
+        # item 1 (1,1,1,0) against rest scores (2,1,0,0)
+        assert abs(result["items"][0]["discrimination"] - 0.1875 / (0.1875 * 0.6875) ** 0.5) < 1e-9
+        assert all(item["discrimination"] > 0.5 for item in result["items"])
+        third = result["items"][2]
+        assert [o["rate"] for o in third["options"]] == [0.5, 0.25, 0.0, 0.0]
+        assert third["unanswered"] == 0.25 and third["flags"] == []
+        assert result["items"][0]["options"][1]["is_correct"]
+
+        # A new session is appended without rebuilding the matrix
+        session = db.session.get(ExamSession, session_id)
+        session.completed_at = now
+        db.session.add(Response(session_id=session_id, question_id=qids[2], selected_option_id=options[qids[2]][1]))
+        db.session.commit()
+        result = analyse_subject(subject)
+        assert result["sessions"] == 5
+        assert result["items"][2]["difficulty"] == 0.4
+        assert get_item_analysis_cache().stats() == {'builds': 1, 'updates': 1, 'subjects': 1}
+
+    assert login_client(app, 1).get(f"/teacher/subjects/{subject_id}/item-analysis").status_code == 200
+
+
+if __name__ == "__main__":
+    test_item_analysis_statistics_and_incremental_update(setup_exam())
+    print("✅ Item analysis tests passed!")
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Test script for the compiled exam paper cache.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from app import db
+from app.models import User, ExamSession
+from app.paper_cache import get_exam_paper_cache
+from conftest import login_client, setup_exam
+
+
+def test_exam_paper_compiled_once_and_revalidated(exam):
+    """The paper is rendered once per subject version and served with an ETag; a teacher edit recompiles it"""
+    app, student_id, subject_id, session_id, options = exam
+    qids = sorted(options)
+    client = login_client(app, student_id)
+    with app.app_context():
+        other = User(full_name="Other", email="o@test.com", role="student", class_name="JSS1")
+        other.set_password("x")
+        db.session.add(other)
+        db.session.flush()
+        second = ExamSession(subject_id=subject_id, student_id=other.id)
+        db.session.add(second)
+        db.session.commit()
+        other_id, second_id = other.id, second.id
+
+    page = client.get(f"/student/sessions/{session_id}").get_data(as_text=True)
+    assert f"/student/sessions/{session_id}/paper" in page and "Q0" not in page
+    first = client.get(f"/student/sessions/{session_id}/paper")
+    assert first.status_code == 200 and first.headers["Cache-Control"] == "private, no-cache"
+    assert all(f'value="{oid}"' in first.get_data(as_text=True) for oid in options[qids[2]])
+    etag = first.headers["ETag"]
+
+    # Another student of the subject gets the same compiled paper without querying questions
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        again = login_client(app, other_id).get(f"/student/sessions/{second_id}/paper", headers={"If-None-Match": etag})
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert again.status_code == 304 and again.headers["ETag"] == etag
+    assert not any("FROM question" in s or "FROM option" in s for s in statements)
+    assert client.get(f"/student/sessions/{second_id}/paper").status_code == 403
+
+    login_client(app, 1).post(f"/teacher/questions/{qids[0]}/edit", data={"text": "Renamed"})
+    edited = client.get(f"/student/sessions/{session_id}/paper", headers={"If-None-Match": etag})
+    assert edited.status_code == 200 and edited.headers["ETag"] != etag and b"Renamed" in edited.data
+    with app.app_context():
+        assert get_exam_paper_cache().stats() == {'hits': 1, 'builds': 2, 'entries': 1}
+
+
+if __name__ == "__main__":
+    test_exam_paper_compiled_once_and_revalidated(setup_exam())
+    print("✅ Exam paper cache tests passed!")
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+Test script for the local API question bank: ingestion and deduplication,
+paper assembly, pool top-ups and the resumable harvester.
+Runs against an in-memory database (config.TestConfig) and, where upstream
+is needed, the local fake aloc server.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import parse_qs
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from app import create_app, db
+from app.api_service import get_bank_subject, ingest_questions
+from app.exam_papers import backfill_answered, create_paper, grade_paper
+from app.models import AnsweredQuestion, HarvestCursor, Option, Question, User
+from app.question_bank import RateLimiter, answered_question_ids, assemble_paper, get_question_pool, harvest
+from fake_aloc_server import FakeAlocAPI, serve_in_thread
+
+
+def _question(upstream_id, text, options, answer='a', year='2010'):
+    return {'id': upstream_id, 'question': text, 'option': dict(zip('abcd', options)), 'answer': answer,
+            'examyear': year, 'examtype': 'utme'}
+
+
+def _payload():
+    return [
+        _question(1, 'What is H2O?', ['Water', 'Salt', 'Acid', 'Base']),
+        _question(2, 'Which gas do plants absorb?', ['Oxygen', 'Carbon dioxide', 'Nitrogen'], answer='b'),
+        _question(3, 'Pick the noble gas', ['Neon', 'Sodium'], year=None),
+    ]
+
+
+def _app():
+    return create_app("config.TestConfig")
+
+
+def test_ingest_inserts_questions_and_options():
+    """New questions and options are bulk inserted and the correct option is recorded"""
+    app = _app()
+    with app.app_context():
+        get_bank_subject('chemistry')
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            summary = ingest_questions('chemistry', _payload())
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        # One RETURNING insert for the questions and one for their options
+        inserts = [s for s in statements if s.startswith("INSERT")]
+        assert len(inserts) == 2 and all("RETURNING" in s for s in inserts)
+        assert (summary['inserted'], summary['updated'], summary['duplicates']) == (3, 0, 0)
+        subject = get_bank_subject('chemistry')
+        questions = {q.upstream_id: q for q in Question.query.filter_by(subject_id=subject.id)}
+        assert sorted(questions) == [1, 2, 3]
+        assert summary['question_ids'] == {upstream_id: q.id for upstream_id, q in questions.items()}
+        assert Option.query.count() == 9
+        assert db.session.get(Option, questions[2].correct_option_id).text == 'Carbon dioxide'
+        assert [o.is_correct for o in questions[2].options] == [False, True, False]
+        assert all(q.content_hash and q.source == 'aloc' for q in questions.values())
+
+
+def test_ingest_same_payload_twice_and_reworded_duplicate():
+    """Repeats match by upstream id, reworded copies by content hash; neither adds rows"""
+    app = _app()
+    with app.app_context():
+        first = ingest_questions('chemistry', _payload())
+
+        # Same payload again, now carrying the year question 3 was missing
+        again = _payload()
+        again[2]['examyear'] = '2015'
+        summary = ingest_questions('chemistry', again)
+        assert (summary['inserted'], summary['updated'], summary['duplicates']) == (0, 1, 3)
+        assert summary['question_ids'] == first['question_ids']
+        assert db.session.get(Question, first['question_ids'][3]).year == '2015'
+
+        # Served again under new ids with markup, case, spacing and option order changed
+        reworded = [
+            _question(101, '<p>what  is\n<b>H2O?</b></p>', ['salt', 'WATER', 'Base', 'acid'], answer='b'),
+            _question(102, 'Which gas do plants absorb?', ['Oxygen', 'Carbon dioxide', 'Nitrogen'], answer='b'),
+            # and within one payload, a copy of a question that is new in it
+            _question(103, 'What is the symbol of gold?', ['Au', 'Ag']),
+            _question(104, 'What is the symbol of GOLD?', ['Ag', 'Au'], answer='b'),
+        ]
+        summary = ingest_questions('chemistry', reworded)
+        assert (summary['inserted'], summary['duplicates']) == (1, 3)
+        assert summary['question_ids'][101] == first['question_ids'][1]
+        assert summary['question_ids'][102] == first['question_ids'][2]
+        assert summary['question_ids'][103] == summary['question_ids'][104]
+
+        assert Question.query.count() == 4
+        assert Option.query.count() == 11
+        # Other subjects keep their own copies
+        assert ingest_questions('physics', _payload())['inserted'] == 3
+
+
+def test_ingest_reads_exam_year_from_aloc_payload():
+    """Questions in the aloc shape keep their examyear; ones without it take the year they were fetched for"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'aloc', 'questions.json')) as f:
+        payload = json.load(f)['chemistry']
+    app = _app()
+    with app.app_context():
+        summary = ingest_questions('chemistry', payload)
+        assert summary['inserted'] == len(payload)
+        years = {q.upstream_id: q.year for q in Question.query}
+        assert years == {q['id']: q['examyear'] for q in payload}
+        assert None not in years.values()
+
+        undated = _question(900, 'Which element has atomic number 1?', ['Hydrogen', 'Helium'], year=None)
+        ingest_questions('chemistry', [undated], year='2005')
+        assert Question.query.filter_by(upstream_id=900).one().year == '2005'
+
+
+def _student(email):
+    student = User(full_name=email, email=email, role="student", class_name="SS 2")
+    student.set_password("x")
+    db.session.add(student)
+    db.session.commit()
+    return student.id
+
+
+def _bank(count):
+    ingest_questions('chemistry', [_question(n, f'Bank question {n}', [f'{n}-a', f'{n}-b']) for n in range(count)])
+
+
+def test_assembled_papers_skip_answered_questions():
+    """Papers leave out bank questions the student met on submitted papers, read from answered_question"""
+    app = _app()
+    app.config['QUESTION_POOL_LOW_WATER'] = 1  # no upstream top-ups here
+    with app.app_context():
+        _bank(30)
+        student_id, other_id = _student("s@test.com"), _student("o@test.com")
+
+        first = assemble_paper('chemistry', 20, student_id=student_id)
+        assert len({q['qid'] for q in first}) == 20
+        # An unsubmitted paper does not count as answered
+        paper = create_paper(student_id, 'chemistry', 'ss2', first)
+        assert answered_question_ids(student_id, 'chemistry') == set()
+        grade_paper(paper, {})
+        assert answered_question_ids(student_id, 'chemistry') == {q['qid'] for q in first}
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            second = assemble_paper('chemistry', 10, student_id=student_id)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        assert not any("exam_paper" in s for s in statements)
+        assert {q['qid'] for q in second}.isdisjoint(q['qid'] for q in first)
+        grade_paper(create_paper(student_id, 'chemistry', 'ss2', second), {})
+
+        assert assemble_paper('chemistry', 1, student_id=student_id) is None
+        assert len(assemble_paper('chemistry', 20, student_id=other_id)) == 20
+        assert answered_question_ids(student_id, 'physics') == set()
+
+        # Papers submitted before the table existed are picked up by the startup backfill
+        AnsweredQuestion.query.delete()
+        db.session.commit()
+        assert backfill_answered() == 2
+        assert AnsweredQuestion.query.count() == 30
+        assert backfill_answered() == 2 and AnsweredQuestion.query.count() == 30
+
+
+def test_pool_topped_up_in_background():
+    """A short pool schedules one upstream top-up without making assembly wait for it"""
+    api = FakeAlocAPI(latency_ms=300, pool_size=60, seed=1)
+    server, base_url = serve_in_thread(api)
+    try:
+        app = _app()
+        app.config['QUESTIONS_API_BASE_URL'] = base_url
+        with app.app_context():
+            _bank(5)
+            pool = get_question_pool()
+
+            started = time.perf_counter()
+            assert pool.assemble('chemistry', 10) is None
+            assert pool.assemble('chemistry', 10) is None
+            assert time.perf_counter() - started < 0.25
+            assert pool.stats()['topups'] == 1
+
+            deadline = time.monotonic() + 10
+            while pool.stats()['pending_topups'] and time.monotonic() < deadline:
+                time.sleep(0.05)
+            stats = pool.stats()
+            assert stats['pending_topups'] == 0 and stats['topup_added'] > 0
+            assert api.counters['requests'] == 1
+
+            chosen = pool.assemble('chemistry', 10)
+            assert len(set(chosen)) == 10
+            assert Question.query.count() == 5 + stats['topup_added']
+    finally:
+        server.shutdown()
+
+
+class _FlakyUpstream:
+    """Fake aloc API that answers 503 once ``budget`` requests have been served, logging each year asked for"""
+
+    def __init__(self, api, budget=None):
+        self.api = api
+        self.budget = budget
+        self.years = []
+
+    def __call__(self, environ, start_response):
+        self.years.append(parse_qs(environ.get('QUERY_STRING', '')).get('year', [None])[0])
+        if self.budget is not None and len(self.years) > self.budget:
+            start_response('503 Service Unavailable', [('Content-Type', 'application/json')])
+            return [b'{"status": 503}']
+        return self.api(environ, start_response)
+
+
+def test_interrupted_harvest_resumes_from_cursors():
+    """A harvest cut short by upstream failures resumes without refetching subject/years already done"""
+    upstream = _FlakyUpstream(FakeAlocAPI(pool_size=30, seed=3), budget=15)
+    server, base_url = serve_in_thread(upstream)
+    try:
+        app = _app()
+        app.config.update(QUESTIONS_API_BASE_URL=base_url, QUESTIONS_API_RETRIES=0,
+                          QUESTIONS_API_BREAKER_FAILURES=1000)
+        options = dict(workers=1, rate=1000, batch_size=10, max_calls=20, saturation=2, echo=lambda line: None)
+        with app.app_context():
+            first = harvest(['chemistry'], **options)
+            assert first['failed'] > 0 and first['calls'] == len(upstream.years)
+            cursors = {c.year: (c.calls, c.completed_at) for c in HarvestCursor.query}
+            done = {year for year, (_, completed_at) in cursors.items() if completed_at is not None}
+            assert done and len(done) < first['jobs']
+            stored = Question.query.count()
+
+            upstream.budget, upstream.years = None, []
+            second = harvest(['chemistry'], **options)
+            assert second['skipped'] == len(done) and second['failed'] == 0
+            assert second['calls'] == len(upstream.years)
+            assert not done & set(upstream.years)
+            for cursor in HarvestCursor.query:
+                calls_before, completed_before = cursors.get(cursor.year, (0, None))
+                assert cursor.completed_at is not None
+                if completed_before is not None:
+                    assert (cursor.calls, cursor.completed_at) == (calls_before, completed_before)
+                else:
+                    # Interrupted years carry on counting from where they stopped
+                    assert cursor.calls >= calls_before
+            assert Question.query.count() >= stored
+
+            upstream.years = []
+            assert harvest(['chemistry'], **options)['skipped'] == first['jobs']
+            assert upstream.years == []
+    finally:
+        server.shutdown()
+
+
+def test_rate_limiter_spaces_calls_across_threads():
+    """Calls from several threads share one schedule of at most ``rate`` per second"""
+    limiter = RateLimiter(20)
+    stamps = []
+    lock = threading.Lock()
+
+    def work():
+        for _ in range(3):
+            limiter.wait()
+            with lock:
+                stamps.append(time.monotonic())
+
+    threads = [threading.Thread(target=work) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stamps.sort()
+    gaps = [later - earlier for earlier, later in zip(stamps, stamps[1:])]
+    assert len(stamps) == 9
+    assert min(gaps) >= 0.045
+    assert stamps[-1] - stamps[0] >= 8 * 0.05 - 0.01
+    assert RateLimiter(0).interval == 0
+
+
+if __name__ == "__main__":
+    test_ingest_inserts_questions_and_options()
+    test_ingest_same_payload_twice_and_reworded_duplicate()
+    test_ingest_reads_exam_year_from_aloc_payload()
+    test_assembled_papers_skip_answered_questions()
+    test_pool_topped_up_in_background()
+    test_interrupted_harvest_resumes_from_cursors()
+    test_rate_limiter_spaces_calls_across_threads()
+    print("✅ Question bank tests passed!")
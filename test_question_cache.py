@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Test script for the two-tier question payload cache and single-flight coalescing.
+Runs entirely offline against a temporary SQLite file.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.api_service import QuestionCache, SingleFlight, CircuitBreaker, QuestionsAPIService
+
+
+def _payload(n):
+    return {'subject': 'chemistry', 'status': 200, 'data': [{'id': i, 'question': f'Q{i}'} for i in range(n)]}
+
+
+def test_memory_and_disk_tiers():
+    """A payload stored by one cache instance is visible to another sharing the file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+        key = QuestionCache.make_key('Chemistry', 'utme', None, 20)
+
+        worker_a = QuestionCache(path, ttl_seconds=60)
+        assert worker_a.get(key) is None
+        worker_a.set(key, _payload(3))
+        assert worker_a.get(key) == _payload(3)
+
+        # A second "worker" has an empty memory tier but shares the SQLite file
+        worker_b = QuestionCache(path, ttl_seconds=60)
+        assert worker_b.get(key) == _payload(3)
+        assert worker_b.get(key) == _payload(3)
+
+        stats = worker_b.stats()
+        assert stats['disk_hits'] == 1
+        assert stats['memory_hits'] == 1
+        assert stats['misses'] == 0
+
+
+def test_ttl_expiry():
+    """Expired entries are treated as misses in both tiers"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = QuestionCache(os.path.join(tmp, 'cache.db'), ttl_seconds=0)
+        cache.set('k', _payload(1))
+        time.sleep(0.01)
+        assert cache.get('k') is None
+        assert cache.stats()['misses'] == 1
+
+
+def test_memory_lru_bound():
+    """The in-process tier never holds more than max_memory_entries"""
+    cache = QuestionCache(None, ttl_seconds=60, max_memory_entries=2)
+    for name in ('a', 'b', 'c'):
+        cache.set(name, _payload(1))
+    assert cache.get('a') is None
+    assert cache.get('c') == _payload(1)
+    assert cache.stats()['memory_entries'] == 2
+    assert cache.stats()['disk_enabled'] is False
+
+
+def test_disk_size_eviction():
+    """The SQLite tier is trimmed to max_bytes, least recently used first"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+        one_entry = len(QuestionCache._encode(_payload(20)))
+        cache = QuestionCache(path, ttl_seconds=60, max_memory_entries=1, max_bytes=one_entry * 2)
+        cache.set('first', _payload(20))
+        cache.set('second', _payload(20))
+        cache.set('third', _payload(20))
+
+        fresh = QuestionCache(path, ttl_seconds=60)
+        assert fresh.get('first') is None
+        assert fresh.get('second') == _payload(20)
+        assert fresh.get('third') == _payload(20)
+        assert cache.stats()['evictions'] >= 1
+
+
+def _slow_fetch(cache, key, calls):
+    def fetch():
+        calls.append(key)
+        time.sleep(0.2)
+        cache.set(key, _payload(2))
+        return {'success': True, 'data': _payload(2), 'status_code': 200}
+    return fetch
+
+
+def _run_concurrently(targets):
+    results = []
+    threads = [threading.Thread(target=lambda t=t: results.append(t())) for t in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_single_flight_threads():
+    """Concurrent callers in one process share one upstream call"""
+    cache = QuestionCache(None, ttl_seconds=60)
+    flight = SingleFlight(cache)
+    calls = []
+    fetch = _slow_fetch(cache, 'k', calls)
+    results = _run_concurrently([lambda: flight.do('k', fetch)] * 10)
+    assert len(calls) == 1
+    assert all(r['success'] for r in results)
+    assert flight.stats()['coalesced_threads'] == 9
+
+
+def test_single_flight_across_workers():
+    """Workers sharing the cache file wait on the lease holder instead of fetching"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.db')
+        workers = [SingleFlight(QuestionCache(path, ttl_seconds=60), poll_interval=0.02) for _ in range(3)]
+        calls = []
+        results = _run_concurrently([
+            lambda w=w: w.do('k', _slow_fetch(w.cache, 'k', calls)) for w in workers
+        ])
+        assert len(calls) == 1
+        assert all(r['data'] == _payload(2) for r in results)
+        assert sum(w.stats()['coalesced_workers'] for w in workers) == 2
+        # Polling for the leader's payload is not counted as cache misses
+        assert sum(w.cache.stats()['misses'] for w in workers) == 0
+
+
+def test_stale_payload_outlives_ttl():
+    """Expired payloads stay available to get_stale until the stale window closes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = QuestionCache(os.path.join(tmp, 'cache.db'), ttl_seconds=0, stale_seconds=60)
+        cache.set('k', _payload(1))
+        time.sleep(0.01)
+        assert cache.get('k') is None
+        assert cache.get_stale('k') == _payload(1)
+        assert QuestionCache(cache.db_path, ttl_seconds=0, stale_seconds=0).get_stale('k') is None
+
+
+def test_circuit_breaker_opens_and_recovers():
+    """Consecutive failures or slow calls open the circuit; one probe closes it again"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.05, slow_call_ms=100)
+    breaker.record(False, 10)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record(True, 500)  # slow success counts as a failure
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.allow()       # the half-open probe
+    assert not breaker.allow()   # only one probe at a time
+    breaker.record(True, 10)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()['opened'] == 1
+
+
+def test_probe_that_raises_releases_circuit():
+    """A half-open probe that raises re-opens the circuit instead of leaving it waiting on the probe"""
+    app = create_app("config.TestConfig")
+    with app.app_context():
+        service = QuestionsAPIService()
+        service.breaker = breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.05)
+
+        def explode(*args):
+            raise RuntimeError("boom")
+        service._request_upstream = explode
+
+        breaker.record(False, 10)
+        time.sleep(0.06)
+        try:
+            service._fetch_remote('chemistry', 'utme', None, 40)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("the probe's error should propagate")
+        assert breaker.state == CircuitBreaker.OPEN
+
+        time.sleep(0.06)
+        assert breaker.allow()  # a new probe is let through
+
+
+if __name__ == "__main__":
+    test_memory_and_disk_tiers()
+    test_ttl_expiry()
+    test_memory_lru_bound()
+    test_disk_size_eviction()
+    test_single_flight_threads()
+    test_single_flight_across_workers()
+    test_stale_payload_outlives_ttl()
+    test_circuit_breaker_opens_and_recovers()
+    test_probe_that_raises_releases_circuit()
+    print("✅ Question cache tests passed!")
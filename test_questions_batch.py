@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for the /api/questions/batch endpoint: input validation and
+per-subject results. Runs against an in-memory database (config.TestConfig)
+and the local fake aloc server.
+"""
+
+import os
+import sys
+import time
+from urllib.parse import parse_qs
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models import User
+from fake_aloc_server import FakeAlocAPI, serve_in_thread
+
+
+class _FailingSubjects:
+    """Fake aloc API answering 500 for the given subjects"""
+
+    def __init__(self, api, failing=()):
+        self.api = api
+        self.failing = set(failing)
+
+    def __call__(self, environ, start_response):
+        subject = parse_qs(environ.get('QUERY_STRING', '')).get('subject', [''])[0]
+        if subject in self.failing:
+            start_response('500 Internal Server Error', [('Content-Type', 'application/json')])
+            return [b'{"status": 500, "error": "down"}']
+        return self.api(environ, start_response)
+
+
+def _setup(base_url='http://127.0.0.1:9/api/v2/q'):
+    app = create_app("config.TestConfig")
+    app.config.update(QUESTIONS_API_BASE_URL=base_url, QUESTIONS_API_RETRIES=0, QUESTIONS_API_BREAKER_FAILURES=1000)
+    with app.app_context():
+        student = User(full_name="Student", email="s@test.com", role="student", class_name="SS 2")
+        student.set_password("x")
+        db.session.add(student)
+        db.session.commit()
+        user_id = student.id
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+    return app, client
+
+
+def test_batch_rejects_invalid_input():
+    """Bad class levels, unknown or missing subjects and oversized batches are refused before any fetch"""
+    app, client = _setup()
+    app.config['QUESTIONS_API_BATCH_MAX_JOBS'] = 4
+
+    for query in ("subjects=chemistry", "subjects=chemistry&class_level=ss1"):
+        response = client.get(f"/api/questions/batch?{query}")
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'Invalid class level. Must be SS2 or SS3'
+
+    response = client.get("/api/questions/batch?class_level=ss2&subjects=chemistry,alchemy")
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith("Invalid subjects ['alchemy']")
+    assert client.get("/api/questions/batch?class_level=ss2&subjects=,").status_code == 400
+
+    # 3 subjects x 2 years is over the limit; duplicates do not count twice
+    response = client.get("/api/questions/batch?class_level=ss2&subjects=chemistry,physics,biology&years=2010,2011")
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Too many subject/year combinations (6); the limit is 4'
+
+    anonymous = app.test_client().get("/api/questions/batch?class_level=ss2&subjects=chemistry")
+    assert anonymous.status_code == 302
+
+
+def test_batch_reports_each_subject():
+    """Subjects are fetched concurrently and each reports its own success or upstream error"""
+    upstream = _FailingSubjects(FakeAlocAPI(latency_ms=300, seed=1), failing={'physics'})
+    server, base_url = serve_in_thread(upstream)
+    try:
+        app, client = _setup(base_url)
+        started = time.perf_counter()
+        response = client.get("/api/questions/batch?class_level=SS2&subjects=chemistry,physics,Chemistry,biology")
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['success'] is False and body['class_level'] == 'SS2'
+
+        results = body['results']
+        assert [entry['subject'] for entry in results] == ['chemistry', 'physics', 'biology']
+        assert [entry['success'] for entry in results] == [True, False, True]
+        assert len(results[0]['data']['data']) == 40
+        assert results[1]['status_code'] == 500 and 'data' not in results[1]
+        assert results[1]['error'] == 'API request failed with status 500'
+        assert results[0]['elapsed_ms'] >= 300 and results[2]['elapsed_ms'] >= 300
+        assert elapsed < 0.85  # three 300 ms fetches overlap
+
+        # Every subject failing is a 502 for the whole batch
+        upstream.failing = {'economics', 'geography'}
+        response = client.get("/api/questions/batch?class_level=ss3&subjects=economics,geography&years=2010")
+        assert response.status_code == 502
+        assert [entry['year'] for entry in response.get_json()['results']] == ['2010', '2010']
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    test_batch_rejects_invalid_input()
+    test_batch_reports_each_subject()
+    print("✅ Questions batch tests passed!")
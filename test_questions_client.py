@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Test script for the pooled questions API HTTP client: retry policy, timeouts
+and new-connection accounting. Runs against a local keep-alive HTTP server.
+"""
+
+import os
+import sys
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from app import create_app
+from app.api_service import QuestionsHTTPClient, get_http_client
+
+
+class _Upstream:
+    """Upstream answering with the queued (status, delay) pairs, then 200s"""
+
+    def __init__(self, replies=(), delay=0.0):
+        self.replies = list(replies)
+        self.delay = delay
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def reply(self):
+        with self._lock:
+            self.requests += 1
+            status, delay = self.replies.pop(0) if self.replies else (200, self.delay)
+        if delay:
+            time.sleep(delay)
+        return status
+
+
+def _serve(upstream):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+
+        def do_GET(self):
+            status = upstream.reply()
+            body = b'{"status": %d}' % status
+            try:
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except OSError:
+                pass  # the client gave up waiting
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}/api/v2/q'
+
+
+def test_5xx_retried_with_backoff():
+    """Server errors are retried up to the configured count"""
+    upstream = _Upstream([(503, 0), (502, 0)])
+    server, url = _serve(upstream)
+    try:
+        client = QuestionsHTTPClient(retries=2, backoff_factor=0)
+        assert client.get(url).status_code == 200
+        assert upstream.requests == 3
+
+        upstream.replies = [(500, 0)] * 3
+        assert client.get(url).status_code == 500
+        assert client.stats()['errors'] == 1
+    finally:
+        server.shutdown()
+
+
+def test_read_timeout_not_retried():
+    """A hung upstream costs one read timeout, not one per retry"""
+    upstream = _Upstream(delay=1.0)
+    server, url = _serve(upstream)
+    try:
+        client = QuestionsHTTPClient(read_timeout=0.2, retries=2, backoff_factor=0)
+        started = time.perf_counter()
+        try:
+            client.get(url)
+            assert False, "expected a read timeout"
+        except requests.exceptions.ReadTimeout:
+            pass
+        assert time.perf_counter() - started < 0.6
+        assert upstream.requests == 1
+    finally:
+        server.shutdown()
+
+
+def test_new_connections_counted_per_call():
+    """Keep-alive calls reuse one connection; concurrent calls count only their own handshakes"""
+    upstream = _Upstream(delay=0.2)
+    server, url = _serve(upstream)
+    try:
+        client = QuestionsHTTPClient(pool_size=4)
+        for _ in range(3):
+            client.get(url)
+        stats = client.stats()
+        assert stats['new_connections'] == 1
+        assert stats['latency_new_connection']['count'] == 1
+        assert stats['latency_reused_connection']['count'] == 2
+
+        client = QuestionsHTTPClient(pool_size=4)
+        barrier = threading.Barrier(4)
+
+        def call():
+            barrier.wait()
+            client.get(url)
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = client.stats()
+        assert stats['calls'] == 4
+        assert stats['new_connections'] == 4
+        assert stats['latency_new_connection']['count'] == 4
+    finally:
+        server.shutdown()
+
+
+def test_client_built_from_config():
+    """The process-wide client takes its timeouts and retries from the app config"""
+    app = create_app("config.TestConfig")
+    app.config.update(QUESTIONS_API_READ_TIMEOUT=7, QUESTIONS_API_RETRIES=1)
+    client = get_http_client(app)
+    assert get_http_client(app) is client
+    assert client.timeout == (app.config['QUESTIONS_API_CONNECT_TIMEOUT'], 7)
+    retry = client.adapter.max_retries
+    assert (retry.total, retry.connect, retry.read, retry.status) == (1, 1, False, 1)
+
+
+if __name__ == "__main__":
+    test_5xx_retried_with_backoff()
+    test_read_timeout_not_retried()
+    test_new_connections_counted_per_call()
+    test_client_built_from_config()
+    print("✅ Questions client tests passed!")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test script for regrading stored scores when an answer key changes.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import ExamSession, ScoreRegrade, StudentSubjectResult
+from conftest import login_client, setup_exam
+
+
+def test_key_change_regrades_only_affected_sessions(exam):
+    """Moving a question's key adjusts stored scores of sessions that chose the old or new option"""
+    app, student_id, subject_id, session_id, options = exam
+    qids = sorted(options)
+    client = login_client(app, student_id)
+    client.post(f"/student/sessions/{session_id}", data={f"question_{qid}": options[qid][1] for qid in qids})
+    with app.app_context():
+        db.session.add(ExamSession(subject_id=subject_id, student_id=student_id))
+        db.session.add(ExamSession(subject_id=subject_id, student_id=student_id))
+        db.session.commit()
+        picked_new, untouched = [s.id for s in ExamSession.query.order_by(ExamSession.id).all()[1:]]
+    client.post(f"/student/sessions/{picked_new}",
+                data={f"question_{qids[0]}": options[qids[0]][2], f"question_{qids[1]}": options[qids[1]][1]})
+    client.post(f"/student/sessions/{untouched}", data={f"question_{qids[0]}": options[qids[0]][3]})
+
+    login_client(app, 1).post(f"/teacher/options/{options[qids[0]][2]}/edit", data={"text": "fixed", "is_correct": "y"})
+    with app.app_context():
+        scores = {s.id: (s.correct_answers, round(s.score_percentage, 2)) for s in ExamSession.query}
+        assert scores == {session_id: (2, 66.67), picked_new: (2, 66.67), untouched: (0, 0.0)}
+        regrade = ScoreRegrade.query.one()
+        assert (regrade.old_option_id, regrade.new_option_id) == (options[qids[0]][1], options[qids[0]][2])
+        assert (regrade.sessions_gained, regrade.sessions_lost, regrade.changed_by_id) == (1, 1, 1)
+        result = StudentSubjectResult.query.one()
+        assert (result.latest_correct, round(result.best_score, 2)) == (0, 66.67)
+
+    # Deleting the keyed option takes the point back from the session that chose it
+    login_client(app, 1).post(f"/teacher/options/{options[qids[0]][2]}/delete")
+    with app.app_context():
+        assert db.session.get(ExamSession, picked_new).correct_answers == 1
+        assert ScoreRegrade.query.count() == 2
+
+
+if __name__ == "__main__":
+    test_key_change_regrades_only_affected_sessions(setup_exam())
+    print("✅ Regrade tests passed!")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script for the rendered session report cache.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from app import db
+from app.models import ExamSession, Subject
+from app.report import get_session_report_cache
+from conftest import login_client, setup_exam
+
+
+def test_session_report_cached_until_questions_change(exam):
+    """A completed session's report is rendered once; a question edit renders it again"""
+    app, student_id, subject_id, session_id, options = exam
+    qids = sorted(options)
+    client = login_client(app, student_id)
+    client.post(f"/student/sessions/{session_id}", data={f"question_{qid}": options[qid][1] for qid in qids})
+
+    first = client.get(f"/report/session/{session_id}")
+    assert first.status_code == 200 and b"Q0" in first.data
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        assert client.get(f"/report/session/{session_id}").status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    assert not any("FROM question" in s for s in statements)
+
+    login_client(app, 1).post(f"/teacher/questions/{qids[0]}/edit", data={"text": "Renamed"})
+    assert b"Renamed" in client.get(f"/report/session/{session_id}").data
+    with app.app_context():
+        assert get_session_report_cache().stats() == {'hits': 1, 'misses': 2, 'entries': 2}
+
+
+def test_session_report_of_deleted_subject(exam):
+    """Sessions outlive a deleted subject, and their reports still render"""
+    app, student_id, subject_id, session_id, options = exam
+    qids = sorted(options)
+    client = login_client(app, student_id)
+    client.post(f"/student/sessions/{session_id}", data={f"question_{qid}": options[qid][1] for qid in qids})
+
+    assert login_client(app, 1).post(f"/teacher/subjects/{subject_id}/delete").status_code == 302
+    with app.app_context():
+        assert db.session.get(Subject, subject_id) is None
+        assert db.session.get(ExamSession, session_id) is not None
+    for _ in range(2):
+        response = client.get(f"/report/session/{session_id}")
+        assert response.status_code == 200 and b"Exam Report" in response.data
+    with app.app_context():
+        assert get_session_report_cache().stats()['hits'] == 1
+
+
+if __name__ == "__main__":
+    test_session_report_cached_until_questions_change(setup_exam())
+    test_session_report_of_deleted_subject(setup_exam())
+    print("✅ Report cache tests passed!")
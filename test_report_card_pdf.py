@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test script for the on-disk report-card PDF cache.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import ExamSession
+from app.pdf_cache import get_pdf_cache
+from conftest import login_client, setup_exam
+
+
+def test_report_card_pdf_cached_by_content(exam):
+    """An unchanged report is served from the PDF cache and answers conditional GETs with 304"""
+    app, student_id, subject_id, session_id, options = exam
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['REPORT_CARD_PDF_CACHE_DIR'] = tmp
+        client = login_client(app, student_id)
+        first = client.get("/student/report-card.pdf")
+        assert first.status_code == 200 and first.data.startswith(b"%PDF")
+        etag = first.headers["ETag"]
+        second = client.get("/student/report-card.pdf")
+        assert second.data == first.data and second.headers["ETag"] == etag
+        assert client.get("/student/report-card.pdf", headers={"If-None-Match": etag}).status_code == 304
+        with app.app_context():
+            assert get_pdf_cache().stats() == {'hits': 1, 'misses': 1, 'stores': 1, 'evictions': 0}
+
+        # A newly completed session changes the report, and so the key
+        with app.app_context():
+            session = db.session.get(ExamSession, session_id)
+            session.completed_at, session.total_questions, session.correct_answers, session.score_percentage = \
+                datetime.utcnow(), 3, 3, 100.0
+            db.session.commit()
+        assert client.get("/student/report-card.pdf").headers["ETag"] != etag
+        assert len(os.listdir(tmp)) == 2
+
+
+if __name__ == "__main__":
+    test_report_card_pdf_cached_by_content(setup_exam())
+    print("✅ Report card PDF tests passed!")
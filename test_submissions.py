@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the queued final submissions and their grading workers.
+Runs against an in-memory database (config.TestConfig).
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import ExamSession, Response, Submission
+from app.submissions import enqueue_submission
+from conftest import login_client, setup_exam
+
+
+def test_submission_queue_graded_by_workers_in_batches(exam):
+    """With the queue enabled, take_exam only enqueues; a worker grades the batch and the report waits for it"""
+    app, student_id, subject_id, session_id, options = exam
+    app.config['SUBMISSION_QUEUE_ENABLED'] = True
+    qids = sorted(options)
+    client = login_client(app, student_id)
+    with app.app_context():
+        db.session.add(ExamSession(subject_id=subject_id, student_id=student_id))
+        db.session.commit()
+        second_id = ExamSession.query.order_by(ExamSession.id.desc()).first().id
+
+    assert client.post(f"/student/sessions/{session_id}",
+                       data={f"question_{qid}": options[qid][1] for qid in qids}).status_code == 302
+    client.post(f"/student/sessions/{second_id}", data={f"question_{qids[0]}": options[qids[0]][1]})
+    with app.app_context():
+        assert db.session.get(ExamSession, session_id).completed_at is None
+        assert Response.query.count() == 0
+        assert [s.status for s in Submission.query] == ["pending", "pending"]
+    assert b"being graded" in client.get(f"/report/session/{session_id}").data
+    assert client.get(f"/report/session/{session_id}/status").get_json() == {"status": "pending"}
+
+    result = app.test_cli_runner().invoke(args=["submissions", "work", "--once", "--batch-size", "10"])
+    assert "graded batch of 2" in result.output
+    with app.app_context():
+        assert [s.status for s in Submission.query] == ["done", "done"]
+        assert db.session.get(ExamSession, session_id).correct_answers == 3
+        assert db.session.get(ExamSession, second_id).correct_answers == 1
+    assert client.get(f"/report/session/{session_id}/status").get_json() == {"status": "graded"}
+    assert b"Exam Report" in client.get(f"/report/session/{session_id}").data
+
+    # With no worker running, the report poll grades a submission once it is stale
+    app.config['SUBMISSION_STALE_SECONDS'] = 0
+    client.post(f"/student/sessions/{second_id}", data={f"question_{qid}": options[qid][1] for qid in qids})
+    assert client.get(f"/report/session/{second_id}/status").get_json() == {"status": "graded"}
+    with app.app_context():
+        assert db.session.get(ExamSession, second_id).correct_answers == 3
+        assert Submission.query.order_by(Submission.id.desc()).first().worker == "request"
+
+
+def test_queued_submission_locks_session(exam):
+    """Once the final submit is queued, the session refuses answers until a worker has graded it"""
+    app, student_id, subject_id, session_id, options = exam
+    app.config['SUBMISSION_QUEUE_ENABLED'] = True
+    qids = sorted(options)
+    client = login_client(app, student_id)
+    client.get(f"/student/subjects/{subject_id}/start")
+    first = client.post(f"/student/sessions/{session_id}", data={f"question_{qids[0]}": options[qids[0]][1]})
+    assert first.status_code == 302
+
+    report = f"/report/session/{session_id}"
+    assert client.get(f"/student/subjects/{subject_id}/start").headers["Location"] == report
+    assert client.get(f"/student/sessions/{session_id}").headers["Location"] == report
+    again = client.post(f"/student/sessions/{session_id}", data={f"question_{qid}": options[qid][1] for qid in qids})
+    assert again.headers["Location"] == report
+    with client.session_transaction() as sess:
+        assert sess["_flashes"][-1] == ("info", "This exam has already been submitted.")
+    response = client.post(f"/student/sessions/{session_id}/autosave",
+                           json={"answers": {str(qids[1]): options[qids[1]][1]}})
+    assert response.status_code == 409
+    with app.app_context():
+        session = db.session.get(ExamSession, session_id)
+        # Two submits racing past the check: the unique index lets one row wait
+        assert enqueue_submission(session, {}) is None
+        assert Submission.query.count() == 1 and Response.query.count() == 0
+        assert ExamSession.query.count() == 1
+
+    app.test_cli_runner().invoke(args=["submissions", "work", "--once"])
+    with app.app_context():
+        assert db.session.get(ExamSession, session_id).correct_answers == 1
+    # Graded sessions are finished; starting the subject again opens a new one
+    assert client.get(f"/student/subjects/{subject_id}/start").headers["Location"] != f"/student/sessions/{session_id}"
+    with app.app_context():
+        assert ExamSession.query.count() == 2
+
+
+if __name__ == "__main__":
+    test_submission_queue_graded_by_workers_in_batches(setup_exam())
+    test_queued_submission_locks_session(setup_exam())
+    print("✅ Submission queue tests passed!")